@@ -0,0 +1,9 @@
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent / "src"))
+
+from scenarios.runner import main
+
+if __name__ == "__main__":
+    sys.exit(main())
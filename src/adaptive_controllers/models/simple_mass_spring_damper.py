@@ -5,6 +5,8 @@ import numpy as np
 
 from typing import NamedTuple
 
+from utils.gain_cache import cached_lqr
+
 class MassSpringDamperLinearParams(NamedTuple):
     A: np.ndarray
     B: np.ndarray
@@ -49,7 +51,7 @@ class SimpleMassSpringDamper:
 
 def create_reference_model(m_s_p: SimpleMassSpringDamper, q: np.ndarray , r: np.ndarray) -> control.StateSpace:
     sys_parms = m_s_p.get_linear_params()
-    k, _, eig = control.lqr(sys_parms.A, sys_parms.B , q, r)
+    k, _, eig = cached_lqr(sys_parms.A, sys_parms.B , q, r)
     print(eig)
     c = np.eye(sys_parms.A.shape[0])
     k_2: np.ndarray = np.linalg.pinv(-c @ np.linalg.inv(sys_parms.A - sys_parms.B @ k) @ sys_parms.B)
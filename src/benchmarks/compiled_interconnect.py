@@ -0,0 +1,87 @@
+import contextlib
+import io
+import time
+from typing import Callable, NamedTuple
+
+import control
+import numpy as np
+
+from utils.compiled_interconnect import compile_interconnect
+from inverted_pendulum_control.models.inverted_pendulum_closed_loop import create_lqr_stabilizing_and_command_following_plant
+from steering_control.models.closed_loop_plants import VehiclePlant, VehiclePlantNoisy
+
+_REPEATS: int = 3
+
+
+class BenchmarkCase(NamedTuple):
+    name: str
+    system_factory: Callable[[], control.InterconnectedSystem]
+    T: np.ndarray
+    U: np.ndarray
+    X0: list[float] | float
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    stock_time: float
+    compiled_time: float
+    max_output_deviation: float
+
+
+def _quiet(factory: Callable[[], control.InterconnectedSystem]) -> control.InterconnectedSystem:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return factory()
+
+
+def _steering_inputs(T: np.ndarray) -> np.ndarray:
+    return np.vstack([8 * T, 0.5 * np.sin(2 * np.pi * T), np.zeros_like(T), np.ones_like(T), np.zeros_like(T)])
+
+
+def _pendulum_inputs(T: np.ndarray) -> np.ndarray:
+    noise = np.random.default_rng(0).normal(loc=0, scale=0.5, size=(4, T.shape[0]))
+    x_desired = 2 * (T > 4) - 6 * (T > 10) + 4 * (T > 16)
+    return np.vstack([noise, x_desired, np.zeros_like(T), np.pi * np.ones_like(T), np.zeros_like(T)])
+
+
+def benchmark_cases() -> list[BenchmarkCase]:
+    t_steering = np.linspace(0, 10, 1000)
+    t_pendulum = np.linspace(0, 20, 2000)
+    return [
+        BenchmarkCase("steering_lqr", lambda: VehiclePlant().create_closed_loop_system(),
+                      t_steering, _steering_inputs(t_steering), 0),
+        BenchmarkCase("steering_lqr_noisy", lambda: VehiclePlantNoisy().create_closed_loop_system(),
+                      t_steering, _steering_inputs(t_steering), 0),
+        BenchmarkCase("pendulum_command_following", create_lqr_stabilizing_and_command_following_plant,
+                      t_pendulum, _pendulum_inputs(t_pendulum), [0, 0, np.pi, 0]),
+    ]
+
+
+def _timed_response(system: control.NonlinearIOSystem, case: BenchmarkCase) -> tuple[float, np.ndarray]:
+    best, outputs = np.inf, None
+    for _ in range(_REPEATS):
+        start = time.perf_counter()
+        outputs = control.input_output_response(system, case.T, case.U, case.X0).outputs
+        best = min(best, time.perf_counter() - start)
+    return best, outputs
+
+
+def run_benchmark(case: BenchmarkCase) -> BenchmarkResult:
+    np.random.seed(0)   # noise blocks draw the seed of their noise table from the global generator
+    stock = _quiet(case.system_factory)
+    compiled = compile_interconnect(stock)
+    stock_time, stock_outputs = _timed_response(stock, case)
+    compiled_time, compiled_outputs = _timed_response(compiled, case)
+    return BenchmarkResult(
+        name=case.name,
+        stock_time=stock_time,
+        compiled_time=compiled_time,
+        max_output_deviation=float(np.max(np.abs(stock_outputs - compiled_outputs)))
+    )
+
+
+if __name__ == "__main__":
+    print(f"{'case':<30}{'stock [s]':>12}{'compiled [s]':>15}{'speedup':>10}{'max |dy|':>12}")
+    for benchmark_case in benchmark_cases():
+        result = run_benchmark(benchmark_case)
+        print(f"{result.name:<30}{result.stock_time:>12.3f}{result.compiled_time:>15.3f}"
+              f"{result.stock_time / result.compiled_time:>10.2f}{result.max_output_deviation:>12.2e}")
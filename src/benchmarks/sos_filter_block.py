@@ -0,0 +1,77 @@
+import time
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from inverted_pendulum_control.observers.linear_time_invariant_filtering import (
+    BLOCK_TAPS,
+    FilterBlock,
+    FilterChannel,
+    butter_filter_factory
+)
+
+_REPEATS: int = 3
+_PER_SAMPLE_LENGTH: int = 5_000
+_BULK_LENGTH: int = 1_000_000
+
+
+class ThroughputResult(NamedTuple):
+    name: str
+    samples: int
+    seconds: float
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.samples / self.seconds
+
+
+def _per_channel_lfilter(data: np.ndarray) -> np.ndarray:
+    """The previous FilterBlock: one ba form lfilter call per channel and per sample"""
+    b, a = butter_filter_factory(taps=BLOCK_TAPS)
+    channels = [FilterChannel(a=a, b=b) for _ in range(data.shape[0])]
+    out = np.empty_like(data)
+    for k in range(data.shape[1]):
+        for i, channel in enumerate(channels):
+            out[i, k] = channel(0, data[i, k:k + 1], None, None)
+    return out
+
+
+def _per_sample_sos(data: np.ndarray) -> np.ndarray:
+    channel_filter = FilterBlock().channel_filter
+    out = np.empty_like(data)
+    for k in range(data.shape[1]):
+        out[:, k] = channel_filter(0, data[:, k], None, None)
+    return out
+
+
+def _bulk_sos(data: np.ndarray) -> np.ndarray:
+    return FilterBlock().filter_offline(data)
+
+
+def _timed(name: str, func: Callable[[np.ndarray], np.ndarray], data: np.ndarray) -> tuple[ThroughputResult, np.ndarray]:
+    best, out = np.inf, None
+    for _ in range(_REPEATS):
+        start = time.perf_counter()
+        out = func(data)
+        best = min(best, time.perf_counter() - start)
+    return ThroughputResult(name, data.shape[1], best), out
+
+
+def run_benchmark() -> tuple[list[ThroughputResult], float]:
+    rng = np.random.default_rng(0)
+    short = rng.normal(size=(4, _PER_SAMPLE_LENGTH))
+    long = rng.normal(size=(4, _BULK_LENGTH))
+    legacy, legacy_out = _timed("per channel lfilter (ba)", _per_channel_lfilter, short)
+    per_sample, per_sample_out = _timed("per sample sos step", _per_sample_sos, short)
+    bulk, _ = _timed("offline sosfilt", _bulk_sos, long)
+    offline_out = _bulk_sos(short)
+    return [legacy, per_sample, bulk], float(max(np.max(np.abs(legacy_out - per_sample_out)),
+                                                 np.max(np.abs(offline_out - per_sample_out))))
+
+
+if __name__ == "__main__":
+    results, deviation = run_benchmark()
+    print(f"{'mode':<30}{'samples':>10}{'time [s]':>12}{'samples/s':>14}")
+    for result in results:
+        print(f"{result.name:<30}{result.samples:>10}{result.seconds:>12.3f}{result.samples_per_second:>14.0f}")
+    print(f"max deviation between the modes over the per sample run: {deviation:.2e}")
@@ -0,0 +1,372 @@
+"""
+Benchmark suite over the simulation and synthesis entry points of every package.
+
+Every entry runs in its own interpreter, with its package directory as working directory and
+first on sys.path, as the packages import their own `models` modules script style. Runs are
+seeded, headless (Agg backend, stdout discarded) and record the best wall time over a few
+repeats, the top level RHS evaluations and the peak traced memory of one extra run. The
+import_* entries time the import of a module in a fresh interpreter, which tracemalloc in the
+parent does not see, so their peak memory is not recorded. Those times include importing
+python-control, which loads matplotlib and scipy.signal by itself, so deferring the plotting and
+synthesis imports of the packages only takes cvxpy out of them.
+
+    python -m benchmarks.suite                      # run, store results/latest.json, compare
+    python -m benchmarks.suite --update-baseline    # run and store the baseline
+    python -m benchmarks.suite --only pendulum_stabilizing servo_impulse_response
+
+The baseline is split by how far it carries: the RHS evaluations are deterministic under the
+fixed seed and are committed in benchmarks/baseline.json, wall times and peak memory depend on
+the machine and are kept per host in results/baseline_<host>.json, which is not committed. On a
+host without timings of its own only the RHS evaluations are compared. The exit code is 1 when a
+regression is flagged.
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import pathlib
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+
+SOURCE_DIRECTORY: pathlib.Path = pathlib.Path(__file__).parent.parent
+BASELINE_LOCATION: pathlib.Path = pathlib.Path(__file__).parent / "baseline.json"
+RESULTS_DIRECTORY: pathlib.Path = pathlib.Path(__file__).parent / "results"
+
+
+def _host_key() -> str:
+    """Machine the timings hold on: host name, architecture and core count"""
+    return re.sub(r"[^\w.-]", "_", f"{platform.node()}-{platform.machine()}-{os.cpu_count()}cpu")
+
+
+HOST_BASELINE_LOCATION: pathlib.Path = RESULTS_DIRECTORY / f"baseline_{_host_key()}.json"
+
+_COUNTED_METRICS: tuple[str, ...] = ("rhs_evaluations", )            # committed, the same on every host
+_HOST_METRICS: tuple[str, ...] = ("seconds", "peak_memory")          # per host
+
+_SEED: int = 0
+_REPEATS: int = 3
+_RESULT_MARKER: str = "BENCHMARK_RESULT "
+
+
+class SuiteEntry(NamedTuple):
+    name: str
+    package: str                    # directory below src that is the working directory of the run
+    workload: Callable[[], Any]
+    repeats: int = _REPEATS
+    traced: bool = True             # False when the work happens in a child interpreter tracemalloc does not see
+
+
+class BenchmarkRecord(NamedTuple):
+    name: str
+    seconds: float | None           # None in a baseline without timings of this host
+    rhs_evaluations: int | None     # None in a baseline that does not count the entry yet
+    peak_memory: int | None         # bytes traced by tracemalloc, None for untraced entries
+
+
+@dataclasses.dataclass
+class Tolerances:
+    seconds: float = dataclasses.field(default=0.3)         # relative slow down that is flagged
+    peak_memory: float = dataclasses.field(default=0.2)
+    rhs_evaluations: float = dataclasses.field(default=0.)  # deterministic under the fixed seed
+
+
+class Regression(NamedTuple):
+    name: str
+    metric: str
+    baseline: float
+    measured: float
+
+    @property
+    def ratio(self) -> float:
+        return self.measured / self.baseline if self.baseline else np.inf
+
+
+# The workloads import inside their bodies, they only ever run in the interpreter of their package
+
+def _steering_lqr() -> Any:
+    from simulations import simulate_lqr_system_dynamics
+    return simulate_lqr_system_dynamics()
+
+
+def _steering_lqr_noisy() -> Any:
+    from simulations import simulate_lqr_system_noisy_dynamics
+    return simulate_lqr_system_noisy_dynamics()
+
+
+def _pendulum_stabilizing() -> Any:
+    from simulator import simulate_closed_loop_stabiling_plant
+    return simulate_closed_loop_stabiling_plant(theta_init=np.pi + 0.1, v_init=0, verbose=False)
+
+
+def _pendulum_command_following() -> Any:
+    from simulator import simulate_closed_loop_command_following_plant
+    return simulate_closed_loop_command_following_plant(verbose=False)
+
+
+def _servo_impulse_response() -> Any:
+    from simulator import simulate_impulse_response_model
+    from models.servo_mechanism_model import ServoMechanismModel
+    return simulate_impulse_response_model(dt=0.01, t_final=1, model=ServoMechanismModel())
+
+
+def _mass_spring_damper() -> Any:
+    from simulator import simulate_mass_spring_damper
+    return simulate_mass_spring_damper(exact_delays=True)
+
+
+def _lmi_simple_stabilizing() -> Any:
+    from model.models import JetAircraftPlant
+    from controllers_and_observers.controller_synthesis import SimpleStabilizingController
+    return SimpleStabilizingController(plant=JetAircraftPlant())
+
+
+def _lmi_d_space() -> Any:
+    from model.models import JetAircraftPlant
+    from controllers_and_observers.controller_synthesis import DSpaceControlLawSynthesizer
+    synthesizer = DSpaceControlLawSynthesizer(plant=JetAircraftPlant(), rise_time=0.01, settling_time=2, maximum_overshoot=0.1)
+    return synthesizer.sysnthesize_constroller()
+
+
+def _lmi_parametrized_d_space() -> Any:
+    from model.models import JetAircraftPlant
+    from controllers_and_observers.controller_synthesis import DSpaceSpecification, ParametrizedDSpaceSynthesizer
+    synthesizer = ParametrizedDSpaceSynthesizer(plant=JetAircraftPlant())
+    return synthesizer.sweep([DSpaceSpecification(rise_time, 2, 0.1) for rise_time in (0.01, 0.02, 0.05, 0.1)])
+
+
+def _lmi_full_state_optimal() -> Any:
+    from model.models import MassSpringDamperExogenous
+    from controllers_and_observers.controller_synthesis import FullStateOptimalController, NineMatrixData
+    plant = MassSpringDamperExogenous(m=1, c=1, k=1, alpha_1=1, alpha_2=1)
+    return FullStateOptimalController(params=NineMatrixData(
+        A=plant.A, B_1=plant.B_1, B_2=plant.B_2, C_1=plant.C_1, C_2=plant.C_2,
+        D_1_1=plant.D_1_1, D_1_2=plant.D_1_2, D_2_1=plant.D_2_1, D_2_2=plant.D_2_2
+    )).f_matrix()
+
+
+def _sampled_data_closed_loop() -> Any:
+    import control
+    from systems import create_closed_loop_system, SIMULATION_DT
+    t = np.arange(0, 20, SIMULATION_DT)
+    return control.input_output_response(create_closed_loop_system(), t, np.ones_like(t))
+
+
+def _import_workload(module: str) -> Callable[[], Any]:
+    """
+    Import time of `module` in a fresh interpreter, started in the working directory of the entry,
+    python-control and the matplotlib and scipy.signal it imports included
+    """
+    def workload() -> Any:
+        subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True, check=True)
+    return workload
+
+
+SUITE: list[SuiteEntry] = [
+    SuiteEntry("steering_lqr", "steering_control", _steering_lqr),
+    SuiteEntry("steering_lqr_noisy", "steering_control", _steering_lqr_noisy),
+    SuiteEntry("pendulum_stabilizing", "inverted_pendulum_control", _pendulum_stabilizing),
+    SuiteEntry("pendulum_command_following", "inverted_pendulum_control", _pendulum_command_following),
+    SuiteEntry("servo_impulse_response", "servo_mechanism", _servo_impulse_response),
+    SuiteEntry("mass_spring_damper", "lmi_controller_synthesis", _mass_spring_damper),
+    SuiteEntry("lmi_simple_stabilizing", "lmi_controller_synthesis", _lmi_simple_stabilizing),
+    SuiteEntry("lmi_d_space", "lmi_controller_synthesis", _lmi_d_space),
+    SuiteEntry("lmi_parametrized_d_space", "lmi_controller_synthesis", _lmi_parametrized_d_space),
+    SuiteEntry("lmi_full_state_optimal", "lmi_controller_synthesis", _lmi_full_state_optimal),
+    SuiteEntry("sampled_data_closed_loop", "interconnected_systems", _sampled_data_closed_loop),
+    SuiteEntry("import_steering_plotting", "steering_control", _import_workload("plotting"), traced=False),
+    SuiteEntry("import_pendulum_plotting_ops", "inverted_pendulum_control", _import_workload("plotting_ops"), traced=False),
+    SuiteEntry("import_pendulum_filters", "inverted_pendulum_control", _import_workload("observers.linear_time_invariant_filtering"), traced=False),
+    SuiteEntry("import_servo_plotting_ops", "servo_mechanism", _import_workload("plotting_ops"), traced=False),
+    SuiteEntry("import_lmi_synthesis", "lmi_controller_synthesis", _import_workload("controllers_and_observers.controller_synthesis"), traced=False),
+    SuiteEntry("import_h_infinity_utils", "lmi_controller_synthesis", _import_workload("utils.utils"), traced=False),
+]
+
+
+@contextlib.contextmanager
+def _counting_rhs_evaluations() -> Any:
+    """Counts the outermost `_rhs` calls of python-control systems, nested block calls excluded"""
+    import control
+    counter = {"depth": 0, "calls": 0}
+    originals = {cls: cls.__dict__["_rhs"] for cls in (control.NonlinearIOSystem, control.InterconnectedSystem)}
+
+    def counted(original: Callable) -> Callable:
+        def _rhs(self, t, x, u):
+            if counter["depth"] == 0:
+                counter["calls"] += 1
+            counter["depth"] += 1
+            try:
+                return original(self, t, x, u)
+            finally:
+                counter["depth"] -= 1
+        return _rhs
+
+    for cls, original in originals.items():
+        cls._rhs = counted(original)
+    try:
+        yield counter
+    finally:
+        for cls, original in originals.items():
+            cls._rhs = original
+
+
+def _seeded_run(workload: Callable[[], Any]) -> None:
+    np.random.seed(_SEED)
+    random.seed(_SEED)
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        workload()
+
+
+def measure(entry: SuiteEntry) -> BenchmarkRecord:
+    """Runs one entry in the current interpreter, which must be set up for its package"""
+    best = np.inf
+    for _ in range(entry.repeats):
+        start = time.perf_counter()
+        _seeded_run(entry.workload)
+        best = min(best, time.perf_counter() - start)
+    with _counting_rhs_evaluations() as counter:
+        tracemalloc.start()
+        try:
+            _seeded_run(entry.workload)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return BenchmarkRecord(entry.name, float(best), int(counter["calls"]), int(peak) if entry.traced else None)
+
+
+def run_isolated(entry: SuiteEntry) -> BenchmarkRecord:
+    environment = dict(os.environ)
+    environment["MPLBACKEND"] = "Agg"
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [str(SOURCE_DIRECTORY), str(SOURCE_DIRECTORY.parent)] + ([environment["PYTHONPATH"]] if environment.get("PYTHONPATH") else [])
+    )
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--entry", entry.name],
+        cwd=SOURCE_DIRECTORY / entry.package, env=environment, capture_output=True, text=True
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith(_RESULT_MARKER):
+            return BenchmarkRecord(**json.loads(line[len(_RESULT_MARKER):]))
+    raise RuntimeError(f"Benchmark {entry.name} failed:\n{completed.stderr[-2000:]}")
+
+
+def run_suite(names: list[str] | None = None) -> list[BenchmarkRecord]:
+    entries = [entry for entry in SUITE if names is None or entry.name in names]
+    return [run_isolated(entry) for entry in entries]
+
+
+def _write_json(document: dict[str, Any], path: pathlib.Path) -> None:
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2) + "\n")
+
+
+def _read_json(path: pathlib.Path) -> dict[str, Any]:
+    path = pathlib.Path(path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_records(records: list[BenchmarkRecord], path: pathlib.Path) -> None:
+    _write_json({record.name: record._asdict() for record in records}, path)
+
+
+def load_records(path: pathlib.Path) -> dict[str, BenchmarkRecord]:
+    return {name: BenchmarkRecord(**record) for name, record in _read_json(path).items()}
+
+
+def save_baseline(records: list[BenchmarkRecord], counts_path: pathlib.Path, host_path: pathlib.Path) -> None:
+    """Merges the records into the committed RHS evaluation counts and the timings of this host"""
+    for path, metrics in ((counts_path, _COUNTED_METRICS), (host_path, _HOST_METRICS)):
+        stored = _read_json(path)
+        stored.update({record.name: {metric: getattr(record, metric) for metric in metrics} for record in records})
+        _write_json(stored, path)
+
+
+def load_baseline(counts_path: pathlib.Path, host_path: pathlib.Path) -> dict[str, BenchmarkRecord]:
+    """The committed RHS evaluation counts with the timings of this host, missing metrics are None"""
+    counts, host = _read_json(counts_path), _read_json(host_path)
+    return {
+        name: BenchmarkRecord(
+            name=name,
+            seconds=host.get(name, {}).get("seconds"),
+            rhs_evaluations=counts.get(name, {}).get("rhs_evaluations"),
+            peak_memory=host.get(name, {}).get("peak_memory"),
+        )
+        for name in {**counts, **host}
+    }
+
+
+def find_regressions(records: list[BenchmarkRecord],
+                     baseline: dict[str, BenchmarkRecord],
+                     tolerances: Tolerances | None = None) -> list[Regression]:
+    tolerances = Tolerances() if tolerances is None else tolerances
+    regressions = []
+    for record in records:
+        reference = baseline.get(record.name)
+        if reference is None:
+            continue
+        for metric in ("seconds", "peak_memory", "rhs_evaluations"):
+            measured, expected = getattr(record, metric), getattr(reference, metric)
+            if measured is None or expected is None:
+                continue
+            if measured > expected * (1 + getattr(tolerances, metric)):
+                regressions.append(Regression(record.name, metric, expected, measured))
+    return regressions
+
+
+def _report(records: list[BenchmarkRecord], regressions: list[Regression]) -> str:
+    flagged = {(regression.name, regression.metric) for regression in regressions}
+    mark = lambda name, metric: "!" if (name, metric) in flagged else " "
+    lines = [f"{'benchmark':<30}{'time [s]':>12}{'rhs evals':>12}{'peak [MiB]':>13}"]
+    for record in records:
+        lines.append(
+            f"{record.name:<30}{record.seconds:>11.3f}{mark(record.name, 'seconds')}"
+            f"{record.rhs_evaluations:>11d}{mark(record.name, 'rhs_evaluations')}"
+            + (f"{record.peak_memory / 2**20:>12.2f}" if record.peak_memory is not None else f"{'n/a':>12}")
+            + mark(record.name, 'peak_memory')
+        )
+    for regression in regressions:
+        lines.append(f"REGRESSION {regression.name} {regression.metric}: {regression.baseline:.4g} -> {regression.measured:.4g} ({regression.ratio:.2f}x)")
+    return "\n".join(lines)
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite with baseline regression checks")
+    parser.add_argument("--entry", help=argparse.SUPPRESS)
+    parser.add_argument("--only", nargs="+", choices=[entry.name for entry in SUITE])
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_LOCATION, help="RHS evaluation counts")
+    parser.add_argument("--host-baseline", type=pathlib.Path, default=HOST_BASELINE_LOCATION, help="timings of this host")
+    parser.add_argument("--time-tolerance", type=float, default=Tolerances().seconds)
+    arguments = parser.parse_args(arguments)
+
+    if arguments.entry:
+        entry = next(entry for entry in SUITE if entry.name == arguments.entry)
+        print(_RESULT_MARKER + json.dumps(measure(entry)._asdict()))
+        return 0
+
+    records = run_suite(arguments.only)
+    save_records(records, RESULTS_DIRECTORY / "latest.json")
+    if arguments.update_baseline:
+        save_baseline(records, arguments.baseline, arguments.host_baseline)
+        print(_report(records, []))
+        return 0
+    baseline = load_baseline(arguments.baseline, arguments.host_baseline)
+    regressions = find_regressions(records, baseline, Tolerances(seconds=arguments.time_tolerance))
+    print(_report(records, regressions))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,13 @@
 import control
 import numpy as np
-from typing import NamedTuple
+from typing import Iterator, NamedTuple
 
-from controller import StateSpaceIntegralController, generate_controller_gains, ControllerGains
+from controller import StateSpaceIntegralController, generate_controller_gains, ControllerGains, GainScheduledController
 from system_dynamics import VehicleDynamics
+from road_profiles import RoadProfile, hill_profile
+from trim_table import GainSchedule, TrimTable, load_or_compute_trim_table
+from utils.jacobians import linearize_analytic
+from utils.chunked_streams import DEFAULT_CHUNK_SIZE, ChunkSpan, chunk_span, chunk_spans, chunk_time, sample_count
 
 
 class TimeAndInputTrajectories(NamedTuple):
@@ -22,17 +26,30 @@ def create_trajectories(dt: float, t_final: float) -> TimeAndInputTrajectories:
         theta_0 = np.zeros(t.shape)
     )
 
-def create_hilly_trajectory(flat_trajectory: TimeAndInputTrajectories):
-    T = flat_trajectory.t
-    theta_hill = [
-        0 if t <= 5 else
-        4. / 180. * np.pi * (t - 5) if t <= 6 else
-        4. / 180. * np.pi for t in T]
+def _trajectory_chunk(span: ChunkSpan, dt: float, t_final: float) -> TimeAndInputTrajectories:
+    t = chunk_time(span, t_final, sample_count(t_final, dt))
+    return TimeAndInputTrajectories(
+        t       = t,
+        v_ref   = 20 * np.ones(t.shape),
+        gear    = 4 * np.ones(t.shape),
+        theta_0 = np.zeros(t.shape)
+    )
+
+def trajectory_chunk(index: int, dt: float, t_final: float, chunk_size: int = DEFAULT_CHUNK_SIZE) -> TimeAndInputTrajectories:
+    return _trajectory_chunk(chunk_span(index, sample_count(t_final, dt), chunk_size), dt, t_final)
+
+def stream_trajectories(dt: float, t_final: float, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[TimeAndInputTrajectories]:
+    """create_trajectories in chunks of at most chunk_size samples"""
+    for span in chunk_spans(sample_count(t_final, dt), chunk_size):
+        yield _trajectory_chunk(span, dt, t_final)
+
+def create_hilly_trajectory(flat_trajectory: TimeAndInputTrajectories, profile: RoadProfile | None = None):
+    profile = hill_profile() if profile is None else profile
     return TimeAndInputTrajectories(
         t = flat_trajectory.t,
         v_ref=flat_trajectory.v_ref,
         gear=flat_trajectory.gear,
-        theta_0=np.array(theta_hill)
+        theta_0=profile(flat_trajectory.t)
     )
 
 def find_equilibrium(vehicle_plant: control.InputOutputSystem, v_ref: float, gear: float, theta: float):
@@ -44,12 +61,33 @@ def create_closed_loop_system() -> control.InputOutputSystem:
     x_eq, u_eq = find_equilibrium(vehicle_plant, 20, 4, 0)
     print(f"X equilibrium {x_eq}")
     print(f"u equilibrium {u_eq}")
-    linearized_vehicle_plant = control.linearize(vehicle_plant, x_eq, [u_eq[0],4, 0])
+    linearized_vehicle_plant = linearize_analytic(vehicle_dynamics, x_eq, [u_eq[0], 4, 0], C=np.eye(1), system=vehicle_plant)
     print(linearized_vehicle_plant)
     controller_gains = generate_controller_gains(linearized_vehicle_plant)
     print(controller_gains)
 
 
+def create_gain_scheduled_closed_loop_system(table: TrimTable | None = None) -> control.InterconnectedSystem:
+    table = load_or_compute_trim_table() if table is None else table
+    vehicle_plant = VehicleDynamics().as_non_linear_io_system()
+    controller = GainScheduledController(GainSchedule(table)).as_non_linear_io_system()
+    return control.interconnect(
+        [vehicle_plant, controller],
+        inplist=["v_ref", "gear", "theta"],
+        outlist=["v", "u"],
+        name="GainScheduledCruiseControl"
+    )
+
+def simulate_gain_scheduled_hill_climb(dt: float = 0.01, t_final: float = 25) -> control.TimeResponseData:
+    trajectory = create_hilly_trajectory(create_trajectories(dt=dt, t_final=t_final))
+    closed_loop = create_gain_scheduled_closed_loop_system()
+    return control.input_output_response(
+        closed_loop, trajectory.t,
+        np.vstack([trajectory.v_ref, trajectory.gear, trajectory.theta_0]),
+        X0=[trajectory.v_ref[0], 0]
+    )
+
+
 if __name__ == "__main__":
     print(create_trajectories(dt=0.01, t_final=25))
     create_closed_loop_system()
\ No newline at end of file
@@ -1,7 +1,10 @@
 import control
+import dataclasses
 from typing import NamedTuple
 import numpy as np
 
+from trim_table import GainSchedule
+
 
 class StateSpaceIntegralController:
     k:   float | np.ndarray
@@ -46,4 +49,30 @@ def generate_controller_gains(lineaerized_system: control.StateSpace) -> Control
         K = K,
         K_I = 0.1,
         K_F = -1/(C * np.linalg.inv(A - B * K) * B)
-    )
\ No newline at end of file
+    )
+
+
+@dataclasses.dataclass
+class GainScheduledController:
+    """
+    PI speed controller around the trim throttle, with trim and gains looked up from the trim
+    table at the current reference speed, gear and grade
+    """
+    schedule: GainSchedule
+
+    def __update(self, t, z: np.ndarray, u: np.ndarray, params: dict) -> np.ndarray:
+        v, v_ref, gear, theta = u
+        return np.array([v - v_ref])
+
+    def __output(self, t, z: np.ndarray, u: np.ndarray, params: dict) -> np.ndarray:
+        v, v_ref, gear, theta = u
+        point = self.schedule(v_ref, gear, theta)
+        return np.array([point.throttle - point.k * (v - v_ref) - point.k_i * z[0]])
+
+    def as_non_linear_io_system(self) -> control.NonlinearIOSystem:
+        return control.NonlinearIOSystem(
+            self.__update, self.__output, name="GainScheduledController",
+            inputs=("v", "v_ref", "gear", "theta"),
+            outputs=("u", ),
+            states=("z", )
+        )
@@ -0,0 +1,49 @@
+import dataclasses
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+
+class GradeSegment(NamedTuple):
+    length: float       # along the profile axis, time or distance
+    end_grade: float    # road angle in rad reached at the end of the segment
+
+
+@dataclasses.dataclass
+class RoadProfile:
+    """
+    Piecewise linear road grade through the knots (position, grade). The grade is held constant
+    before the first and after the last knot, and evaluation is a single np.interp call so whole
+    drive cycles are evaluated at once
+    """
+    positions: np.ndarray = dataclasses.field()
+    grades: np.ndarray = dataclasses.field()
+
+    def __post_init__(self):
+        self.positions = np.asarray(self.positions, dtype=float)
+        self.grades = np.asarray(self.grades, dtype=float)
+        if self.positions.shape != self.grades.shape or self.positions.ndim != 1:
+            raise ValueError("positions and grades must be one dimensional and of equal length")
+        if np.any(np.diff(self.positions) < 0):
+            raise ValueError("positions must be non decreasing")
+
+    @classmethod
+    def from_segments(cls, segments: Sequence[GradeSegment], start: float = 0, start_grade: float = 0) -> "RoadProfile":
+        """
+        Chains segments that each ramp linearly from the previous grade to their end grade. A
+        segment with an unchanged grade is a constant stretch
+        """
+        lengths = np.array([segment.length for segment in segments], dtype=float)
+        end_grades = np.array([segment.end_grade for segment in segments], dtype=float)
+        return cls(
+            positions=start + np.r_[0, np.cumsum(lengths)],
+            grades=np.r_[start_grade, end_grades]
+        )
+
+    def __call__(self, position: float | np.ndarray) -> np.ndarray:
+        return np.interp(position, self.positions, self.grades)
+
+
+def hill_profile(start: float = 5, ramp_length: float = 1, grade: float = 4. / 180. * np.pi) -> RoadProfile:
+    """Flat road up to `start`, then a linear ramp up to a constant grade"""
+    return RoadProfile.from_segments([GradeSegment(start, 0), GradeSegment(ramp_length, grade)])
@@ -1,13 +1,14 @@
 import control
 import dataclasses
-from math import copysign, sin
 from typing import Callable
 
 import numpy as np
 
+from utils.jacobians import Jacobians, stack_jacobian
 
-def sign(x: float | np.ndarray) -> float:
-    return copysign(1, x)
+
+def sign(x: float | np.ndarray) -> float | np.ndarray:
+    return np.copysign(1, x)
 
 @dataclasses.dataclass
 class MotorTorqueFunctor:
@@ -18,6 +19,10 @@ class MotorTorqueFunctor:
     def __call__(self, omega: float | np.ndarray) -> np.ndarray:
         return np.clip(self.tm * (1 - self.beta * (omega/self.omega_m - 1)**2), 0, None)
 
+    def derivative(self, omega: float | np.ndarray) -> np.ndarray:
+        d_torque = -2 * self.tm * self.beta * (omega/self.omega_m - 1) / self.omega_m
+        return np.where(self(omega) > 0, d_torque, 0)
+
 motor_torque = MotorTorqueFunctor()
 
 @dataclasses.dataclass
@@ -32,19 +37,42 @@ class VehicleDynamics:
     # motor_torque: Callable[[float], np.ndarray] = dataclasses.field(default=MotorTorqueFunctor())
 
     def vehicle_update(self, t, x:np.ndarray, u: np.ndarray, params: dict) -> np.ndarray:
+        """
+        Acceleration of the vehicle. Works on single samples as well as on batches, e.g. x of
+        shape (N, ) with u of shape (3, N) holding throttle, gear and grade per sample
+        """
         throttle, gear, theta = u
         velocity = x
         throttle = np.clip(throttle, 0, 1)
-        omega = self.alpha[int(gear) - 1] * velocity
-        f = self.alpha[int(gear) - 1] * motor_torque(omega) * throttle
+        alpha = np.take(self.alpha, np.asarray(gear).astype(int) - 1)
+        omega = alpha * velocity
+        f = alpha * motor_torque(omega) * throttle
 
-        f_g = self.m * self.g * sin(theta)
+        f_g = self.m * self.g * np.sin(theta)
         f_t = self.m * self.g * self.c_r * sign(velocity)
-        f_a = 1/2 * self.rho * self.c_d * self.A * abs(velocity) * velocity
+        f_a = 1/2 * self.rho * self.c_d * self.A * np.abs(velocity) * velocity
         f_disturbance = f_g + f_t + f_a
         return ( f - f_disturbance)/self.m
 
 
+    def jacobians(self, x: np.ndarray, u: np.ndarray) -> Jacobians:
+        """
+        Exact derivatives of vehicle_update w.r.t. the velocity and (throttle, gear, theta). The
+        gear is discrete and the throttle derivative vanishes where the throttle saturates
+        """
+        throttle, gear, theta = u
+        velocity = x[0]
+        alpha = np.take(self.alpha, np.asarray(gear).astype(int) - 1)
+        omega = alpha * velocity
+        throttle_active = (throttle >= 0) & (throttle < 1)
+        d_velocity = (alpha**2 * motor_torque.derivative(omega) * np.clip(throttle, 0, 1)
+                      - self.rho * self.c_d * self.A * np.abs(velocity)) / self.m
+        d_throttle = np.where(throttle_active, alpha * motor_torque(omega) / self.m, 0)
+        return Jacobians(
+            A=stack_jacobian([[d_velocity]]),
+            B=stack_jacobian([[d_throttle, 0, -self.g * np.cos(theta)]])
+        )
+
     def as_non_linear_io_system(self) -> control.NonlinearIOSystem:
         return control.NonlinearIOSystem(
             self.vehicle_update, None, name="Vehicle",
@@ -0,0 +1,183 @@
+import concurrent.futures
+import dataclasses
+import os
+import pathlib
+from typing import NamedTuple
+
+import control
+import numpy as np
+from scipy import interpolate
+
+from system_dynamics import VehicleDynamics
+from utils.jacobians import cached_jacobians
+
+CACHE_DIRECTORY: pathlib.Path = pathlib.Path(os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")) / "control_scripts"
+TRIM_TABLE_LOCATION: pathlib.Path = CACHE_DIRECTORY / "trim_table.npz"
+
+
+class TrimTask(NamedTuple):
+    vehicle: VehicleDynamics
+    v: float
+    gear: float
+    theta: float
+
+
+class TrimPoint(NamedTuple):
+    throttle: float
+    converged: bool
+
+
+class ScheduledOperatingPoint(NamedTuple):
+    throttle: float | np.ndarray
+    k: float | np.ndarray       # proportional gain on the speed error
+    k_i: float | np.ndarray     # integral gain
+
+
+@dataclasses.dataclass
+class TrimGrid:
+    speeds: np.ndarray = dataclasses.field(default_factory=lambda : np.linspace(5, 45, 17))
+    gears: np.ndarray = dataclasses.field(default_factory=lambda : np.arange(1, 6, dtype=float))
+    grades: np.ndarray = dataclasses.field(default_factory=lambda : np.deg2rad(np.linspace(-8, 8, 9)))
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.speeds.shape[0], self.gears.shape[0], self.grades.shape[0]
+
+    def matches(self, other: "TrimGrid") -> bool:
+        return all(
+            np.array_equal(getattr(self, axis), getattr(other, axis)) for axis in ("speeds", "gears", "grades")
+        )
+
+
+@dataclasses.dataclass
+class SchedulingDesign:
+    """Closed loop s^2 + 2 zeta omega s + omega^2 placed at every trim point"""
+    omega: float = dataclasses.field(default=0.5)
+    zeta: float = dataclasses.field(default=0.9)
+
+    def gains(self, A: np.ndarray, B_throttle: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        With v' = a dv + b du, z' = dv and du = -k dv - k_i z the loop is
+        s^2 + (b k - a) s + b k_i, which is matched to the design polynomial
+        """
+        a, b = A, B_throttle
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k = np.where(b > 0, (2 * self.zeta * self.omega + a) / b, 0)
+            k_i = np.where(b > 0, self.omega**2 / b, 0)
+        return k, k_i
+
+
+def solve_trim(task: TrimTask) -> TrimPoint:
+    plant = task.vehicle.as_non_linear_io_system()
+    operating_point = control.find_eqpt(
+        plant, [task.v], [0.5, task.gear, task.theta], y0=[task.v], iu=[1, 2], return_result=True
+    )
+    throttle = float(np.clip(operating_point.inputs[0], 0, 1))
+    converged = bool(operating_point.result.success) and 0 <= operating_point.inputs[0] <= 1
+    return TrimPoint(throttle=throttle, converged=converged)
+
+
+@dataclasses.dataclass
+class TrimTable:
+    """
+    Trim throttle and linearization of the vehicle over a (speed, gear, grade) grid. Points where
+    the required throttle saturates keep the saturated throttle and are flagged in `converged`
+    """
+    grid: TrimGrid
+    throttle: np.ndarray        # (n_speeds, n_gears, n_grades)
+    A: np.ndarray               # (n_speeds, n_gears, n_grades)
+    B: np.ndarray               # (n_speeds, n_gears, n_grades, 3)
+    converged: np.ndarray       # (n_speeds, n_gears, n_grades)
+
+    def save(self, path: pathlib.Path = TRIM_TABLE_LOCATION) -> None:
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            speeds=self.grid.speeds, gears=self.grid.gears, grades=self.grid.grades,
+            throttle=self.throttle, A=self.A, B=self.B, converged=self.converged
+        )
+
+    @classmethod
+    def load(cls, path: pathlib.Path = TRIM_TABLE_LOCATION) -> "TrimTable":
+        with np.load(path) as stored:
+            return cls(
+                grid=TrimGrid(stored["speeds"], stored["gears"], stored["grades"]),
+                throttle=stored["throttle"], A=stored["A"], B=stored["B"], converged=stored["converged"]
+            )
+
+
+def compute_trim_table(vehicle: VehicleDynamics | None = None,
+                       grid: TrimGrid | None = None,
+                       max_workers: int | None = None) -> TrimTable:
+    vehicle = VehicleDynamics() if vehicle is None else vehicle
+    grid = TrimGrid() if grid is None else grid
+    tasks = [
+        TrimTask(vehicle, float(v), float(gear), float(theta))
+        for v in grid.speeds for gear in grid.gears for theta in grid.grades
+    ]
+    max_workers = max_workers if max_workers else os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        points = list(executor.map(solve_trim, tasks, chunksize=max(1, len(tasks) // (4 * max_workers))))
+    throttle = np.array([point.throttle for point in points]).reshape(grid.shape)
+    speeds, gears, grades = np.meshgrid(grid.speeds, grid.gears, grid.grades, indexing="ij")
+    # every trim point linearized in one batched evaluation of the exact Jacobians
+    A, B = cached_jacobians(vehicle, speeds[None], np.stack([throttle, gears, grades]))
+    return TrimTable(
+        grid=grid,
+        throttle=throttle,
+        A=A[..., 0, 0],
+        B=B[..., 0, :],
+        converged=np.array([point.converged for point in points]).reshape(grid.shape)
+    )
+
+
+def load_or_compute_trim_table(path: pathlib.Path = TRIM_TABLE_LOCATION,
+                               grid: TrimGrid | None = None,
+                               max_workers: int | None = None) -> TrimTable:
+    """
+    Loads the table stored at `path` when it was computed on `grid`, otherwise computes it and
+    stores it there. The default location is the user cache directory, outside the source tree
+    """
+    grid = TrimGrid() if grid is None else grid
+    if pathlib.Path(path).exists():
+        table = TrimTable.load(path)
+        if table.grid.matches(grid):
+            return table
+    table = compute_trim_table(grid=grid, max_workers=max_workers)
+    table.save(path)
+    return table
+
+
+@dataclasses.dataclass
+class GainSchedule:
+    """
+    Trim throttle and controller gains interpolated linearly in speed and grade, at the nearest
+    gear of the table. Queries outside the grid are clamped to its edges
+    """
+    table: TrimTable
+    design: SchedulingDesign = dataclasses.field(default_factory=SchedulingDesign)
+    __interpolators: list[interpolate.RegularGridInterpolator] = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        grid = self.table.grid
+        k, k_i = self.design.gains(self.table.A, self.table.B[..., 0])
+        values = np.stack([self.table.throttle, k, k_i], axis=-1)     # (n_speeds, n_gears, n_grades, 3)
+        self.__interpolators = [
+            interpolate.RegularGridInterpolator((grid.speeds, grid.grades), values[:, i], method="linear")
+            for i in range(grid.gears.shape[0])
+        ]
+
+    def __call__(self, v: float | np.ndarray, gear: float | np.ndarray, theta: float | np.ndarray) -> ScheduledOperatingPoint:
+        grid = self.table.grid
+        v, gear, theta = np.broadcast_arrays(np.asarray(v, dtype=float), np.asarray(gear, dtype=float), np.asarray(theta, dtype=float))
+        points = np.stack([
+            np.clip(v, grid.speeds[0], grid.speeds[-1]),
+            np.clip(theta, grid.grades[0], grid.grades[-1])
+        ], axis=-1)
+        gear_index = np.abs(gear[..., None] - grid.gears).argmin(axis=-1)
+        values = np.empty(v.shape + (3, ))
+        for i in np.unique(gear_index):
+            selected = gear_index == i
+            values[selected] = self.__interpolators[i](points[selected])
+        return ScheduledOperatingPoint(*np.moveaxis(values, -1, 0))
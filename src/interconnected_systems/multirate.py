@@ -0,0 +1,163 @@
+import dataclasses
+import heapq
+from typing import Callable, Mapping, Sequence
+
+import control
+import numpy as np
+
+from utils.linear_simulation import ExactDiscretization, LinearTimeInvariant, as_state_space, zoh_discretize
+
+Reference = Callable[[float], float | np.ndarray] | float
+
+_TIME_RESOLUTION: int = 9    # event times are snapped to 1 ns so coinciding ticks of different loops coincide exactly
+
+
+def _snap(t: float) -> float:
+    return round(float(t), _TIME_RESOLUTION)
+
+
+@dataclasses.dataclass
+class DiscreteLoop:
+    """
+    A discrete time controller sampling named signals every controller.dt and writing named
+    plant inputs, which are held until its next tick
+    :param controller: discrete time StateSpace or TransferFunction
+    :param signals: names of plant outputs, references or outputs of other loops that are read
+    :param outputs: plant inputs (or intermediate signals) written from the controller outputs
+    :param input_matrix: maps the read signals onto the controller inputs, identity when None.
+        E.g. [[1, -1]] with signals ["r", "y"] feeds the error r - y
+    :param offset: time of the first tick
+    """
+    controller: control.StateSpace | control.TransferFunction
+    signals: list[str]
+    outputs: list[str]
+    input_matrix: np.ndarray | None = dataclasses.field(default=None)
+    offset: float = dataclasses.field(default=0)
+
+    def __post_init__(self):
+        assert control.isdtime(self.controller, True), "Controller Must be in discrete time"
+        self.controller = control.ss(self.controller)
+        if self.input_matrix is None:
+            self.input_matrix = np.eye(len(self.signals))
+        self.input_matrix = np.atleast_2d(np.asarray(self.input_matrix, dtype=float))
+        assert self.input_matrix.shape == (self.controller.ninputs, len(self.signals)), \
+            "input_matrix must map the signals onto the controller inputs"
+        assert len(self.outputs) == self.controller.noutputs, "One name per controller output is required"
+
+    @property
+    def dt(self) -> float:
+        return self.controller.dt
+
+
+@dataclasses.dataclass
+class MultirateScheduler:
+    """
+    Sampled data simulation of a continuous LTI plant with any number of discrete loops at
+    different rates. The plant is propagated exactly between consecutive sample instants,
+    as its inputs are held constant there, and every loop fires at the exact multiples of its
+    own sample time. Loops due at the same instant fire in list order, so an outer loop listed
+    first feeds an inner one within the same instant
+    """
+    plant: control.StateSpace | LinearTimeInvariant
+    loops: list[DiscreteLoop]
+    __discretizations: dict[float, ExactDiscretization] = dataclasses.field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        self.plant = as_state_space(self.plant)
+        if control.isdtime(self.plant, strict=True):
+            raise ValueError("The plant must be continuous time")
+
+    def __propagator(self, h: float) -> ExactDiscretization:
+        key = _snap(h)
+        if key not in self.__discretizations:
+            self.__discretizations[key] = zoh_discretize(self.plant.A, self.plant.B, h)
+        return self.__discretizations[key]
+
+    @staticmethod
+    def __evaluate(reference: Reference, t: float) -> float | np.ndarray:
+        return reference(t) if callable(reference) else reference
+
+    def simulate(self,
+                 t_final: float,
+                 references: Mapping[str, Reference] | None = None,
+                 X0: np.ndarray | float = 0.,
+                 t_output: Sequence[float] | np.ndarray | None = None) -> control.TimeResponseData:
+        """
+        :param t_final: end of the simulation
+        :param references: exogenous signals by name, callables of time or constants. Plant
+            inputs that no loop writes are read from here, and default to zero
+        :param X0: initial plant state
+        :param t_output: instants at which the response is recorded, every sample instant of
+            every loop when None
+        :return: plant outputs followed by the loop outputs, with the plant states
+        """
+        references = {} if references is None else dict(references)
+        plant = self.plant
+        x = np.broadcast_to(np.asarray(X0, dtype=float), (plant.nstates, )).copy()
+        loop_states = [np.zeros(loop.controller.nstates) for loop in self.loops]
+        written = [name for loop in self.loops for name in loop.outputs]
+        held: dict[str, float] = {name: 0. for name in written}
+        recorded_names = list(plant.output_labels) + written
+
+        # (time, priority, counter, loop index) with loops ahead of recording at equal times
+        events: list[tuple[float, int, int, int]] = []
+        ticks = [0] * len(self.loops)
+        for index, loop in enumerate(self.loops):
+            if loop.offset <= t_final:
+                heapq.heappush(events, (_snap(loop.offset), 0, index, index))
+        record_times = None if t_output is None else np.asarray(t_output, dtype=float)
+        if record_times is not None:
+            for j, t_record in enumerate(record_times):
+                heapq.heappush(events, (_snap(t_record), 1, j, -1))
+
+        def plant_inputs(t: float) -> np.ndarray:
+            return np.array([
+                held[name] if name in held else float(self.__evaluate(references.get(name, 0.), t))
+                for name in plant.input_labels
+            ])
+
+        def signal_values(t: float, u: np.ndarray) -> dict[str, float]:
+            y = plant.C @ x + plant.D @ u
+            values = dict(zip(plant.output_labels, y))
+            values.update(held)
+            return values
+
+        times, outputs, states = [], [], []
+        t = 0.
+        while events:
+            t_event, priority, _, index = heapq.heappop(events)
+            if t_event > t:
+                u = plant_inputs(t)
+                step = self.__propagator(t_event - t)
+                x = step.Phi @ x + step.Gamma @ u
+                t = t_event
+            u = plant_inputs(t)
+            if priority == 0:
+                loop = self.loops[index]
+                values = signal_values(t, u)
+                values.update({name: self.__evaluate(reference, t) for name, reference in references.items() if name not in values})
+                e = loop.input_matrix @ np.array([values[name] for name in loop.signals], dtype=float)
+                controller = loop.controller
+                z = loop_states[index]
+                held.update(zip(loop.outputs, controller.C @ z + controller.D @ e))
+                loop_states[index] = controller.A @ z + controller.B @ e
+                ticks[index] += 1
+                t_next = _snap(loop.offset + ticks[index] * loop.dt)
+                if t_next <= _snap(t_final):
+                    heapq.heappush(events, (t_next, 0, index, index))
+                if record_times is not None:
+                    continue
+                # record once all loops due at this instant have fired
+                if events and events[0][1] == 0 and events[0][0] == t:
+                    continue
+            u = plant_inputs(t)
+            values = signal_values(t, u)
+            times.append(t)
+            outputs.append([values[name] for name in recorded_names])
+            states.append(x.copy())
+
+        return control.TimeResponseData(
+            np.array(times), np.array(outputs).T, np.array(states).T,
+            output_labels=recorded_names, state_labels=list(plant.state_labels),
+            title="Multirate simulation", transpose=False, issiso=False
+        )
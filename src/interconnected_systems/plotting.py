@@ -1,14 +1,15 @@
 import control
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from matplotlib.axes import Axes
+from typing import TYPE_CHECKING
 
 from systems import PlantFactory, SampledDataController, SIMULATION_DT, create_closed_loop_system, DelaySystem
-matplotlib.use("TkAgg")
-plt.style.use("bmh")
-plt.rcParams.update({"font.size": 8})
+from utils.plot_style import lazy_pyplot
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+    from matplotlib.axes import Axes
+
+plt = lazy_pyplot(style="bmh", rc={"font.size": 8})
 
 def plot_continuous_vs_discrete_plant(plant_factory: PlantFactory = PlantFactory(dt=0.01)) -> None :
     plant = plant_factory.create()
@@ -1,7 +1,9 @@
 import dataclasses
 import control
 import numpy as np
-from typing import TypeAlias
+from typing import Sequence, TypeAlias
+
+from multirate import DiscreteLoop, MultirateScheduler
 
 SIMULATION_DT = 0.02
 
@@ -70,6 +72,14 @@ def create_closed_loop_system() -> control.InputOutputSystem:
         inputs="r", outputs=["y", "u"])
     return closed_loop_simulator
 
+def create_multirate_closed_loop(controller_ts: float = 0.2) -> MultirateScheduler:
+    """The loop of create_closed_loop_system, with the plant propagated exactly between controller ticks"""
+    controller = control.tf(1, [1, -.9], controller_ts, inputs='e', outputs='u')
+    return MultirateScheduler(
+        plant=control.ss(PlantFactory.create()),
+        loops=[DiscreteLoop(controller, signals=["r", "y"], outputs=["u"], input_matrix=np.array([[1, -1]]))]
+    )
+
 
 @dataclasses.dataclass
 class DelaySystem:
@@ -90,6 +100,66 @@ class DelaySystem:
         return control.ss(A, B, C, D, self.dt, inputs=self.inputs, outputs=self.outputs)
 
 
+@dataclasses.dataclass
+class RingBufferDelay:
+    """
+    Discrete transport delay of any number of channels, each by its own whole number of
+    samples, held in a ring buffer. The only block state is the write position, so a step costs
+    O(channels) regardless of the delay. The slot written at a step is never the one read at
+    that step, so repeated output evaluations of the same state agree
+    """
+    delay: float | Sequence[float]
+    dt: float
+    inputs: list[str]
+    outputs: list[str]
+    initial_value: float = dataclasses.field(default=0.)
+    name: str = dataclasses.field(default="RingBufferDelay")
+    steps: np.ndarray = dataclasses.field(init=False)
+    __channels: np.ndarray = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        assert len(self.inputs) == len(self.outputs), "Every delayed input needs an output"
+        self.steps = np.broadcast_to(np.rint(np.asarray(self.delay) / self.dt).astype(int), (len(self.inputs), )).copy()
+        assert np.all(self.steps >= 0), "System must have a positive delay"
+        self.__channels = np.arange(len(self.inputs))
+
+    @property
+    def size(self) -> int:
+        return int(self.steps.max()) + 1
+
+    def generate_system(self) -> control.NonlinearIOSystem:
+        """
+        A system with a buffer of its own. The buffer lives outside the system state, so it is
+        cleared whenever a call is earlier in time than the previous one: every simulation of the
+        system starts from the initial value
+        """
+        steps, size, channels, initial_value = self.steps.copy(), self.size, self.__channels, self.initial_value
+        buffer = np.full((size, len(self.inputs)), initial_value, dtype=float)
+        last_time = [-np.inf]
+
+        def restart_on_rewind(t: float) -> None:
+            if t < last_time[0]:
+                buffer[:] = initial_value
+            last_time[0] = t
+
+        def update(t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
+            restart_on_rewind(t)
+            head = int(x[0])
+            buffer[head] = u
+            return np.array([(head + 1) % size])
+
+        def output(t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
+            restart_on_rewind(t)
+            head = int(x[0])
+            delayed = buffer[(head - steps) % size, channels]
+            return np.where(steps == 0, u, delayed)
+
+        return control.NonlinearIOSystem(
+            update, output, name=self.name,
+            inputs=self.inputs, outputs=self.outputs, states=["head"], dt=self.dt
+        )
+
+
 
 
 if __name__ == "__main__":
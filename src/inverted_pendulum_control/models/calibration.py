@@ -0,0 +1,159 @@
+import dataclasses
+import pathlib
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .inverted_pendulum_model import InvertedPendulum, pendulum_dynamics
+from utils.result_store import is_columnar_result, load_columnar_result
+
+PARAMETER_NAMES: tuple[str, ...] = ("m", "M", "l", "g", "d")
+STATE_COLUMNS: tuple[str, ...] = ("PendulumPlant_x", "PendulumPlant_v", "PendulumPlant_theta", "PendulumPlant_theta_dot")
+MEASURED_STATE_COLUMNS: tuple[str, ...] = ("x", "v", "theta", "theta_dot")
+
+
+class RecordedRun(NamedTuple):
+    t: np.ndarray           # (N, )
+    x: np.ndarray           # (4, N) x, v, theta, theta_dot
+    u_force: np.ndarray     # (N, )
+
+
+class ParameterCandidates(NamedTuple):
+    m: np.ndarray
+    M: np.ndarray
+    l: np.ndarray
+    g: np.ndarray
+    d: np.ndarray
+
+    @property
+    def n_candidates(self) -> int:
+        return self.m.shape[0]
+
+    def take(self, index: slice | np.ndarray) -> "ParameterCandidates":
+        return ParameterCandidates(*(values[index] for values in self))
+
+    def as_plant(self, index: int) -> InvertedPendulum:
+        return InvertedPendulum(**{name: float(getattr(self, name)[index]) for name in PARAMETER_NAMES})
+
+
+class CalibrationResult(NamedTuple):
+    best: InvertedPendulum
+    candidates: ParameterCandidates
+    cost: np.ndarray        # (K, ) one entry per candidate
+
+
+@dataclasses.dataclass
+class ParameterBounds:
+    m: tuple[float, float] = dataclasses.field(default=(1, 20))
+    M: tuple[float, float] = dataclasses.field(default=(0.5, 5))
+    l: tuple[float, float] = dataclasses.field(default=(0.5, 4))
+    g: tuple[float, float] = dataclasses.field(default=(9.7, 9.9))
+    d: tuple[float, float] = dataclasses.field(default=(0, 1))
+
+
+def load_recorded_run(path: pathlib.Path) -> RecordedRun:
+    """
+    Loads a run saved by the stabilization runner. The true plant states are used when the
+    recording has them, otherwise the (noisy) measured outputs are used
+    :param path: columnar result directory, or csv written from TimeResponseData.to_pandas
+    :return: recorded time, state and forcing
+    """
+    if is_columnar_result(path):
+        result = load_columnar_result(path)
+        columns = STATE_COLUMNS if set(STATE_COLUMNS).issubset(result.columns) else MEASURED_STATE_COLUMNS
+        return RecordedRun(t=result["time"], x=result.stack(columns), u_force=result["u_force"])
+    data = pd.read_csv(path)
+    columns = STATE_COLUMNS if set(STATE_COLUMNS).issubset(data.columns) else MEASURED_STATE_COLUMNS
+    return RecordedRun(
+        t=data["time"].to_numpy(),
+        x=data.loc[:, list(columns)].to_numpy().T,
+        u_force=data["u_force"].to_numpy()
+    )
+
+
+def sample_parameter_candidates(n: int, bounds: ParameterBounds = ParameterBounds(), seed: int | None = None) -> ParameterCandidates:
+    rng = np.random.default_rng(seed)
+    return ParameterCandidates(*(
+        rng.uniform(*getattr(bounds, name), size=n) for name in PARAMETER_NAMES
+    ))
+
+
+def batched_state_update(x: np.ndarray, u_force: float | np.ndarray, candidates: ParameterCandidates) -> np.ndarray:
+    """
+    Pendulum derivatives for every candidate at once
+    :param x: states of shape (4, K, ...) where K is the number of candidates
+    :param u_force: forcing broadcastable against x[0]
+    :param candidates: K parameter sets
+    :return: derivatives of shape (4, K, ...)
+    """
+    extra_axes = (slice(None), ) + (None, ) * (x.ndim - 2)
+    m, M, l, g, d = (values[extra_axes] for values in candidates)
+    return pendulum_dynamics(x, u_force, m, M, l, g, d)
+
+
+def prediction_residuals(run: RecordedRun, candidates: ParameterCandidates, horizon: int = 1) -> np.ndarray:
+    """
+    Splits the recording into windows of `horizon` samples, starts every window from the
+    recorded state and integrates all candidates over all windows together with RK4 on the
+    recorded grid. The forcing is interpolated linearly between samples
+    :param run: recorded run
+    :param candidates: K parameter sets
+    :param horizon: number of samples predicted from each recorded state
+    :return: normalised mean squared prediction error per candidate (K, )
+    """
+    n_samples = run.t.shape[0]
+    n_windows = (n_samples - 1) // horizon
+    starts = np.arange(n_windows) * horizon
+    scale = np.var(run.x, axis=1)[:, None, None] + np.finfo(float).eps
+
+    x = np.broadcast_to(run.x[:, None, starts], (4, candidates.n_candidates, n_windows)).copy()
+    cost = np.zeros(candidates.n_candidates)
+    for step in range(horizon):
+        k = starts + step
+        dt = run.t[k + 1] - run.t[k]
+        u_0, u_1 = run.u_force[k], run.u_force[k + 1]
+        u_half = 0.5 * (u_0 + u_1)
+        k_1 = batched_state_update(x, u_0, candidates)
+        k_2 = batched_state_update(x + 0.5 * dt * k_1, u_half, candidates)
+        k_3 = batched_state_update(x + 0.5 * dt * k_2, u_half, candidates)
+        k_4 = batched_state_update(x + dt * k_3, u_1, candidates)
+        x += dt / 6 * (k_1 + 2 * k_2 + 2 * k_3 + k_4)
+        cost += np.mean((x - run.x[:, None, k + 1])**2 / scale, axis=(0, 2))
+    return cost / horizon
+
+
+def calibrate_inverted_pendulum(run: RecordedRun,
+                                candidates: ParameterCandidates,
+                                horizon: int = 1,
+                                chunk_size: int = 256) -> CalibrationResult:
+    """
+    Scores every candidate against the recording and returns the best fitting plant.
+    Candidates are evaluated `chunk_size` at a time to keep the working arrays small
+    :param run: recorded run
+    :param candidates: parameter sets to evaluate
+    :param horizon: prediction horizon in samples, see prediction_residuals
+    :param chunk_size: number of candidates integrated together
+    :return: calibration result
+    """
+    cost = np.empty(candidates.n_candidates)
+    for start in range(0, candidates.n_candidates, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        cost[chunk] = prediction_residuals(run, candidates.take(chunk), horizon=horizon)
+    cost[~np.isfinite(cost)] = np.inf
+    return CalibrationResult(
+        best=candidates.as_plant(int(np.argmin(cost))),
+        candidates=candidates,
+        cost=cost
+    )
+
+
+if __name__ == "__main__":
+    recorded_run = load_recorded_run(pathlib.Path(__file__).parent.parent / "data/stabilization_simulation.csv")
+    result = calibrate_inverted_pendulum(
+        recorded_run,
+        sample_parameter_candidates(4000, seed=0),
+        horizon=10
+    )
+    print(result.best)
+    print(f"Best cost {np.min(result.cost)}")
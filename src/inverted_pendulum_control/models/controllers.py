@@ -2,6 +2,15 @@ import control
 import dataclasses
 import numpy as np
 import abc
+from typing import NamedTuple
+
+from utils.gain_cache import cached_lqr
+
+
+class LQRWeights(NamedTuple):
+    Q: np.ndarray
+    R: np.ndarray
+
 
 @dataclasses.dataclass
 class LQRController(abc.ABC):
@@ -9,9 +18,12 @@ class LQRController(abc.ABC):
     Q: np.ndarray = dataclasses.field(default_factory= lambda :np.diag([1000, 1000, 1000, 1000])) # x, v, theta, theta_dot
     R: np.ndarray = dataclasses.field(default_factory= lambda :0.001*np.eye(5))                   # forcing penalty, _, _, _, _
     K: np.ndarray = dataclasses.field(init=False)
+    verbose: bool = dataclasses.field(default=True)
 
     def __post_init__(self):
-        self.K, _, _ = control.lqr(self.plant.A, self.plant.B, self.Q, self.R)
+        self.K, _, _ = cached_lqr(self.plant.A, self.plant.B, self.Q, self.R)
+        if not self.verbose:
+            return
         eigen_values = np.linalg.eigvals(self.plant.A - self.plant.B @ self.K)
         print("-----" * 30)
         print("Controller Properties")
@@ -54,10 +66,11 @@ class LQR_CommandFollowind_Controller(LQRController):
     def __post_init__(self):
         super().__post_init__()
         A, B, C = self.plant.A, self.plant.B, self.plant.C
-        print(f"{C.shape=}")
-        print(B)
-        print(B.shape)
-        print(f"{(A - B @ self.K).shape=}")
+        if self.verbose:
+            print(f"{C.shape=}")
+            print(B)
+            print(B.shape)
+            print(f"{(A - B @ self.K).shape=}")
         self.K2 = -C @ np.linalg.inv(A - B @ self.K) @ B # Formula for calculating the static gain of this signal
         self.K2 = np.linalg.pinv(self.K2)
 
@@ -1,13 +1,15 @@
 import control
 
 from .inverted_pendulum_model import InvertedPendulum, linearize_plant
-from .controllers import LQR_Stabilizing_Controller, LQR_CommandFollowind_Controller
+from .controllers import LQR_Stabilizing_Controller, LQR_CommandFollowind_Controller, LQRWeights
 
-def create_stabilizing_plant() -> control.NonlinearIOSystem:
+def create_stabilizing_plant(weights: LQRWeights | None = None, verbose: bool = True) -> control.NonlinearIOSystem:
     plant_factory = InvertedPendulum()
     plant_linearized = linearize_plant(plant_factory)
     pendulum_controller = LQR_Stabilizing_Controller(
-        plant=plant_linearized
+        plant=plant_linearized,
+        verbose=verbose,
+        **(weights._asdict() if weights is not None else {})
     ).as_non_linear_output_function()
     closed_loop_plant = control.interconnect(
         [plant_factory.as_non_linear_io_system_full_state_measurement(), pendulum_controller],
@@ -18,15 +20,19 @@ def create_stabilizing_plant() -> control.NonlinearIOSystem:
     return closed_loop_plant
 
 
-def create_lqr_stabilizing_and_command_following_plant() -> control.NonlinearIOSystem:
+def create_lqr_stabilizing_and_command_following_plant(weights: LQRWeights | None = None, verbose: bool = True) -> control.NonlinearIOSystem:
     """
     This function creates a lqr stability full state command following plant
+    :param weights: LQR weights, the controller defaults are used when None
+    :param verbose: print the controller properties
     :return:
     """
     plant_factory = InvertedPendulum()
     plant_linearized = linearize_plant(plant_factory)
     pendulum_controller = LQR_CommandFollowind_Controller(
-        plant=plant_linearized
+        plant=plant_linearized,
+        verbose=verbose,
+        **(weights._asdict() if weights is not None else {})
     ).as_non_linear_output_function()
     closed_loop_plant = control.interconnect(
         [plant_factory.as_non_linear_io_system_full_state_measurement(), pendulum_controller],
@@ -3,10 +3,73 @@ import numpy as np
 import dataclasses
 import enum
 
+from utils.jacobians import Jacobians, linearize_analytic, stack_jacobian
+
 class MeasurementType(enum.Enum):
     FULLSTATE: int = 1
     PARTIAL_STATE: int = 0
 
+
+def pendulum_dynamics(x: np.ndarray, u_force: float | np.ndarray,
+                      m: float | np.ndarray, M: float | np.ndarray, l: float | np.ndarray,
+                      g: float | np.ndarray, d: float | np.ndarray) -> np.ndarray:
+    """
+    Equations of motion of the cart pendulum, written so every argument broadcasts.
+    A state of shape (4, ...) evaluated against parameter arrays of a matching trailing
+    shape gives the derivatives of many plants in one pass
+    :param x: state [x, v, theta, theta_dot] stacked along the first axis
+    :param u_force: forcing applied to the cart
+    :return: state derivative with the same shape as x
+    """
+    _, v, theta, omega = x
+    s_x = np.sin(theta)
+    c_x = np.cos(theta)
+    den = m * l * l * (m + M * (1 - c_x**2))
+    beta = (m * l * omega**2 * s_x - d * v)
+    return np.stack(np.broadcast_arrays(
+        v,
+        (-(m**2 * l**2 * g * s_x * c_x) + m * l * beta + (M * l**2 * u_force)) / den,
+        omega,
+        ((m + M) * (m * g * l * s_x) - m * l * c_x * beta - m * l * c_x * u_force) / den
+    ))
+
+
+def pendulum_jacobians(x: np.ndarray, u_force: float | np.ndarray,
+                       m: float | np.ndarray, M: float | np.ndarray, l: float | np.ndarray,
+                       g: float | np.ndarray, d: float | np.ndarray) -> Jacobians:
+    """
+    Exact derivatives of pendulum_dynamics, broadcasting the same way
+    :return: A of shape (..., 4, 4) and B of shape (..., 4, 1) w.r.t. u_force
+    """
+    _, v, theta, omega = x
+    s_x = np.sin(theta)
+    c_x = np.cos(theta)
+    den = m * l * l * (m + M * (1 - c_x**2))
+    d_den = 2 * m * l * l * M * s_x * c_x
+    beta = (m * l * omega**2 * s_x - d * v)
+    n_v = -(m**2 * l**2 * g * s_x * c_x) + m * l * beta + (M * l**2 * u_force)
+    n_omega = (m + M) * (m * g * l * s_x) - m * l * c_x * beta - m * l * c_x * u_force
+
+    d_beta_d_theta = m * l * omega**2 * c_x
+    d_beta_d_omega = 2 * m * l * omega * s_x
+    d_n_v_d_theta = -(m**2 * l**2 * g * (c_x**2 - s_x**2)) + m * l * d_beta_d_theta
+    d_n_omega_d_theta = (m + M) * (m * g * l * c_x) + m * l * s_x * beta - m * l * c_x * d_beta_d_theta + m * l * s_x * u_force
+
+    A = stack_jacobian([
+        [0, 1, 0, 0],
+        [0, -m * l * d / den, (d_n_v_d_theta * den - n_v * d_den) / den**2, m * l * d_beta_d_omega / den],
+        [0, 0, 0, 1],
+        [0, m * l * c_x * d / den, (d_n_omega_d_theta * den - n_omega * d_den) / den**2, -m * l * c_x * d_beta_d_omega / den],
+    ])
+    B = stack_jacobian([
+        [0],
+        [M * l**2 / den],
+        [0],
+        [-m * l * c_x / den],
+    ])
+    return Jacobians(A=A, B=B)
+
+
 @dataclasses.dataclass
 class InvertedPendulum:
     m: float = dataclasses.field(default=10)
@@ -16,20 +79,13 @@ class InvertedPendulum:
     d: float = dataclasses.field(default=0.2)
 
     def __pendulum_state_update(self, t: float, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
-        x, v, theta, omega = x
-        u_force = u[0]
-        s_x = np.sin(theta)
-        c_x = np.cos(theta)
-        d = self.m * self.l*self.l * (self.m + self.M * (1 - c_x**2))
-        beta = (self.m*self.l*omega**2*s_x-self.d*v)
-        dx = np.array([
-            v,
-            (-(self.m**2 * self.l**2*self.g*s_x*c_x)+self.m*self.l*beta+(self.M*self.l**2*u_force))/d,
-            omega,
-            ((self.m + self.M)*(self.m*self.g*self.l*s_x) - self.m*self.l*c_x*beta-self.m*self.l*c_x*u_force)/d
-        ])
-        return dx
+        return pendulum_dynamics(x, u[0], self.m, self.M, self.l, self.g, self.d)
 
+    def jacobians(self, x: np.ndarray, u: np.ndarray) -> Jacobians:
+        """Exact Jacobians w.r.t. the state and all five inputs, the noise inputs do not enter the dynamics"""
+        A, B_force = pendulum_jacobians(x, u[0], self.m, self.M, self.l, self.g, self.d)
+        B = np.concatenate([B_force, np.zeros(B_force.shape[:-1] + (4, ))], axis=-1)
+        return Jacobians(A=A, B=B)
 
     def __pendulum_state_output(self, t: float, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
         w_n = u[1:]
@@ -65,18 +121,20 @@ def linearize_plant(inverted_pendulum_system: InvertedPendulum, measurement: Mea
     :param measurement: measurement type
     :return: inverted pendulum as a state space system
     """
-    def plant_factory(measurement_:MeasurementType) ->control.NonlinearIOSystem:
-        inner_plant = None
+    def output_matrices(measurement_: MeasurementType) -> tuple[np.ndarray, np.ndarray, control.NonlinearIOSystem]:
+        rows, system = None, None
         match measurement_:
             case MeasurementType.FULLSTATE:
-                inner_plant =  inverted_pendulum_system.as_non_linear_io_system_full_state_measurement()
+                rows, system = [0, 1, 2, 3], inverted_pendulum_system.as_non_linear_io_system_full_state_measurement()
             case MeasurementType.PARTIAL_STATE:
-                inner_plant = inverted_pendulum_system.as_non_linear_io_system_partial_state_measurement()
-        return inner_plant
+                rows, system = [0, 2], inverted_pendulum_system.as_non_linear_io_system_partial_state_measurement()
+        C = np.eye(4)[rows]
+        return C, np.hstack([np.zeros((len(rows), 1)), C]), system
 
     x_eq: np.ndarray = np.array([0, 0, np.pi, 0])
     u_eq: np.ndarray = np.zeros(5)
-    return control.linearize(plant_factory(measurement), x_eq.tolist(), u_eq.tolist())
+    C, D, system = output_matrices(measurement)
+    return linearize_analytic(inverted_pendulum_system, x_eq, u_eq, C, D, system=system)
 
 if __name__ == "__main__":
     test_inverted_pendulum = InvertedPendulum()
@@ -1,5 +1,15 @@
 import numpy as np
-from typing import NamedTuple
+from typing import Iterator, NamedTuple
+
+from utils.chunked_streams import (
+    DEFAULT_CHUNK_SIZE,
+    ChunkSpan,
+    chunk_generator,
+    chunk_span,
+    chunk_spans,
+    chunk_time,
+    sample_count
+)
 
 
 class StablizingNoiseTrajectory(NamedTuple):
@@ -22,17 +32,67 @@ def generate_static_noise_trajectory(dt: float, t_Final, scale: float = 0.1) ->
 
 def generate_trajectory_with_static_noise(dt: float, t_final: float, scale = 0.1) -> CommandFollowingTrajectory:
     time = np.linspace(0, t_final, round(t_final / dt))
+    return CommandFollowingTrajectory(
+        t = time,
+        x_d=_command_reference(time),
+        noise=np.random.normal(loc=0, scale=scale, size=(4, time.shape[0]))
+    )
+
+
+def _command_reference(time: np.ndarray) -> np.ndarray:
     x_desired = (np.zeros_like(time) + (2 * np.ones_like(time) * (time > 4))
                                     +  (-6 * np.ones_like(time) * (time > 10))
                                     + ( 4 * np.ones_like(time) * (time > 16)))
-    x_d = np.vstack([
+    return np.vstack([
         x_desired,
         np.zeros_like(time),
         np.pi*np.ones_like(time),
         np.zeros_like(time),
     ])
+
+
+def _static_noise_chunk(span: ChunkSpan, dt: float, t_final: float, scale: float, seed: int) -> StablizingNoiseTrajectory:
+    time = chunk_time(span, t_final, sample_count(t_final, dt))
+    return StablizingNoiseTrajectory(
+        t=time,
+        noise=chunk_generator(seed, span.index).normal(loc=0, scale=scale, size=(4, time.shape[0]))
+    )
+
+
+def _command_following_chunk(span: ChunkSpan, dt: float, t_final: float, scale: float, seed: int) -> CommandFollowingTrajectory:
+    time = chunk_time(span, t_final, sample_count(t_final, dt))
     return CommandFollowingTrajectory(
-        t = time,
-        x_d=x_d,
-        noise=np.random.normal(loc=0, scale=scale, size=(4, time.shape[0]))
+        t=time,
+        x_d=_command_reference(time),
+        noise=chunk_generator(seed, span.index).normal(loc=0, scale=scale, size=(4, time.shape[0]))
     )
+
+
+def static_noise_trajectory_chunk(index: int, dt: float, t_final: float, scale: float = 0.1,
+                                  seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> StablizingNoiseTrajectory:
+    """Chunk `index` of stream_static_noise_trajectory, drawn on its own"""
+    span = chunk_span(index, sample_count(t_final, dt), chunk_size)
+    return _static_noise_chunk(span, dt, t_final, scale, seed)
+
+
+def stream_static_noise_trajectory(dt: float, t_final: float, scale: float = 0.1,
+                                   seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[StablizingNoiseTrajectory]:
+    """
+    Same time grid as generate_static_noise_trajectory, yielded in chunks of at most chunk_size
+    samples. The noise of each chunk comes from its own seeded generator
+    """
+    for span in chunk_spans(sample_count(t_final, dt), chunk_size):
+        yield _static_noise_chunk(span, dt, t_final, scale, seed)
+
+
+def command_following_trajectory_chunk(index: int, dt: float, t_final: float, scale: float = 0.1,
+                                       seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> CommandFollowingTrajectory:
+    """Chunk `index` of stream_trajectory_with_static_noise, drawn on its own"""
+    span = chunk_span(index, sample_count(t_final, dt), chunk_size)
+    return _command_following_chunk(span, dt, t_final, scale, seed)
+
+
+def stream_trajectory_with_static_noise(dt: float, t_final: float, scale: float = 0.1,
+                                        seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[CommandFollowingTrajectory]:
+    for span in chunk_spans(sample_count(t_final, dt), chunk_size):
+        yield _command_following_chunk(span, dt, t_final, scale, seed)
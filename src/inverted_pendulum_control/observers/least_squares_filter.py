@@ -1,47 +1,141 @@
 import control
 import dataclasses
+from typing import NamedTuple
 
 import numpy as np
+from scipy import linalg, signal
+
+
+class LeastSquaresBatchResult(NamedTuple):
+    x_hat: np.ndarray           # (n, N) estimate before each measurement is incorporated
+    P_trace: np.ndarray | None  # (N + 1, n * n) covariance, initial one included
+    K_trace: np.ndarray | None  # (N, n * p) gain applied to each measurement
 
 
 @dataclasses.dataclass
 class LeastSquaresFilter:
+    """
+    Recursive least squares estimator x_k+1 = x_k + K_k (y_k - C x_k). With `steady_state` the
+    gain is fixed to the one of the discrete algebraic Riccati equation of the random walk model
+    x_k+1 = x_k + w_k with process covariance Q, which is solved once
+    """
     plant_discr: control.StateSpace
     P: np.ndarray = dataclasses.field(default_factory=lambda :2 * np.diag([1, 13, 1, 1]))
     R: np.ndarray = dataclasses.field(default_factory=lambda :np.diag([10, 12, 13, 7]))
+    Q: np.ndarray = dataclasses.field(default_factory=lambda :1e-3 * np.eye(4))
     with_tracing: bool = dataclasses.field(default=False)
+    steady_state: bool = dataclasses.field(default=False)
     K: np.ndarray = dataclasses.field(init=False)
-    P_trace: np.ndarray = dataclasses.field(init=False, repr=False)
-    K_trace: np.ndarray = dataclasses.field(init=False, repr=False)
+    __P_history: list[np.ndarray] = dataclasses.field(init=False, repr=False)
+    __K_history: list[np.ndarray] = dataclasses.field(init=False, repr=False)
 
-    def __gain_update_law(self) -> np.ndarray:
-        alpha = self.plant_discr.C @ self.P @ self.plant_discr.C.T + self.R
-        return self.P @ self.plant_discr.C.T @ np.linalg.inv(alpha)
+    def __gain_update_law(self, P: np.ndarray) -> np.ndarray:
+        C = self.plant_discr.C
+        alpha = C @ P @ C.T + self.R
+        return np.linalg.solve(alpha, C @ P).T
 
+    def __steady_state_covariance(self) -> np.ndarray:
+        n = self.plant_discr.C.shape[1]
+        return linalg.solve_discrete_are(np.eye(n), self.plant_discr.C.T, self.Q, self.R)
 
     def __post_init__(self):
-        self.K = self.__gain_update_law()
-        if self.with_tracing:
-            self.P_trace = np.array([self.P.copy().reshape(-1)])
-            self.K_trace = np.array([self.K.copy().reshape(-1)])
-            np.append(self.K_trace, [self.K.copy().reshape(-1)], axis=0)
+        if self.steady_state:
+            self.P = self.__steady_state_covariance()
+        self.K = self.__gain_update_law(self.P)
+        self.__P_history = [self.P.reshape(-1).copy()]
+        self.__K_history = [] if not self.steady_state else [self.K.reshape(-1).copy()]
+
+    @property
+    def P_trace(self) -> np.ndarray:
+        return np.array(self.__P_history)
+
+    @property
+    def K_trace(self) -> np.ndarray:
+        return np.array(self.__K_history)
 
-    def __covariance_update_law(self) -> np.ndarray:
-        beta = np.eye(self.plant_discr.A.shape[0]) - self.K @ self.plant_discr.C
-        return beta @ self.P @ beta.T + self.K @ self.R @ self.K.T
+    def __covariance_update_law(self, K: np.ndarray, P: np.ndarray) -> np.ndarray:
+        beta = np.eye(self.plant_discr.A.shape[0]) - K @ self.plant_discr.C
+        return beta @ P @ beta.T + K @ self.R @ K.T
 
     def __least_squares_update(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
-        self.K = self.__gain_update_law()
-        if self.with_tracing:
-            np.append(self.K_trace, self.K.copy().reshape(-1))
+        """Incorporates the measurement u with the gain of the current P, then advances P with that gain"""
+        if not self.steady_state:
+            self.K = self.__gain_update_law(self.P)
+            self.P = self.__covariance_update_law(self.K, self.P)
+            if self.with_tracing:
+                self.__K_history.append(self.K.reshape(-1).copy())
+                self.__P_history.append(self.P.reshape(-1).copy())
         return x + self.K @ ( u - self.plant_discr.C @ x )
 
     def __least_square_output(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
-        self.P = self.__covariance_update_law()
-        if self.with_tracing:
-            np.append(self.P_trace, self.P_trace.copy().reshape(-1))
         return x
 
+    def __time_varying_batch(self, measurements: np.ndarray, x0: np.ndarray, chunk_size: int) -> LeastSquaresBatchResult:
+        """
+        With the optimal gain the recursion is the information form
+        P_k^-1 = P_0^-1 + k C^T R^-1 C,  x_k = P_k (P_0^-1 x_0 + C^T R^-1 sum_j<k y_j)
+        so every step of a chunk follows from a cumulative sum and a batched inverse
+        """
+        C = self.plant_discr.C
+        n, N = C.shape[1], measurements.shape[1]
+        G = C.T @ np.linalg.inv(self.R)
+        information_0 = np.linalg.inv(self.P)
+        F = G @ C
+        x_hat = np.empty((n, N))
+        P_trace = np.empty((N + 1, n * n)) if self.with_tracing else None
+        K_trace = np.empty((N, n * C.shape[0])) if self.with_tracing else None
+        if P_trace is not None:
+            P_trace[0] = self.P.reshape(-1)
+
+        b = information_0 @ x0
+        for start in range(0, N, chunk_size):
+            stop = min(start + chunk_size, N)
+            steps = np.arange(start, stop + 1)
+            P_k = np.linalg.inv(information_0 + steps[:, None, None] * F)        # (c + 1, n, n)
+            b_k = b + np.vstack([np.zeros(n), np.cumsum((G @ measurements[:, start:stop]).T, axis=0)])
+            x_hat[:, start:stop] = (P_k[:-1] @ b_k[:-1, :, None])[..., 0].T
+            b = b_k[-1]
+            if K_trace is not None:
+                K_trace[start:stop] = (P_k[1:] @ G).reshape(stop - start, -1)
+                P_trace[start + 1:stop + 1] = P_k[1:].reshape(stop - start, -1)
+        return LeastSquaresBatchResult(x_hat=x_hat, P_trace=P_trace, K_trace=K_trace)
+
+    def __steady_state_batch(self, measurements: np.ndarray, x0: np.ndarray, chunk_size: int) -> LeastSquaresBatchResult:
+        """
+        With a fixed gain the estimate is the LTI system x_k+1 = (I - K C) x_k + K y_k, which is
+        run mode by mode as first order IIR filters
+        """
+        C, K = self.plant_discr.C, self.K
+        n, N = C.shape[1], measurements.shape[1]
+        eigen_values, V = np.linalg.eig(np.eye(n) - K @ C)
+        V_inv = np.linalg.inv(V)
+        z = (V_inv @ x0).astype(complex)
+        x_hat = np.empty((n, N))
+        for start in range(0, N, chunk_size):
+            stop = min(start + chunk_size, N)
+            forcing = V_inv @ K @ measurements[:, start:stop]
+            modes = np.empty_like(forcing, dtype=complex)
+            for i, eigen_value in enumerate(eigen_values):
+                modes[i], final = signal.lfilter([0, 1], [1, -eigen_value], forcing[i], zi=z[i:i + 1])
+                z[i] = final[0]
+            x_hat[:, start:stop] = (V @ modes).real
+        P_trace = np.tile(self.P.reshape(-1), (N + 1, 1)) if self.with_tracing else None
+        K_trace = np.tile(K.reshape(-1), (N, 1)) if self.with_tracing else None
+        return LeastSquaresBatchResult(x_hat=x_hat, P_trace=P_trace, K_trace=K_trace)
+
+    def filter_batch(self, measurements: np.ndarray, x0: np.ndarray | None = None, chunk_size: int = 65536) -> LeastSquaresBatchResult:
+        """
+        Runs the recursion over a whole recording at once. The filter's own P and K are left
+        untouched
+        :param measurements: (p, N) measured outputs
+        :param x0: initial estimate, the first measurement when None
+        :param chunk_size: samples processed per vectorized step, bounds the working memory
+        """
+        x0 = np.asarray(measurements[:, 0] if x0 is None else x0, dtype=float)
+        if self.steady_state:
+            return self.__steady_state_batch(measurements, x0, chunk_size)
+        return self.__time_varying_batch(measurements, x0, chunk_size)
+
     def as_non_linear_io_system(self) -> control.NonlinearIOSystem:
         return control.NonlinearIOSystem(
             self.__least_squares_update, self.__least_square_output,
@@ -2,7 +2,10 @@ import control
 import dataclasses
 
 import numpy as np
-from scipy import signal
+
+from utils.lazy_imports import lazy_import
+
+signal = lazy_import("scipy.signal")
 
 def butter_filter_factory(taps, nyquist: float = 0.5 * 100 , cuttoff: float = 5):
     result = signal.butter(taps, cuttoff / nyquist, btype="Low", analog=False, output="ba")
@@ -10,6 +13,10 @@ def butter_filter_factory(taps, nyquist: float = 0.5 * 100 , cuttoff: float = 5)
     return b_, a_
 
 
+def butter_sos_factory(taps, nyquist: float = 0.5 * 100, cuttoff: float = 5) -> np.ndarray:
+    return signal.butter(taps, cuttoff / nyquist, btype="Low", analog=False, output="sos")
+
+
 @dataclasses.dataclass
 class FilterChannel:
     a: list[float] = dataclasses.field()
@@ -25,30 +32,63 @@ class FilterChannel:
         return out.squeeze()
 
 BLOCK_TAPS: int = 4
+BLOCK_CHANNELS: int = 4
+
 
 @dataclasses.dataclass
-class FilterBlock:
-    x_channel_filter: FilterChannel = dataclasses.field(default_factory= lambda : FilterChannel(*butter_filter_factory(taps=BLOCK_TAPS)))
-    v_channel_filter: FilterChannel = dataclasses.field(default_factory= lambda : FilterChannel(*butter_filter_factory(taps=BLOCK_TAPS)))
-    theta_channel_filter: FilterChannel =  dataclasses.field(default_factory= lambda : FilterChannel(*butter_filter_factory(taps=BLOCK_TAPS)))
-    theta_dot_channel_filter: FilterChannel = dataclasses.field(default_factory= lambda : FilterChannel(*butter_filter_factory(taps=BLOCK_TAPS)))
+class MultichannelSOSFilter:
+    """
+    One second order sections filter applied to several channels. The state of every channel is
+    held in a single (n_sections, n_channels, 2) array, the layout sosfilt uses, so a sample of
+    all channels is one vectorized transposed direct form II step per section and whole
+    recordings go through sosfilt directly
+    """
+    sos: np.ndarray = dataclasses.field()
+    n_channels: int = dataclasses.field(default=BLOCK_CHANNELS)
+    z_i: np.ndarray = dataclasses.field(init=False)
+
+    def __post_init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.z_i = np.zeros((self.sos.shape[0], self.n_channels, 2))
+
+    def __call__(self, t, x: np.ndarray, u: np.ndarray | None, params = None) -> np.ndarray:
+        y = np.asarray(x, dtype=float).reshape(self.n_channels)
+        for (b0, b1, b2, _, a1, a2), z in zip(self.sos, self.z_i):
+            x_section = y
+            y = b0 * x_section + z[:, 0]
+            z[:, 0] = b1 * x_section - a1 * y + z[:, 1]
+            z[:, 1] = b2 * x_section - a2 * y
+        return y
+
+    def filter_offline(self, data: np.ndarray, continue_state: bool = False) -> np.ndarray:
+        """
+        Filters whole recordings in one call
+        :param data: (n_channels, N) samples
+        :param continue_state: start from and update the running filter state instead of rest
+        """
+        if not continue_state:
+            return signal.sosfilt(self.sos, data, axis=-1)
+        out, self.z_i = signal.sosfilt(self.sos, data, axis=-1, zi=self.z_i)
+        return out
 
 
-    def __update_block_state(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
-        pass
+@dataclasses.dataclass
+class FilterBlock:
+    channel_filter: MultichannelSOSFilter = dataclasses.field(
+        default_factory=lambda : MultichannelSOSFilter(butter_sos_factory(taps=BLOCK_TAPS))
+    )
 
     def __output_block_state(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
-        x_val, v_val, theta_val, theta_dot_val = u
-        x_filtered = self.x_channel_filter(t, np.array([x_val]), None, None),
-        v_Filtered = self.v_channel_filter(t, np.array([v_val]), None, None),
-        theta_filtered = self.theta_channel_filter(t, np.array([theta_val]), None, None)
-        theta_dot_filtered = self.theta_dot_channel_filter(t, np.array([theta_dot_val]), None, None)
-        return np.array([
-            x_filtered[0],
-            v_Filtered[0],
-            theta_filtered,
-            theta_dot_filtered
-        ])
+        return self.channel_filter(t, u, None, None)
+
+    def filter_offline(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: (4, N) recorded x, v, theta, theta_dot
+        :return: filtered channels, same shape
+        """
+        return self.channel_filter.filter_offline(data)
 
     def as_non_linear_io_system(self) -> control.NonlinearIOSystem:
         return control.NonlinearIOSystem(
@@ -1,12 +1,13 @@
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.axes import Axes
-from matplotlib.figure import Figure
+from typing import TYPE_CHECKING
 import control
 
-matplotlib.use("TkAgg")
-plt.style.use('https://github.com/dhaitz/matplotlib-stylesheets/raw/master/pitayasmoothie-dark.mplstyle')
-plt.rcParams.update({"font.size":7})
+from utils.plot_style import lazy_pyplot
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+
+plt = lazy_pyplot(rc={"font.size": 7})
 
 def add_legend_and_plot(ax_1, ax_2, ax_3, ax_4, ax_5, data, t_data):
     ax_5.plot(t_data, data["u_force"], linewidth=0.7, color="C5", label="u_force")
@@ -13,10 +13,30 @@ from observers.least_squares_filter import LeastSquaresFilter
 from observers.linear_time_invariant_filtering import FilterBlock
 from models.inverted_pendulum_closed_loop import InvertedPendulum, linearize_plant, create_lqr_stabilizing_and_command_following_plant
 from models.controllers import LQR_CommandFollowind_Controller
+from utils.result_store import ColumnarResultWriter, is_columnar_result, load_columnar_result
+
+DATA_DIRECTORY: pathlib.Path = pathlib.Path(__file__).parent / "data"
+MEASURED_COLUMNS: list[str] = ["x", "v", "theta", "theta_dot"]
+
+
+def save_response(response: control.TimeResponseData, save_tag: str) -> None:
+    with ColumnarResultWriter(DATA_DIRECTORY / save_tag) as writer:
+        writer.write_response(response)
+
+
+def load_measured_states(save_tag: str = "stabilization_simulation") -> tuple[np.ndarray, np.ndarray]:
+    """
+    Time and measured states of a saved run, memory mapped from the columnar store when it
+    exists and read from the legacy csv otherwise
+    """
+    if is_columnar_result(DATA_DIRECTORY / save_tag):
+        result = load_columnar_result(DATA_DIRECTORY / save_tag)
+        return result["time"], result.stack(MEASURED_COLUMNS)
+    data_raw = pd.read_csv(DATA_DIRECTORY / f"{save_tag}.csv")
+    return data_raw["time"].to_numpy(), data_raw.loc[:, MEASURED_COLUMNS].to_numpy().T
 
 
 def run_stabilization_control_algorithm(save_tag: str = "stabilization_simulation") -> None:
-    save_location = pathlib.Path(__file__).parent / f"data/{save_tag}.csv"
     response = simulate_closed_loop_stabiling_plant(
         theta_init=np.pi + 0.01,
         v_init=-1
@@ -27,7 +47,7 @@ def run_stabilization_control_algorithm(save_tag: str = "stabilization_simulatio
     simple_stabilizing_plot(
         response_data=response
     )
-    response.to_pandas().to_csv(save_location)
+    save_response(response, save_tag)
 
 def test_full_state_feedback_command_following() -> None:
     plant_controller = LQR_CommandFollowind_Controller(
@@ -37,10 +57,6 @@ def test_full_state_feedback_command_following() -> None:
 
 def test_least_squares_filter() -> None:
 
-    def _load_data() -> pd.DataFrame:
-        save_location = pathlib.Path(__file__).parent / "data/stabilization_simulation.csv"
-        return pd.read_csv(save_location)
-
     test_inverted_pendulum = InvertedPendulum()
     pend_linarized = linearize_plant(test_inverted_pendulum)
     filter_obj = LeastSquaresFilter(
@@ -53,29 +69,31 @@ def test_least_squares_filter() -> None:
 
     test_x = np.ones(4)
     filter.dynamics(0, test_x, test_x, None)
-    data_raw = _load_data()
-    columns = ["x", "v", "theta", "theta_dot"]
-    t = data_raw["time"].to_numpy()
-    data: np.ndarray = data_raw.loc[:, columns].to_numpy().T
+    t, data = load_measured_states()
     filter_result = control.input_output_response(filter, t,  data, initial_state=data[:, 0])
     print(filter_result.to_pandas().head())
-    filter_result.to_pandas().to_csv(pathlib.Path(__file__).parent / "data/test_least_squares_filter.csv")
+    save_response(filter_result, "test_least_squares_filter")
     print("P trace")
     print(filter_obj.P_trace)
 
-def test_lti_butter_worthfilter():
-    def _load_data() -> pd.DataFrame:
-        save_location = pathlib.Path(__file__).parent / "data/stabilization_simulation.csv"
-        return pd.read_csv(save_location)
+def test_least_squares_filter_batch(steady_state: bool = False) -> None:
+    filter_obj = LeastSquaresFilter(
+        plant_discr=linearize_plant(InvertedPendulum()),
+        with_tracing=True,
+        steady_state=steady_state
+    )
+    t, data = load_measured_states()
+    filter_result = filter_obj.filter_batch(data)
+    print(f"Filtered {t.shape[0]} samples")
+    print("Final gain")
+    print(filter_result.K_trace[-1].reshape(4, 4))
 
+def test_lti_butter_worthfilter():
     filter_obj = FilterBlock()
     lti_filter = filter_obj.as_non_linear_io_system()
-    data_raw = _load_data()
-    columns = ["x", "v", "theta", "theta_dot"]
-    t = data_raw["time"].to_numpy()
-    data: np.ndarray = data_raw.loc[:, columns].to_numpy().T
+    t, data = load_measured_states()
     filter_result = control.input_output_response(lti_filter, t, data, initial_state=None)
-    filter_result.to_pandas().to_csv(pathlib.Path(__file__).parent / "data/test_lti_butter_filter.csv")
+    save_response(filter_result, "test_lti_butter_filter")
     print("Simulation Completed")
 
 
@@ -83,7 +101,7 @@ def test_lqr_command_following_and_stabilizing_controller() -> None:
     stabilized_plant = create_lqr_stabilizing_and_command_following_plant()
     print(stabilized_plant)
     response = simulate_closed_loop_command_following_plant()
-    response.to_pandas().to_csv(pathlib.Path(__file__).parent / "data/pendulum_full_state_command_following_lqr.csv")
+    save_response(response, "pendulum_full_state_command_following_lqr")
     plot_controller_performance(response)
 
 
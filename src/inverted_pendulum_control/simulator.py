@@ -1,9 +1,13 @@
+import pathlib
+
 import control
 import numpy as np
 
+from models.controllers import LQRWeights
 from models.trajectory_generators import (
     generate_static_noise_trajectory,
     generate_trajectory_with_static_noise,
+    stream_static_noise_trajectory,
     StablizingNoiseTrajectory,
     CommandFollowingTrajectory
 )
@@ -11,37 +15,87 @@ from models.inverted_pendulum_closed_loop import (
     create_stabilizing_plant,
     create_lqr_stabilizing_and_command_following_plant
 )
+from utils.chunked_simulation import simulate_chunked
+from utils.chunked_streams import DEFAULT_CHUNK_SIZE
+from utils.early_termination import TerminationCriterion, simulate_with_termination
+from utils.result_store import ColumnarResult, ColumnarResultWriter, load_columnar_result
 
-def simulate_closed_loop_stabiling_plant(theta_init: float, v_init: float) -> control.TimeResponseData:
+def simulate_closed_loop_stabiling_plant(theta_init: float,
+                                         v_init: float,
+                                         weights: LQRWeights | None = None,
+                                         t_final: float = 10,
+                                         verbose: bool = True,
+                                         termination: TerminationCriterion | None = None) -> control.TimeResponseData:
+    """:param termination: stop integrating once settled (or diverged), see utils.early_termination"""
 
-    stabilizing_plant = create_stabilizing_plant()
-    static_noise_trajectory: StablizingNoiseTrajectory = generate_static_noise_trajectory(dt=0.01, t_Final=10, scale=0.1)
-    print(stabilizing_plant)
+    stabilizing_plant = create_stabilizing_plant(weights=weights, verbose=verbose)
+    static_noise_trajectory: StablizingNoiseTrajectory = generate_static_noise_trajectory(dt=0.01, t_Final=t_final, scale=0.1)
+    if verbose:
+        print(stabilizing_plant)
 
-    print("-----" * 30)
-    print("Simulating Input Output response")
-    print("-----"*30)
+        print("-----" * 30)
+        print("Simulating Input Output response")
+        print("-----"*30)
+    if termination is not None:
+        response, report = simulate_with_termination(
+            stabilizing_plant,
+            static_noise_trajectory.t,
+            static_noise_trajectory.noise,
+            [0, v_init, theta_init, 0],
+            termination
+        )
+        if verbose:
+            print(f"Stopped at t = {report.t_stop:.2f} ({report.reason.name})")
+        return response
     response = control.input_output_response(
         stabilizing_plant,
         static_noise_trajectory.t,
         static_noise_trajectory.noise,
         initial_state=[0, v_init, theta_init, 0]
     )
-    print("\nCompleted\n")
-    print("-----" * 30)
+    if verbose:
+        print("\nCompleted\n")
+        print("-----" * 30)
 
     return response
 
 
-def simulate_closed_loop_command_following_plant() -> control.TimeResponseData:
+def simulate_closed_loop_stabilizing_plant_to_store(directory: pathlib.Path,
+                                                    theta_init: float,
+                                                    v_init: float,
+                                                    weights: LQRWeights | None = None,
+                                                    t_final: float = 3600,
+                                                    dt: float = 0.01,
+                                                    seed: int = 0,
+                                                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                                    verbose: bool = True) -> ColumnarResult:
+    """
+    simulate_closed_loop_stabiling_plant for long horizons: the noise is drawn chunk by chunk and
+    every chunk of the response is written to a columnar result in `directory` once integrated,
+    so memory does not grow with t_final
+    """
+    stabilizing_plant = create_stabilizing_plant(weights=weights, verbose=verbose)
+    chunks = (
+        (chunk.t, chunk.noise)
+        for chunk in stream_static_noise_trajectory(dt=dt, t_final=t_final, scale=0.1, seed=seed, chunk_size=chunk_size)
+    )
+    with ColumnarResultWriter(directory) as writer:
+        simulate_chunked(stabilizing_plant, chunks, writer, X0=[0, v_init, theta_init, 0])
+    return load_columnar_result(directory)
+
+
+def simulate_closed_loop_command_following_plant(weights: LQRWeights | None = None,
+                                                 t_final: float = 20,
+                                                 verbose: bool = True) -> control.TimeResponseData:
 
-    stabilizing_plant = create_lqr_stabilizing_and_command_following_plant()
-    trajectory: CommandFollowingTrajectory = generate_trajectory_with_static_noise(dt=0.01, t_final=20, scale=0.5)
-    print("-----" * 30)
-    print("Simulating Input Output response")
-    print("-----" * 30)
-    print(stabilizing_plant)
-    print(stabilizing_plant.dynamics(0, np.ones(4), np.ones(8)))
+    stabilizing_plant = create_lqr_stabilizing_and_command_following_plant(weights=weights, verbose=verbose)
+    trajectory: CommandFollowingTrajectory = generate_trajectory_with_static_noise(dt=0.01, t_final=t_final, scale=0.5)
+    if verbose:
+        print("-----" * 30)
+        print("Simulating Input Output response")
+        print("-----" * 30)
+        print(stabilizing_plant)
+        print(stabilizing_plant.dynamics(0, np.ones(4), np.ones(8)))
     response = control.input_output_response(
         stabilizing_plant,
         trajectory.t,
@@ -51,9 +105,10 @@ def simulate_closed_loop_command_following_plant() -> control.TimeResponseData:
         ]),
         initial_state = [0, 0, np.pi, 0]
     )
-    print("-----" * 30)
-    print("\nCompleted\n")
-    print("-----" * 30)
-    print(response.to_pandas().head().to_string())
-    print("-----" * 30)
+    if verbose:
+        print("-----" * 30)
+        print("\nCompleted\n")
+        print("-----" * 30)
+        print(response.to_pandas().head().to_string())
+        print("-----" * 30)
     return response
@@ -0,0 +1,151 @@
+import concurrent.futures
+import dataclasses
+import enum
+import math
+import os
+from typing import NamedTuple
+
+import control
+import numpy as np
+
+from models.controllers import LQRWeights
+from simulator import simulate_closed_loop_stabiling_plant, simulate_closed_loop_command_following_plant
+
+PENDULUM_UP_STATE: np.ndarray = np.array([0, 0, np.pi, 0])
+_FALLEN_ANGLE: float = np.pi / 2
+
+
+class TuningObjective(enum.Enum):
+    STABILIZATION: int = 0
+    COMMAND_FOLLOWING: int = 1
+
+
+class EvaluationTask(NamedTuple):
+    objective: TuningObjective
+    weights: LQRWeights
+    t_final: float
+    seed: int
+    theta_init: float
+    v_init: float
+    effort_weight: float
+
+
+class RungResult(NamedTuple):
+    horizon: float
+    weights: list[LQRWeights]
+    scores: np.ndarray
+
+
+class TuningResult(NamedTuple):
+    best: LQRWeights
+    best_score: float
+    rungs: list[RungResult]
+
+
+@dataclasses.dataclass
+class WeightSearchSpace:
+    log_q_bounds: tuple[float, float] = dataclasses.field(default=(-1, 4))   # log10 of each diagonal entry of Q
+    log_r_bounds: tuple[float, float] = dataclasses.field(default=(-4, 1))   # log10 of the R scale
+    n_states: int = dataclasses.field(default=4)
+    n_inputs: int = dataclasses.field(default=5)
+
+    def sample(self, n: int, rng: np.random.Generator) -> list[LQRWeights]:
+        log_q = rng.uniform(*self.log_q_bounds, size=(n, self.n_states))
+        log_r = rng.uniform(*self.log_r_bounds, size=n)
+        return [
+            LQRWeights(Q=np.diag(10**q), R=10**r * np.eye(self.n_inputs))
+            for q, r in zip(log_q, log_r)
+        ]
+
+
+def stabilization_cost(response: control.TimeResponseData, effort_weight: float) -> float:
+    error = response.states - PENDULUM_UP_STATE[:, None]
+    if np.any(np.abs(error[2]) > _FALLEN_ANGLE):
+        return np.inf
+    u_force = response.outputs[4]
+    return float(np.mean(np.sum(error**2, axis=0) + effort_weight * u_force**2))
+
+
+def command_following_cost(response: control.TimeResponseData, effort_weight: float) -> float:
+    error = response.states - response.inputs[4:8]
+    if np.any(np.abs(response.states[2] - np.pi) > _FALLEN_ANGLE):
+        return np.inf
+    u_force = response.outputs[4]
+    return float(np.mean(np.sum(error**2, axis=0) + effort_weight * u_force**2))
+
+
+def evaluate_candidate(task: EvaluationTask) -> float:
+    np.random.seed(task.seed)   # common noise realisation for every candidate of a rung
+    try:
+        match task.objective:
+            case TuningObjective.STABILIZATION:
+                response = simulate_closed_loop_stabiling_plant(
+                    theta_init=task.theta_init, v_init=task.v_init,
+                    weights=task.weights, t_final=task.t_final, verbose=False
+                )
+                return stabilization_cost(response, task.effort_weight)
+            case TuningObjective.COMMAND_FOLLOWING:
+                response = simulate_closed_loop_command_following_plant(
+                    weights=task.weights, t_final=task.t_final, verbose=False
+                )
+                return command_following_cost(response, task.effort_weight)
+    except (RuntimeError, ValueError, np.linalg.LinAlgError):
+        return np.inf
+
+
+@dataclasses.dataclass
+class SuccessiveHalvingTuner:
+    """
+    Random search over diagonal Q and scaled identity R with successive halving: every rung
+    simulates the surviving candidates over a longer horizon and keeps the best 1/eta of them.
+    Candidates whose pendulum falls are dropped at the first rung they fall in
+    """
+    objective: TuningObjective = dataclasses.field(default=TuningObjective.STABILIZATION)
+    search_space: WeightSearchSpace = dataclasses.field(default_factory=WeightSearchSpace)
+    n_candidates: int = dataclasses.field(default=64)
+    horizons: tuple[float, ...] = dataclasses.field(default=(2.5, 5, 10))
+    eta: int = dataclasses.field(default=2)
+    seed: int = dataclasses.field(default=0)
+    theta_init: float = dataclasses.field(default=np.pi + 0.01)
+    v_init: float = dataclasses.field(default=-1)
+    effort_weight: float = dataclasses.field(default=1e-4)
+    max_workers: int | None = dataclasses.field(default=None)
+
+    def __tasks(self, candidates: list[LQRWeights], horizon: float) -> list[EvaluationTask]:
+        return [
+            EvaluationTask(self.objective, weights, horizon, self.seed, self.theta_init, self.v_init, self.effort_weight)
+            for weights in candidates
+        ]
+
+    def tune(self) -> TuningResult:
+        rng = np.random.default_rng(self.seed)
+        candidates = self.search_space.sample(self.n_candidates, rng)
+        max_workers = self.max_workers if self.max_workers else os.cpu_count()
+        rungs: list[RungResult] = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for rung, horizon in enumerate(self.horizons):
+                tasks = self.__tasks(candidates, horizon)
+                chunk_size = max(1, len(tasks) // (4 * max_workers))
+                scores = np.fromiter(executor.map(evaluate_candidate, tasks, chunksize=chunk_size), dtype=float)
+                rungs.append(RungResult(horizon, candidates, scores))
+
+                survivors = np.argsort(scores)[:max(1, math.ceil(len(candidates) / self.eta))]
+                survivors = survivors[np.isfinite(scores[survivors])]
+                if survivors.size == 0:
+                    raise RuntimeError(f"No candidate kept the pendulum up over {horizon} s")
+                if rung < len(self.horizons) - 1:
+                    candidates = [candidates[i] for i in survivors]
+
+        final = rungs[-1]
+        best = int(np.argmin(final.scores))
+        return TuningResult(best=final.weights[best], best_score=float(final.scores[best]), rungs=rungs)
+
+
+if __name__ == "__main__":
+    result = SuccessiveHalvingTuner(n_candidates=32).tune()
+    for rung_result in result.rungs:
+        print(f"horizon {rung_result.horizon} s: {len(rung_result.weights)} candidates, "
+              f"best {np.min(rung_result.scores):.4f}")
+    print("Best weights")
+    print(np.diag(result.best.Q))
+    print(result.best.R[0, 0])
@@ -1,13 +1,19 @@
+from __future__ import annotations
+
 import dataclasses
+import time
 
-import cvxpy
-import cvxpy as cp
-from typing import Callable, Any, NamedTuple
+from typing import Callable, Any, NamedTuple, Iterable
 
 import control
 import numpy as np
 from numpy import ndarray
 
+from utils.lazy_imports import lazy_import
+
+cvxpy = lazy_import("cvxpy")    # loaded by the first synthesis, not by importing the plants
+cp = cvxpy
+
 from lmi_controller_synthesis.model.models import JetAircraftPlant
 # from model.models import JetAircraftPlant
 
@@ -53,6 +59,14 @@ class SimpleStabilizingController:
             outputs=["u_1", "u_2"]
         )
 
+def _sector_slope(maximum_overshoot: float) -> float:
+    """
+    Slope c = |Im| / |Re| of the conic sector that bounds the closed loop poles, from the damping
+    ratio at which a second order system overshoots by maximum_overshoot
+    """
+    return -np.pi / np.log(maximum_overshoot)
+
+
 @dataclasses.dataclass
 class DSpaceControlLawSynthesizer:
     plant: JetAircraftPlant | control.StateSpace
@@ -73,7 +87,7 @@ class DSpaceControlLawSynthesizer:
     def __post_init__(self):
         self.r = 1.8**2 / self.rise_time**2
         self.alpha = 4.6/self.settling_time
-        self.c = np.pi / np.log(self.maximum_overshoot)
+        self.c = _sector_slope(self.maximum_overshoot)
         n = self.plant.A.shape[0]
         m = self.plant.B.shape[1]
         self.Z = cvxpy.Variable((m, n))
@@ -99,8 +113,8 @@ class DSpaceControlLawSynthesizer:
     def __maximum_overshoot_constraint(self) -> cvxpy.Constraint:
         beta = (self.A @ self.P + self.B @ self.Z)
         lmi_mat = cvxpy.bmat([
-            [beta + beta.T, self.alpha * (beta - beta.T)],
-            [self.alpha * (beta - beta.T), beta + beta.T]
+            [self.c * (beta + beta.T), beta - beta.T],
+            [beta.T - beta, self.c * (beta + beta.T)]
         ])
         return lmi_mat << 0
 
@@ -117,6 +131,94 @@ class DSpaceControlLawSynthesizer:
         return _controller
 
 
+class DSpaceSpecification(NamedTuple):
+    rise_time: float
+    settling_time: float
+    maximum_overshoot: float
+
+
+class SynthesisTiming(NamedTuple):
+    compilation_time: float     # cvxpy canonicalization, only large for the first solve
+    solve_time: float           # time reported by the solver
+    total_time: float           # wall time of problem.solve
+
+
+@dataclasses.dataclass
+class ParametrizedDSpaceSynthesizer:
+    """
+    Same D-stability LMIs as DSpaceControlLawSynthesizer, but built once with the specification
+    derived terms (r, alpha, c) as cvxpy Parameters. The problem is DPP, so cvxpy canonicalizes it
+    on the first solve only and every later specification just updates the parameter values and
+    warm starts the solver
+    """
+    plant: JetAircraftPlant | control.StateSpace
+    epsilon: float = dataclasses.field(default=0.001)
+    solver: str | None = dataclasses.field(default=None)
+    r: cvxpy.Parameter = dataclasses.field(init=False)
+    alpha: cvxpy.Parameter = dataclasses.field(init=False)
+    c: cvxpy.Parameter = dataclasses.field(init=False)
+    P: cvxpy.Variable = dataclasses.field(init=False)
+    Z: cvxpy.Variable = dataclasses.field(init=False)
+    problem: cvxpy.Problem = dataclasses.field(init=False, repr=False)
+    K: np.ndarray = dataclasses.field(init=False)
+    timings: list[SynthesisTiming] = dataclasses.field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        A, B = self.plant.A, self.plant.B
+        n, m = A.shape[0], B.shape[1]
+        self.r = cvxpy.Parameter(nonneg=True, name="r")
+        self.alpha = cvxpy.Parameter(nonneg=True, name="alpha")
+        self.c = cvxpy.Parameter(nonneg=True, name="c")
+        self.Z = cvxpy.Variable((m, n))
+        self.P = cvxpy.Variable((n, n), symmetric=True)
+        self.K = np.array([0])
+
+        beta = A @ self.P + B @ self.Z
+        constraints = [
+            self.P - self.epsilon * np.eye(n) >> 0,
+            cvxpy.bmat([
+                [-self.r * self.P, beta],
+                [beta.T, -self.r * self.P]
+            ]) << 0,
+            beta + beta.T + self.alpha * self.P << 0,
+            cvxpy.bmat([
+                [self.c * (beta + beta.T), beta - beta.T],
+                [beta.T - beta, self.c * (beta + beta.T)]
+            ]) << 0,
+        ]
+        self.problem = cvxpy.Problem(cvxpy.Minimize(0), constraints)
+        assert self.problem.is_dpp(), "D-space problem must be DPP to be compiled once"
+
+    def synthesize(self, specification: DSpaceSpecification, verbose: bool = False) -> np.ndarray | None:
+        """
+        Solves the LMIs for one specification
+        :param specification: rise time, settling time and maximum overshoot
+        :param verbose: forwarded to the solver
+        :return: state feedback gain, None when the specification is infeasible
+        """
+        self.r.value = 1.8**2 / specification.rise_time**2
+        self.alpha.value = 4.6 / specification.settling_time
+        self.c.value = _sector_slope(specification.maximum_overshoot)
+
+        start = time.perf_counter()
+        self.problem.solve(solver=self.solver, warm_start=True, verbose=verbose)
+        self.timings.append(SynthesisTiming(
+            compilation_time=self.problem.compilation_time,
+            solve_time=self.problem.solver_stats.solve_time or 0.,
+            total_time=time.perf_counter() - start
+        ))
+        if self.problem.status not in (cvxpy.OPTIMAL, cvxpy.OPTIMAL_INACCURATE):
+            return None
+        self.K = self.Z.value @ np.linalg.inv(self.P.value)
+        return self.K
+
+    def sweep(self, specifications: Iterable[DSpaceSpecification]) -> list[np.ndarray | None]:
+        return [self.synthesize(specification) for specification in specifications]
+
+    def timing_summary(self) -> SynthesisTiming:
+        return SynthesisTiming(*(float(np.sum(values)) for values in zip(*self.timings)))
+
+
 @dataclasses.dataclass
 class TrajectoryFollowingController:
     sythesizer: DSpaceControlLawSynthesizer
@@ -49,3 +49,25 @@ class LowerStarController:
                                 controller_type: ControllerType = ControllerType.FULL_STATE_CONTROLLER) -> control.NonlinearIOSystem:
         return self.__controller_factory(controller_type, contoller_inputs, controller_outputs, )
 
+    def as_state_space(self,
+                       contoller_inputs: list[str] = ("y_1", "y_2" ),
+                       controller_outputs: list[str] = ("u_prime", ),
+                       controller_type: ControllerType = ControllerType.FULL_STATE_CONTROLLER) -> control.StateSpace:
+        match controller_type:
+            case ControllerType.FULL_STATE_CONTROLLER:
+                n_inputs, n_outputs = self.params.D.shape[1], self.params.D.shape[0]
+                return control.ss(
+                    np.zeros((0, 0)), np.zeros((0, n_inputs)), np.zeros((n_outputs, 0)), self.params.D,
+                    name="LowerStarControllerFullState",
+                    inputs=list(contoller_inputs),
+                    outputs=list(controller_outputs)
+                )
+
+            case ControllerType.DYNAMIC_UPDATE_CONTROLLER:
+                return control.ss(
+                    self.params.A, self.params.B, self.params.C, self.params.D,
+                    name="LowerStarControllerDynamicUpdate",
+                    inputs=list(contoller_inputs),
+                    outputs=list(controller_outputs)
+                )
+
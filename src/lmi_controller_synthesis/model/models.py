@@ -4,6 +4,7 @@ import control
 
 from src.adaptive_controllers.models.simple_mass_spring_damper import MassSpringDamperLinearParams
 from steering_control.models.system_dynamics import DelayBlock
+from utils.delay_simulation import TransportDelay
 
 
 @dataclasses.dataclass(frozen=True)
@@ -34,7 +35,20 @@ class JetAircraftPlant:
     def as_nonlinear_io_system(self) -> control.NonlinearIOSystem:
         return control.NonlinearIOSystem(
             self.__update, self.__output,
-            name="JetAircraftPlamt",
+            name="JetAircraftPlant",
+            states=["x_1_", "x_2_", "x_3_", "x_4_"],
+            inputs=["u_1", "u_2"],
+            outputs=["x_1", "x_2", "x_3", "x_4"]
+        )
+
+    def as_state_space(self) -> control.StateSpace:
+        """
+        The plant with C deliberately replaced by the identity: full state measurement, matching
+        the four output labels of as_nonlinear_io_system. Use self.C for the two measured outputs
+        """
+        return control.ss(
+            self.A, self.B, np.eye(self.A.shape[0]), np.zeros((self.A.shape[0], self.B.shape[1])),
+            name="JetAircraftPlant",
             states=["x_1_", "x_2_", "x_3_", "x_4_"],
             inputs=["u_1", "u_2"],
             outputs=["x_1", "x_2", "x_3", "x_4"]
@@ -126,6 +140,21 @@ class MassSpringDamperExogenous:
              outputs=["z", "y_1_prime", "y_2_prime"],
          )
 
+    def as_state_space(self) -> control.StateSpace:
+        return control.ss(
+            self.A,
+            np.hstack([self.B_1, self.B_2]),
+            np.vstack([self.C_1, self.C_2]),
+            np.block([
+                [self.D_1_1, self.D_1_2],
+                [self.D_2_1, self.D_2_2]
+            ]),
+            name="MassSpringDamperExogenousForcing",
+            states=["x", "x_dot"],
+            inputs=["w", "u"],
+            outputs=["z", "y_1_prime", "y_2_prime"],
+        )
+
 @dataclasses.dataclass
 class DelayBlock:
     time_delay: float = dataclasses.field(default=0.001)
@@ -150,6 +179,13 @@ class DelayBlock:
             params=None
         )
 
+    def transport_delays(self) -> list[TransportDelay]:
+        """Both channels as exact delays, for DelayedInterconnect in place of the Pade states"""
+        return [
+            TransportDelay(source="y_1_prime", target="y_1", tau=self.time_delay),
+            TransportDelay(source="y_2_prime", target="y_2", tau=self.time_delay),
+        ]
+
 if __name__ == "__main__":
     m_s_p_system = MassSpringDamperExogenous(
         m=1,
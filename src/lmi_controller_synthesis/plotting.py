@@ -1,9 +1,10 @@
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.axes import Axes
-from matplotlib.figure import Figure
+from typing import TYPE_CHECKING
 import control
 
-matplotlib.use("TkAgg")
-plt.style.use('https://github.com/dhaitz/matplotlib-stylesheets/raw/master/pitayasmoothie-dark.mplstyle')
-plt.rcParams.update({"font.size":7})
+from utils.plot_style import lazy_pyplot
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+
+plt = lazy_pyplot(rc={"font.size": 7})
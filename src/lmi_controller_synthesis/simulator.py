@@ -1,12 +1,23 @@
+import pathlib
+
 import control
 import numpy as np
 
 from model.models import MassSpringDamperExogenous, DelayBlock
 from controllers_and_observers.robust_controllers import LowerStarController, ControllerType
 from controllers_and_observers.controller_synthesis import FullStateOptimalController, NineMatrixData
+from utils.delay_simulation import DelayedInterconnect, TransportDelay
+from utils.profiling import SubsystemProfiler, profiled_input_output_response
 _SIMULATION_DT: float = 0.01
+_ACTUATOR_DELAY: float = 0.01
+
 
-def create_lower_star_mass_spring_damper() -> control.NonlinearIOSystem:
+def create_lower_star_mass_spring_damper(exact_delays: bool = False) -> control.NonlinearIOSystem | DelayedInterconnect:
+    """
+    :param exact_delays: when True the measurement and actuator delays are simulated exactly from
+        an interpolated signal history instead of with Pade approximations, and the loop is
+        returned as a DelayedInterconnect
+    """
     raw_plant = MassSpringDamperExogenous(
         m=1,
         c=1,
@@ -40,8 +51,19 @@ def create_lower_star_mass_spring_damper() -> control.NonlinearIOSystem:
     )
     plant = raw_plant.as_non_linear_io_system()
     ctrl_plant = raw_controller_full_state.as_non_linear_io_system(controller_type=ControllerType.FULL_STATE_CONTROLLER)
-    delay_block = DelayBlock().as_nonlinear_io_system()
-    u_delay = control.TransferFunction(*control.pade(0.01, 7), inputs=["u_prime"], outputs=["u"]).to_ss()
+    delays = DelayBlock()
+    if exact_delays:
+        open_loop_system = control.interconnect(
+            [plant, ctrl_plant],
+            inputs=["w", "y_1", "y_2", "u"],
+            outputs=["z", "y_1_prime", "y_2_prime", "u_prime"]
+        )
+        return DelayedInterconnect(
+            open_loop_system,
+            delays.transport_delays() + [TransportDelay(source="u_prime", target="u", tau=_ACTUATOR_DELAY)]
+        )
+    delay_block = delays.as_nonlinear_io_system()
+    u_delay = control.TransferFunction(*control.pade(_ACTUATOR_DELAY, 7), inputs=["u_prime"], outputs=["u"]).to_ss()
     print(f"{u_delay=}")
     closed_Loop_system_ = control.interconnect([plant, delay_block, ctrl_plant, u_delay], inputs=["w",], outputs=["z", ])
     return closed_Loop_system_
@@ -80,13 +102,26 @@ def try_out_fullstate_controller_synthesis():
 
 
 
-def simulate_mass_spring_damper(dt=_SIMULATION_DT, t_final=10):
-    system = create_lower_star_mass_spring_damper()
+def simulate_mass_spring_damper(dt=_SIMULATION_DT, t_final=10, exact_delays: bool = False,
+                                profile_report: pathlib.Path | None = None):
+    """:param profile_report: when given, every block is profiled into <profile_report>.json/.folded"""
+    system = create_lower_star_mass_spring_damper(exact_delays=exact_delays)
     print(system)
     t_sim = np.linspace(0, t_final, int(t_final/dt))
     u = np.zeros_like(t_sim)
     u[t_sim < 2] = 0
-    response: control.TimeResponseData = control.input_output_response(system, t_sim, u)
+    if exact_delays and profile_report is not None:
+        with SubsystemProfiler(system.system) as profiler:
+            response: control.TimeResponseData = system.simulate(t_sim, u, method=profiler.solver())
+        profiler.export(profile_report)
+    elif exact_delays:
+        response: control.TimeResponseData = system.simulate(t_sim, u)
+    elif profile_report is not None:
+        response, profiler = profiled_input_output_response(system, t_sim, u)
+        profiler.export(profile_report)
+    else:
+        response: control.TimeResponseData = control.input_output_response(system, t_sim, u)
+    return response
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""
+Closed loops and trajectory generators that scenarios refer to by name. The factories import
+inside their bodies: each package imports its own modules script style, so they only run in a
+worker whose sys.path starts with the package directory
+"""
+from typing import Any, Callable, NamedTuple
+
+import control
+import numpy as np
+
+
+class ScenarioInputs(NamedTuple):
+    t: np.ndarray
+    U: np.ndarray
+    X0: np.ndarray | list[float] | float
+
+
+class ClosedLoopSpec(NamedTuple):
+    package: str                                        # directory below src the factory imports from
+    factory: Callable[..., control.InputOutputSystem]   # called with the scenario parameters
+
+
+class TrajectorySpec(NamedTuple):
+    package: str
+    generator: Callable[..., ScenarioInputs]            # called with t_final, dt and the trajectory parameters
+
+
+def _steering_lqr(**parameters: Any) -> control.InputOutputSystem:
+    from models.closed_loop_plants import VehiclePlant
+    from models.system_dynamics import BycycleModel
+    return VehiclePlant(plant=BycycleModel(**parameters)).create_closed_loop_system()
+
+
+def _steering_lqr_noisy(**parameters: Any) -> control.InputOutputSystem:
+    from models.closed_loop_plants import VehiclePlantNoisy
+    from models.system_dynamics import BycycleModel
+    return VehiclePlantNoisy(plant=BycycleModel(**parameters)).create_closed_loop_system()
+
+
+def _steering_exogenous_noise(**parameters: Any) -> control.InputOutputSystem:
+    """The parameters are those of the plant the LQR is designed on, the noise inputs only enter the simulated plant"""
+    from models.closed_loop_plants import VehiclePlantExogenousNoise
+    from models.system_dynamics import BycycleModel
+    return VehiclePlantExogenousNoise(plant=BycycleModel(**parameters)).create_closed_loop_system()
+
+
+def _pendulum_weights(Q: list[float] | None, R: list[float] | None) -> Any:
+    from models.controllers import LQRWeights
+    if Q is None and R is None:
+        return None
+    if Q is None or R is None:
+        raise ValueError("The LQR weights Q and R are given together, as the diagonals of the matrices")
+    return LQRWeights(Q=np.diag(Q), R=np.diag(R))
+
+
+def _pendulum_stabilizing(Q: list[float] | None = None, R: list[float] | None = None) -> control.InputOutputSystem:
+    from models.inverted_pendulum_closed_loop import create_stabilizing_plant
+    return create_stabilizing_plant(weights=_pendulum_weights(Q, R), verbose=False)
+
+
+def _pendulum_command_following(Q: list[float] | None = None, R: list[float] | None = None) -> control.InputOutputSystem:
+    from models.inverted_pendulum_closed_loop import create_lqr_stabilizing_and_command_following_plant
+    return create_lqr_stabilizing_and_command_following_plant(weights=_pendulum_weights(Q, R), verbose=False)
+
+
+def _servo(**parameters: Any) -> control.InputOutputSystem:
+    from models.servo_mechanism_model import ServoMechanismModel
+    return ServoMechanismModel(**parameters).as_non_linear_io_system()
+
+
+def _cruise_gain_scheduled() -> control.InputOutputSystem:
+    """Compute the trim table once beforehand (trim_table.load_or_compute_trim_table), or every worker builds its own"""
+    from closed_loop_systems import create_gain_scheduled_closed_loop_system
+    return create_gain_scheduled_closed_loop_system()
+
+
+def _steering_static(t_final: float, dt: float, scale: float = 0.1) -> ScenarioInputs:
+    from simulations import generate_static_trajectory
+    trajectory = generate_static_trajectory(t_final=t_final, dt=dt, scale=scale)
+    return ScenarioInputs(trajectory.t, np.vstack((trajectory.x_d, trajectory.u_d)), 0)
+
+
+def _steering_static_exogenous_noise(t_final: float, dt: float, scale: float = 4) -> ScenarioInputs:
+    from simulations import generate_static_trajectory
+    trajectory = generate_static_trajectory(t_final=t_final, dt=dt, scale=scale)
+    return ScenarioInputs(trajectory.t, np.vstack((trajectory.x_d, trajectory.u_d, trajectory.x_n)), 0)
+
+
+def _pendulum_static_noise(t_final: float, dt: float, scale: float = 0.1,
+                           theta_init: float = np.pi + 0.1, v_init: float = 0) -> ScenarioInputs:
+    from models.trajectory_generators import generate_static_noise_trajectory
+    trajectory = generate_static_noise_trajectory(dt=dt, t_Final=t_final, scale=scale)
+    return ScenarioInputs(trajectory.t, trajectory.noise, [0, v_init, theta_init, 0])
+
+
+def _pendulum_command_following_noise(t_final: float, dt: float, scale: float = 0.5) -> ScenarioInputs:
+    from models.trajectory_generators import generate_trajectory_with_static_noise
+    trajectory = generate_trajectory_with_static_noise(dt=dt, t_final=t_final, scale=scale)
+    return ScenarioInputs(trajectory.t, np.vstack([trajectory.noise, trajectory.x_d]), [0, 0, np.pi, 0])
+
+
+def _servo_step(t_final: float, dt: float, amplitude: float = 1) -> ScenarioInputs:
+    t = np.linspace(0, t_final, round(t_final / dt))
+    return ScenarioInputs(t, amplitude * np.ones_like(t), 0)
+
+
+def _cruise_hill_climb(t_final: float, dt: float) -> ScenarioInputs:
+    from closed_loop_systems import create_hilly_trajectory, create_trajectories
+    trajectory = create_hilly_trajectory(create_trajectories(dt=dt, t_final=t_final))
+    return ScenarioInputs(trajectory.t, np.vstack([trajectory.v_ref, trajectory.gear, trajectory.theta_0]),
+                          [trajectory.v_ref[0], 0])
+
+
+CLOSED_LOOPS: dict[str, ClosedLoopSpec] = {
+    "steering_lqr": ClosedLoopSpec("steering_control", _steering_lqr),
+    "steering_lqr_noisy": ClosedLoopSpec("steering_control", _steering_lqr_noisy),
+    "steering_exogenous_noise": ClosedLoopSpec("steering_control", _steering_exogenous_noise),
+    "pendulum_stabilizing": ClosedLoopSpec("inverted_pendulum_control", _pendulum_stabilizing),
+    "pendulum_command_following": ClosedLoopSpec("inverted_pendulum_control", _pendulum_command_following),
+    "servo": ClosedLoopSpec("servo_mechanism", _servo),
+    "cruise_gain_scheduled": ClosedLoopSpec("cruise_control/models", _cruise_gain_scheduled),
+}
+
+TRAJECTORIES: dict[str, TrajectorySpec] = {
+    "steering_static": TrajectorySpec("steering_control", _steering_static),
+    "steering_static_exogenous_noise": TrajectorySpec("steering_control", _steering_static_exogenous_noise),
+    "pendulum_static_noise": TrajectorySpec("inverted_pendulum_control", _pendulum_static_noise),
+    "pendulum_command_following_noise": TrajectorySpec("inverted_pendulum_control", _pendulum_command_following_noise),
+    "servo_step": TrajectorySpec("servo_mechanism", _servo_step),
+    "cruise_hill_climb": TrajectorySpec("cruise_control/models", _cruise_hill_climb),
+}
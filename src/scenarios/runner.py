@@ -0,0 +1,224 @@
+"""
+Runs scenarios read from TOML on a process pool and writes every response to a shared output
+directory as <output>/<scenario>/seed_<seed>/ (utils.result_store columnar format), with a
+summary.json of all runs.
+
+    [defaults]
+    t_final = 10
+    dt = 0.01
+
+    [[scenario]]
+    name = "steering_nominal"
+    closed_loop = "steering_lqr"            # key of scenarios.registry.CLOSED_LOOPS
+    trajectory = "steering_static"          # key of scenarios.registry.TRAJECTORIES
+    seeds = [0, 1, 2]                       # or seed_range = [0, 500]
+    parameters = { l = 3.0 }                # closed loop factory arguments
+    trajectory_parameters = { scale = 0.2 }
+    solver = { method = "auto", rtol = 1e-6 }   # utils.solver_selection.SolverSettings
+
+Scenarios are grouped by package and every package gets its own pool, since the packages
+import their own `models` modules script style and cannot share an interpreter. The pools run
+side by side, share the workers and the bound on pending tasks, and the tasks of the packages are
+submitted interleaved so no pool waits for another one to drain.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import json
+import os
+import pathlib
+import random
+import sys
+import time
+import tomllib
+import warnings
+from typing import Any, NamedTuple
+
+import control
+import numpy as np
+
+from scenarios.registry import CLOSED_LOOPS, TRAJECTORIES
+from utils.result_store import ColumnarResultWriter
+from utils.solver_selection import SolverSettings, simulate
+
+SOURCE_DIRECTORY: pathlib.Path = pathlib.Path(__file__).parent.parent
+SUMMARY_NAME: str = "summary.json"
+
+_PENDING_PER_WORKER: int = 4
+
+
+class Scenario(NamedTuple):
+    name: str
+    closed_loop: str
+    trajectory: str
+    seeds: tuple[int, ...]
+    t_final: float
+    dt: float
+    parameters: dict[str, Any]
+    trajectory_parameters: dict[str, Any]
+    solver: SolverSettings
+
+    @property
+    def package(self) -> str:
+        return CLOSED_LOOPS[self.closed_loop].package
+
+
+class ScenarioTask(NamedTuple):
+    scenario: Scenario
+    seed: int
+
+
+class ScenarioResult(NamedTuple):
+    name: str
+    seed: int
+    succeeded: bool
+    seconds: float
+    output: str | None
+    error: str | None
+    solver: dict[str, Any] | None = None    # utils.solver_selection.SolverTelemetry of the run
+    warnings: tuple[str, ...] = ()          # distinct warnings raised by the run, "<category>: <message>"
+
+
+def _seeds(definition: dict[str, Any]) -> tuple[int, ...]:
+    if "seed_range" in definition:
+        return tuple(range(*definition["seed_range"]))
+    if "seeds" in definition:
+        return tuple(int(seed) for seed in definition["seeds"])
+    return (int(definition.get("seed", 0)), )
+
+
+def _solver_settings(name: str, definition: dict[str, Any]) -> SolverSettings:
+    try:
+        return SolverSettings(**definition)
+    except TypeError as error:
+        raise ValueError(f"Scenario {name}: invalid solver settings, {error}") from error
+
+
+def parse_scenarios(document: dict[str, Any]) -> list[Scenario]:
+    defaults = document.get("defaults", {})
+    scenarios = []
+    for definition in document.get("scenario", []):
+        solver = {**defaults.get("solver", {}), **definition.get("solver", {})}
+        definition = {**defaults, **definition}
+        scenario = Scenario(
+            name=definition["name"],
+            closed_loop=definition["closed_loop"],
+            trajectory=definition["trajectory"],
+            seeds=_seeds(definition),
+            t_final=float(definition.get("t_final", 10)),
+            dt=float(definition.get("dt", 0.01)),
+            parameters=dict(definition.get("parameters", {})),
+            trajectory_parameters=dict(definition.get("trajectory_parameters", {})),
+            solver=_solver_settings(definition["name"], solver),
+        )
+        if scenario.closed_loop not in CLOSED_LOOPS:
+            raise ValueError(f"Scenario {scenario.name}: unknown closed loop {scenario.closed_loop}")
+        if scenario.trajectory not in TRAJECTORIES:
+            raise ValueError(f"Scenario {scenario.name}: unknown trajectory {scenario.trajectory}")
+        if TRAJECTORIES[scenario.trajectory].package != scenario.package:
+            raise ValueError(f"Scenario {scenario.name}: {scenario.trajectory} does not drive {scenario.closed_loop}")
+        scenarios.append(scenario)
+    names = [scenario.name for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError("Scenario names must be unique, they name the output directories")
+    return scenarios
+
+
+def load_scenarios(path: pathlib.Path) -> list[Scenario]:
+    with open(path, "rb") as file:
+        return parse_scenarios(tomllib.load(file))
+
+
+def _initialize_worker(package: str) -> None:
+    sys.path.insert(0, str(SOURCE_DIRECTORY / package))
+    os.environ.setdefault("MPLBACKEND", "Agg")
+
+
+def _warning_messages(caught: list[warnings.WarningMessage]) -> tuple[str, ...]:
+    return tuple(dict.fromkeys(f"{warning.category.__name__}: {warning.message}" for warning in caught))
+
+
+def run_task(task: ScenarioTask, output_directory: pathlib.Path) -> ScenarioResult:
+    scenario, seed = task
+    directory = pathlib.Path(output_directory) / scenario.name / f"seed_{seed:05d}"
+    start = time.perf_counter()
+    caught: list[warnings.WarningMessage] = []
+    try:
+        np.random.seed(seed)    # the trajectory generators and noise blocks draw from the global generators
+        random.seed(seed)
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("default")
+            inputs = TRAJECTORIES[scenario.trajectory].generator(
+                t_final=scenario.t_final, dt=scenario.dt, **scenario.trajectory_parameters
+            )
+            system = CLOSED_LOOPS[scenario.closed_loop].factory(**scenario.parameters)
+            response, telemetry = simulate(system, inputs.t, inputs.U, inputs.X0, scenario.solver)
+        with ColumnarResultWriter(directory) as writer:
+            writer.write_response(response)
+    except Exception as error:
+        return ScenarioResult(scenario.name, seed, False, time.perf_counter() - start, None,
+                              f"{type(error).__name__}: {error}", warnings=_warning_messages(caught))
+    return ScenarioResult(scenario.name, seed, True, time.perf_counter() - start, str(directory), None,
+                          telemetry._asdict(), _warning_messages(caught))
+
+
+def run_scenarios(scenarios: list[Scenario],
+                  output_directory: pathlib.Path,
+                  max_workers: int | None = None,
+                  max_pending: int | None = None) -> list[ScenarioResult]:
+    """
+    :param max_workers: processes over all pools, split evenly with at least one per pool, all cores when None
+    :param max_pending: tasks submitted but not finished at any time over all pools, bounds their queues
+    """
+    output_directory = pathlib.Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    max_workers = max_workers if max_workers else os.cpu_count()
+    max_pending = max_pending if max_pending else _PENDING_PER_WORKER * max_workers
+
+    packages: dict[str, list[ScenarioTask]] = {}
+    for scenario in scenarios:
+        packages.setdefault(scenario.package, []).extend(ScenarioTask(scenario, seed) for seed in scenario.seeds)
+
+    interleaved = [task for group in itertools.zip_longest(*packages.values()) for task in group if task is not None]
+    workers_per_pool = max(1, max_workers // max(1, len(packages)))
+
+    results: list[ScenarioResult] = []
+    with contextlib.ExitStack() as stack:
+        executors = {
+            package: stack.enter_context(concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers_per_pool, initializer=_initialize_worker, initargs=(package, )
+            ))
+            for package in packages
+        }
+        pending: set[concurrent.futures.Future] = set()
+        for task in interleaved:
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+            pending.add(executors[task.scenario.package].submit(run_task, task, output_directory))
+        results.extend(future.result() for future in concurrent.futures.as_completed(pending))
+
+    results.sort(key=lambda result: (result.name, result.seed))
+    (output_directory / SUMMARY_NAME).write_text(json.dumps([result._asdict() for result in results], indent=2))
+    return results
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run closed loop scenarios from a TOML file in parallel")
+    parser.add_argument("scenario_file", type=pathlib.Path)
+    parser.add_argument("--output", type=pathlib.Path, default=pathlib.Path("scenario_results"))
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=None)
+    arguments = parser.parse_args(arguments)
+
+    scenarios = load_scenarios(arguments.scenario_file)
+    start = time.perf_counter()
+    results = run_scenarios(scenarios, arguments.output, arguments.max_workers, arguments.max_pending)
+    failures = [result for result in results if not result.succeeded]
+    print(f"{len(results) - len(failures)}/{len(results)} runs succeeded in {time.perf_counter() - start:.1f} s, "
+          f"results in {arguments.output}")
+    for failure in failures:
+        print(f"FAILED {failure.name} seed {failure.seed}: {failure.error}")
+    return 1 if failures else 0
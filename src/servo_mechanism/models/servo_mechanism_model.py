@@ -3,6 +3,8 @@ import dataclasses
 
 import numpy as np
 
+from utils.jacobians import Jacobians, linearize_analytic, stack_jacobian
+
 
 @dataclasses.dataclass
 class ServoMechanismModel:
@@ -18,7 +20,17 @@ class ServoMechanismModel:
         theta, theta_dot = x
         tau = u[0]
         d_thetadot = 1 / self.J * (-self.b * theta_dot - self.k * self.r * np.sin(theta) + tau)
-        return d_thetadot
+        return np.array([theta_dot, d_thetadot])
+
+    def jacobians(self, x: np.ndarray, u: np.ndarray) -> Jacobians:
+        theta = x[0]
+        return Jacobians(
+            A=stack_jacobian([
+                [0, 1],
+                [-self.k * self.r * np.cos(theta) / self.J, -self.b / self.J],
+            ]),
+            B=stack_jacobian([[np.zeros_like(theta)], [1 / self.J]])
+        )
 
     def __servo_mech_output(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
         theta, theta_dot = u
@@ -52,7 +64,9 @@ class ServoMechanismModel:
 
 
 def linearize_servo_mechanism(servo_mechanism_model: ServoMechanismModel, theta_eq: float = 15) -> control.StateSpace:
-    return control.linearize(servo_mechanism_model.as_non_linear_io_system(), [0, 0], [np.deg2rad(15)])
+    C = np.array([[servo_mechanism_model.l, -servo_mechanism_model.eps]])
+    return linearize_analytic(servo_mechanism_model, np.zeros(2), np.array([np.deg2rad(theta_eq)]), C,
+                              system=servo_mechanism_model.as_non_linear_io_system())
 
 if __name__ == "__main__":
     servo_mechanism = ServoMechanismModel()
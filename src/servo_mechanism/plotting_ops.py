@@ -1,15 +1,15 @@
 import control
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
 import pandas as pd
-from matplotlib.axes import Axes
-from matplotlib.figure import Figure
+from typing import TYPE_CHECKING
 
+from utils.plot_style import lazy_pyplot
 
-matplotlib.use("TkAgg")
-plt.style.use('https://github.com/dhaitz/matplotlib-stylesheets/raw/master/pitayasmoothie-dark.mplstyle')
-plt.rcParams.update({"font.size":7})
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+
+plt = lazy_pyplot(rc={"font.size": 7})
 
 def plot_mech_system_response(respose_data: control.TimeResponseData):
     data: pd.DataFrame = respose_data.to_pandas()
@@ -2,10 +2,15 @@ import control
 import numpy as np
 
 from models.servo_mechanism_model import ServoMechanismModel
+from utils.early_termination import TerminationCriterion, simulate_with_termination
 
-def simulate_impulse_response_model(dt: float, t_final: float, model: ServoMechanismModel) -> control.TimeResponseData:
+def simulate_impulse_response_model(dt: float, t_final: float, model: ServoMechanismModel,
+                                    termination: TerminationCriterion | None = None) -> control.TimeResponseData:
+    """:param termination: stop integrating once settled (or diverged), see utils.early_termination"""
     t_sim = np.linspace(0, t_final, round(t_final/dt))
     forcing = np.ones_like(t_sim)
+    if termination is not None:
+        return simulate_with_termination(model.as_non_linear_io_system(), t_sim, forcing, 0, termination)[0]
     return control.input_output_response(model.as_non_linear_io_system(), t_sim, forcing)
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+import collections
+import concurrent.futures
+import contextlib
+import dataclasses
+import enum
+import io
+import os
+from typing import Iterable, NamedTuple, Sequence
+
+import numpy as np
+
+from simulations import simulate_lqr_system_noisy_dynamics, simulate_lqr_system_with_exogenous_noise
+from utils.online_statistics import P2Quantile, RunningMoments
+
+_PENDING_PER_WORKER: int = 4
+_TRACKED_STATES: tuple[str, ...] = ("x", "y", "theta")    # plant states, labelled alike in both closed loops
+
+
+class EnsemblePlant(enum.Enum):
+    NOISY: int = 0              # VehiclePlantNoisy, noise and delay block in the loop
+    EXOGENOUS_NOISE: int = 1    # VehiclePlantExogenousNoise, noise as plant inputs
+
+
+class Realization(NamedTuple):
+    seed: int
+    t: np.ndarray
+    output_labels: list[str]
+    outputs: np.ndarray
+    tracking_error: np.ndarray      # |[x, y, theta] plant states - [x_d, y_d, theta_d]| of shape (3, len(t))
+
+
+def simulate_realization(plant: EnsemblePlant, seed: int) -> Realization:
+    np.random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        match plant:
+            case EnsemblePlant.NOISY:
+                response = simulate_lqr_system_noisy_dynamics()
+            case EnsemblePlant.EXOGENOUS_NOISE:
+                response = simulate_lqr_system_with_exogenous_noise()
+    # the outputs of the noisy plant are the delayed noisy measurements, not the plant states
+    tracked = [list(response.state_labels).index(label) for label in _TRACKED_STATES]
+    return Realization(
+        seed=seed, t=response.time, output_labels=list(response.output_labels), outputs=response.outputs,
+        tracking_error=np.abs(response.states[tracked] - response.inputs[:3])
+    )
+
+
+@dataclasses.dataclass
+class EnsembleStatistics:
+    """
+    Per time sample statistics of the outputs of an ensemble, folded one realization at a time:
+    Welford mean and variance, P-square quantiles and the worst tracking error. The memory is
+    set by the length of the time vector, not by the number of realizations
+    """
+    quantile_levels: Sequence[float] = dataclasses.field(default=(0.05, 0.5, 0.95))
+    t: np.ndarray | None = dataclasses.field(default=None, init=False)
+    output_labels: list[str] | None = dataclasses.field(default=None, init=False)
+    moments: RunningMoments = dataclasses.field(default_factory=RunningMoments, init=False)
+    worst_tracking_error: np.ndarray | None = dataclasses.field(default=None, init=False)   # elementwise max over the ensemble
+    worst_seed: int | None = dataclasses.field(default=None, init=False)                  # realization with the largest peak error
+    worst_peak_error: float = dataclasses.field(default=-np.inf, init=False)
+    __quantiles: dict[float, P2Quantile] = dataclasses.field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        self.__quantiles = {p: P2Quantile(p) for p in self.quantile_levels}
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+    def fold(self, realization: Realization) -> None:
+        if self.t is None:
+            self.t, self.output_labels = realization.t, realization.output_labels
+            self.worst_tracking_error = np.zeros_like(realization.tracking_error)
+        self.moments.update(realization.outputs)
+        for estimator in self.__quantiles.values():
+            estimator.update(realization.outputs)
+        np.maximum(self.worst_tracking_error, realization.tracking_error, out=self.worst_tracking_error)
+        peak = float(np.max(realization.tracking_error))
+        if peak > self.worst_peak_error:
+            self.worst_peak_error, self.worst_seed = peak, realization.seed
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.moments.mean
+
+    @property
+    def std(self) -> np.ndarray:
+        return self.moments.std
+
+    def quantile(self, p: float) -> np.ndarray:
+        return self.__quantiles[p].value
+
+
+def run_ensemble(plant: EnsemblePlant,
+                 seeds: Iterable[int],
+                 max_workers: int | None = None,
+                 max_pending: int | None = None,
+                 statistics: EnsembleStatistics | None = None) -> EnsembleStatistics:
+    """
+    Simulates one realization per seed on a process pool and folds them into the statistics in
+    seed order, so the quantile estimates do not depend on the scheduling
+    :param max_workers: processes of the pool, all cores when None
+    :param max_pending: realizations submitted but not folded at any time, bounds the memory
+    """
+    statistics = EnsembleStatistics() if statistics is None else statistics
+    max_workers = max_workers if max_workers else os.cpu_count()
+    max_pending = max_pending if max_pending else _PENDING_PER_WORKER * max_workers
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending: collections.deque[concurrent.futures.Future] = collections.deque()
+        for seed in seeds:
+            if len(pending) >= max_pending:
+                statistics.fold(pending.popleft().result())
+            pending.append(executor.submit(simulate_realization, plant, seed))
+        while pending:
+            statistics.fold(pending.popleft().result())
+    return statistics
+
+
+if __name__ == "__main__":
+    ensemble = run_ensemble(EnsemblePlant.EXOGENOUS_NOISE, range(32))
+    print(f"{ensemble.count} realizations, worst peak tracking error {ensemble.worst_peak_error:.3f} (seed {ensemble.worst_seed})")
+    for label, mean, std, low, high in zip(ensemble.output_labels, ensemble.mean[:, -1], ensemble.std[:, -1],
+                                           ensemble.quantile(0.05)[:, -1], ensemble.quantile(0.95)[:, -1]):
+        print(f"{label:>8} at t_final: mean {mean:9.3f}  std {std:8.3f}  5% {low:9.3f}  95% {high:9.3f}")
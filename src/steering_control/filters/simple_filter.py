@@ -53,6 +53,9 @@ class AugmentedSystem:
             ...
         )
 
+    def as_state_space(self) -> control.StateSpace:
+        return control.ss(self.A_aug, self.B_aug, self.C_aug, self.D_aug, name="AugmentedSystem")
+
 
 def pliriminary_checks() -> None:
     aug_sys = AugmentedSystem()
@@ -10,7 +10,7 @@ from .controllers import LQRController
 
 @dataclasses.dataclass
 class VehiclePlant:
-    plant: BycycleModel = dataclasses.field(default=BycycleModel())
+    plant: BycycleModel = dataclasses.field(default_factory=BycycleModel)
     controller: control.NonlinearIOSystem = dataclasses.field(init=False)
 
     def __post_init__(self):
@@ -31,7 +31,7 @@ class VehiclePlant:
 
 @dataclasses.dataclass
 class VehiclePlantNoisy:
-    plant: BycycleModel = dataclasses.field(default=BycycleModel())
+    plant: BycycleModel = dataclasses.field(default_factory=BycycleModel)
     controller: control.NonlinearIOSystem = dataclasses.field(init=False)
 
     def __post_init__(self):
@@ -64,7 +64,7 @@ class VehiclePlantNoisy:
 
 @dataclasses.dataclass
 class VehiclePlantExogenousNoise:
-    plant: BycycleModel = dataclasses.field(default=BycycleModel())
+    plant: BycycleModel = dataclasses.field(default_factory=BycycleModel)
     controller: control.NonlinearIOSystem = dataclasses.field(init=False)
 
     def __post_init__(self):
@@ -3,16 +3,18 @@ import dataclasses
 
 import numpy as np
 
+from utils.gain_cache import cached_lqr
+
 
 @dataclasses.dataclass
 class LQRController:
     linearized_plant: control.StateSpace
-    Q: np.ndarray = dataclasses.field(default=np.diag([10, 100, 0.001])) # X Y Theta Weighting
-    R: np.ndarray = dataclasses.field(default=np.diag([0.1, 0.1])) # velocity delta
+    Q: np.ndarray = dataclasses.field(default_factory=lambda :np.diag([10, 100, 0.001])) # X Y Theta Weighting
+    R: np.ndarray = dataclasses.field(default_factory=lambda :np.diag([0.1, 0.1])) # velocity delta
     K: np.ndarray = dataclasses.field(init=False)
 
     def __post_init__(self):
-        self.K, _, _ = control.lqr(self.linearized_plant, self.Q, self.R)
+        self.K, _, _ = cached_lqr(self.linearized_plant.A, self.linearized_plant.B, self.Q, self.R)
         closed_loop_dynamics = self.linearized_plant.A - self.linearized_plant.B @ self.K
         print(f"Eigen Values {np.linalg.eigvals(closed_loop_dynamics)}")
 
@@ -1,9 +1,41 @@
 import control
 import dataclasses
-import matplotlib.pyplot as plt
 
 import numpy as np
 
+from utils.jacobians import Jacobians, linearize_analytic, stack_jacobian
+from utils.noise_tables import BandLimitedNoise
+from utils.plot_style import lazy_pyplot
+
+plt = lazy_pyplot()
+
+
+def bicycle_jacobians(x: np.ndarray, v: float | np.ndarray, delta: float | np.ndarray,
+                      l: float, a: float, phi_max: float) -> Jacobians:
+    """
+    Exact derivatives of the bicycle state update w.r.t. [x, y, theta] and [v, delta]. The
+    steering derivative is zero where the steering angle saturates
+    :return: A of shape (..., 3, 3) and B of shape (..., 3, 2)
+    """
+    theta = x[2]
+    saturated = np.abs(delta) > phi_max
+    delta = np.clip(delta, -phi_max, phi_max)
+    tan_delta = np.tan(delta)
+    alpha = np.arctan2(a * tan_delta, l)
+    d_alpha = np.where(saturated, 0, a * l * (1 + tan_delta**2) / (l**2 + (a * tan_delta)**2))
+    heading = theta + alpha
+    A = stack_jacobian([
+        [0, 0, -np.sin(heading) * v],
+        [0, 0, np.cos(heading) * v],
+        [0, 0, 0],
+    ])
+    B = stack_jacobian([
+        [np.cos(heading), -np.sin(heading) * v * d_alpha],
+        [np.sin(heading), np.cos(heading) * v * d_alpha],
+        [np.sin(alpha) / a, (v / a) * np.cos(alpha) * d_alpha],
+    ])
+    return Jacobians(A=A, B=B)
+
 
 @dataclasses.dataclass
 class BycycleModel:
@@ -35,8 +67,11 @@ class BycycleModel:
         )
 
 
+    def jacobians(self, x: np.ndarray, u: np.ndarray) -> Jacobians:
+        return bicycle_jacobians(x, u[0], u[1], self.l, self.a, self.phi_max)
+
     def as_linear_stata_space(self, x_equilibrium: np.ndarray, u_equilibrium: np.ndarray) -> control.StateSpace:
-        return control.linearize(self.as_non_linear_system(), x_equilibrium.tolist(), u_equilibrium.tolist())
+        return linearize_analytic(self, x_equilibrium, u_equilibrium, C=np.eye(3), system=self.as_non_linear_system())
 
 @dataclasses.dataclass
 class BycycleModelWithNoise:
@@ -71,8 +106,13 @@ class BycycleModelWithNoise:
         )
     
 
+    def jacobians(self, x: np.ndarray, u: np.ndarray) -> Jacobians:
+        """Noise inputs enter the state update additively"""
+        A, B = bicycle_jacobians(x, u[0], u[1], self.l, self.a, self.phi_max)
+        return Jacobians(A=A, B=np.concatenate([B, np.broadcast_to(np.eye(3), B.shape[:-1] + (3, ))], axis=-1))
+
     def as_linear_stata_space(self, x_equilibrium: np.ndarray, u_equilibrium: np.ndarray) -> control.StateSpace:
-        return control.linearize(self.as_non_linear_system(), x_equilibrium.tolist(), u_equilibrium.tolist())
+        return linearize_analytic(self, x_equilibrium, u_equilibrium, C=np.eye(3), system=self.as_non_linear_system())
 
 
 
@@ -101,13 +141,31 @@ class BycycleModelWithNoise:
 #             dt=self.dt
 #         )
 
+def _noise_table(scale: float, bandwidth: float, seed: int | None, stream: str) -> BandLimitedNoise:
+    """
+    Noise on (x, y, theta). Without a seed one is derived from the state of the global generator,
+    which is read but not advanced: np.random.seed still fixes the noise and the draws that follow
+    are the same as without the block. `stream` keeps the tables of different blocks apart
+    """
+    if seed is None:
+        _, key, position, *_ = np.random.get_state()
+        seed = int(np.random.SeedSequence([*key, position, *stream.encode()]).generate_state(1)[0])
+    return BandLimitedNoise(channels=3, scale=scale, bandwidth=bandwidth, seed=seed)
+
+
 @dataclasses.dataclass
 class NoiseBlock:
+    """Measurement noise read from a band-limited noise table (utils.noise_tables) at the solver time"""
     scale: float = dataclasses.field(default=0.0)
+    bandwidth: float = dataclasses.field(default=10.)   # Hz
+    seed: int | None = dataclasses.field(default=None)
+    __noise: BandLimitedNoise = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.__noise = _noise_table(self.scale, self.bandwidth, self.seed, stream="NoiseBlock")
 
     def __noise_outputs(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
-        noise = np.random.normal(loc=0, scale=self.scale, size=u.shape)
-        return u + noise
+        return u + self.__noise(t)
 
     def as_non_linear_io_system(self) -> control.NonlinearIOSystem:
         return control.NonlinearIOSystem(
@@ -140,11 +198,17 @@ class DelayBlock:
 
 @dataclasses.dataclass
 class NoiseAndDelayBlock:
+    """Process noise read from a band-limited noise table (utils.noise_tables) at the solver time"""
     scale: float = dataclasses.field(default=0.1)
+    bandwidth: float = dataclasses.field(default=10.)   # Hz
+    seed: int | None = dataclasses.field(default=None)
+    __noise: BandLimitedNoise = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.__noise = _noise_table(self.scale, self.bandwidth, self.seed, stream="NoiseAndDelayBlock")
 
     def __update(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
-        noise = np.random.normal(loc=0, scale=self.scale, size=u.shape)
-        return u + noise
+        return u + self.__noise(t)
 
     def __output(self, t, x: np.ndarray, u: np.ndarray, params) -> np.ndarray:
         return x
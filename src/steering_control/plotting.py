@@ -1,15 +1,15 @@
 import control
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.axes import Axes
-from matplotlib.figure import Figure
+from typing import TYPE_CHECKING
 
 from simulations import simulate_lqr_system_dynamics, simulate_lqr_system_noisy_dynamics, simulate_lqr_system_with_exogenous_noise
+from utils.plot_style import lazy_pyplot
 
-matplotlib.use("TkAgg")
-plt.style.use('https://github.com/dhaitz/matplotlib-stylesheets/raw/master/pitayasmoothie-dark.mplstyle')
-plt.rcParams.update({"font.size":7})
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+
+plt = lazy_pyplot(rc={"font.size": 7})
 
 def plot_lqr_controller_response(time_response: control.TimeResponseData) -> None:
     time_response_as_df = time_response.to_pandas()
@@ -1,11 +1,22 @@
 import control
 import pandas as pd
 import numpy
-from typing import NamedTuple
+import pathlib
+from typing import Iterator, NamedTuple
 
 import numpy as np
 
 from models.closed_loop_plants import VehiclePlant, VehiclePlantNoisy, VehiclePlantExogenousNoise
+from utils.chunked_streams import (
+    DEFAULT_CHUNK_SIZE,
+    ChunkSpan,
+    chunk_generator,
+    chunk_span,
+    chunk_spans,
+    chunk_time,
+    sample_count
+)
+from utils.profiling import profiled_input_output_response
 
 class StaticTrajectory(NamedTuple):
     t: np.ndarray
@@ -15,12 +26,7 @@ class StaticTrajectory(NamedTuple):
 
 def generate_static_trajectory(t_final: float, dt: float, scale: float = 0.1) -> StaticTrajectory:
     timepts = np.linspace(0, t_final, round(t_final/dt))
-    x_d = np.array([
-        8 * timepts + 4 * (timepts - 5) * (timepts > 5),
-        0.5 * np.sin(timepts * 2 * np.pi),
-        np.zeros_like(timepts)
-    ])
-    u_d = np.array([1 * np.ones_like(timepts), np.zeros_like(timepts)])
+    x_d, u_d = _static_reference(timepts)
     x_n = np.array([
         np.random.normal(loc=0, scale=scale, size=timepts.size),
         np.random.normal(loc=0, scale=scale, size=timepts.size),
@@ -33,13 +39,55 @@ def generate_static_trajectory(t_final: float, dt: float, scale: float = 0.1) ->
         x_n=x_n
     )
 
-def simulate_lqr_system_dynamics() -> control.TimeResponseData:
+def _static_reference(timepts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    x_d = np.array([
+        8 * timepts + 4 * (timepts - 5) * (timepts > 5),
+        0.5 * np.sin(timepts * 2 * np.pi),
+        np.zeros_like(timepts)
+    ])
+    u_d = np.array([1 * np.ones_like(timepts), np.zeros_like(timepts)])
+    return x_d, u_d
+
+def _static_trajectory_chunk(span: ChunkSpan, t_final: float, dt: float, scale: float, seed: int) -> StaticTrajectory:
+    timepts = chunk_time(span, t_final, sample_count(t_final, dt))
+    x_d, u_d = _static_reference(timepts)
+    return StaticTrajectory(
+        t=timepts,
+        x_d=x_d,
+        u_d=u_d,
+        x_n=chunk_generator(seed, span.index).normal(loc=0, scale=scale, size=(3, timepts.size))
+    )
+
+def static_trajectory_chunk(index: int, t_final: float, dt: float, scale: float = 0.1,
+                            seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> StaticTrajectory:
+    """Chunk `index` of stream_static_trajectory, drawn on its own"""
+    span = chunk_span(index, sample_count(t_final, dt), chunk_size)
+    return _static_trajectory_chunk(span, t_final, dt, scale, seed)
+
+def stream_static_trajectory(t_final: float, dt: float, scale: float = 0.1,
+                             seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[StaticTrajectory]:
+    """
+    Same time grid and references as generate_static_trajectory, yielded in chunks of at most
+    chunk_size samples with the noise of each chunk drawn from its own seeded generator
+    """
+    for span in chunk_spans(sample_count(t_final, dt), chunk_size):
+        yield _static_trajectory_chunk(span, t_final, dt, scale, seed)
+
+def simulate_lqr_system_dynamics(profile_report: pathlib.Path | None = None) -> control.TimeResponseData:
+    """:param profile_report: when given, every block is profiled into <profile_report>.json/.folded"""
     lqr_controlled_plant = VehiclePlant().create_closed_loop_system()
     trajectories = generate_static_trajectory(t_final=10, dt=0.01)
+    if profile_report is not None:
+        response, profiler = profiled_input_output_response(
+            lqr_controlled_plant, trajectories.t, np.vstack((trajectories.x_d, trajectories.u_d)), 0
+        )
+        profiler.export(profile_report)
+        return response
     return control.input_output_response(lqr_controlled_plant, trajectories.t,
                                          np.vstack((trajectories.x_d, trajectories.u_d)), 0)
 
-def simulate_lqr_system_noisy_dynamics() -> control.TimeResponseData:
+def simulate_lqr_system_noisy_dynamics(profile_report: pathlib.Path | None = None) -> control.TimeResponseData:
+    """:param profile_report: when given, every block is profiled into <profile_report>.json/.folded"""
     lqr_controlled_plant = VehiclePlantNoisy().create_closed_loop_system()
 
     print("-----"*20)
@@ -48,6 +96,12 @@ def simulate_lqr_system_noisy_dynamics() -> control.TimeResponseData:
     print(lqr_controlled_plant)
 
     trajectories = generate_static_trajectory(t_final=10, dt=0.01)
+    if profile_report is not None:
+        response, profiler = profiled_input_output_response(
+            lqr_controlled_plant, trajectories.t, np.vstack((trajectories.x_d, trajectories.u_d)), 0
+        )
+        profiler.export(profile_report)
+        return response
     return control.input_output_response(lqr_controlled_plant, trajectories.t,
                                          np.vstack((trajectories.x_d, trajectories.u_d)), 0)
 
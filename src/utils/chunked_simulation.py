@@ -0,0 +1,51 @@
+from typing import Iterable
+
+import control
+import numpy as np
+
+from utils.result_store import ColumnarResultWriter
+
+
+def _single_sample_response(system: control.InputOutputSystem, t: np.ndarray, U: np.ndarray, x: np.ndarray) -> control.TimeResponseData:
+    """A last chunk of one sample, whose state is the end state of the chunk before it"""
+    return control.TimeResponseData(
+        t, system.output(t[0], x, U[:, 0]).reshape(-1, 1), x.reshape(-1, 1), U,
+        output_labels=list(system.output_labels), state_labels=list(system.state_labels),
+        input_labels=list(system.input_labels), transpose=False, issiso=False
+    )
+
+
+def simulate_chunked(system: control.InputOutputSystem,
+                     chunks: Iterable[tuple[np.ndarray, np.ndarray]],
+                     writer: ColumnarResultWriter,
+                     X0: np.ndarray | list[float] | float = 0.,
+                     **kwargs) -> np.ndarray:
+    """
+    control.input_output_response over consecutive chunks of a time grid, with every chunk
+    appended to writer as soon as it is integrated, so neither the inputs nor the response of the
+    whole grid are ever held in memory. Every chunk is integrated up to the first sample of the
+    next one, whose state starts the next chunk: the inputs are interpolated across the chunk
+    boundaries as in one simulation over the whole grid, only the solver restarts there
+    :param chunks: (t, U) of consecutive chunks, U with one row per input of the system
+    :param kwargs: passed on to control.input_output_response
+    :return: the state at the last sample of the grid
+    """
+    x = np.broadcast_to(np.asarray(X0, dtype=float), (system.nstates, )).copy()
+    iterator = iter(chunks)
+    current = next(iterator, None)
+    while current is not None:
+        following = next(iterator, None)
+        t, U = np.asarray(current[0], dtype=float), np.reshape(current[1], (system.ninputs, -1))
+        length = t.shape[0]
+        if following is not None:
+            t = np.append(t, following[0][0])
+            U = np.hstack([U, np.reshape(following[1], (system.ninputs, -1))[:, :1]])
+        if t.shape[0] == 1:
+            response = _single_sample_response(system, t, U, x)
+        else:
+            response = control.input_output_response(system, t, U, x, **kwargs)
+        states = np.reshape(response.states, (system.nstates, -1))
+        writer.write_response(response, length=length)
+        x = states[:, -1].copy()
+        current = following
+    return x
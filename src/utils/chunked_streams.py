@@ -0,0 +1,48 @@
+from typing import Iterator, NamedTuple
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE: int = 10_000
+
+
+class ChunkSpan(NamedTuple):
+    index: int
+    start: int      # first sample of the chunk
+    stop: int       # one past the last sample of the chunk
+
+
+def sample_count(t_final: float, dt: float) -> int:
+    """Number of samples of the np.linspace(0, t_final, round(t_final / dt)) grids used by the generators"""
+    return round(t_final / dt)
+
+
+def chunk_count(n_samples: int, chunk_size: int) -> int:
+    return -(-n_samples // chunk_size)
+
+
+def chunk_span(index: int, n_samples: int, chunk_size: int) -> ChunkSpan:
+    if not 0 <= index < chunk_count(n_samples, chunk_size):
+        raise IndexError(f"Chunk {index} out of range for {n_samples} samples in chunks of {chunk_size}")
+    return ChunkSpan(index, index * chunk_size, min((index + 1) * chunk_size, n_samples))
+
+
+def chunk_spans(n_samples: int, chunk_size: int) -> Iterator[ChunkSpan]:
+    for index in range(chunk_count(n_samples, chunk_size)):
+        yield chunk_span(index, n_samples, chunk_size)
+
+
+def chunk_time(span: ChunkSpan, t_final: float, n_samples: int) -> np.ndarray:
+    """The samples [start, stop) of np.linspace(0, t_final, n_samples), bit for bit"""
+    step = t_final / (n_samples - 1) if n_samples > 1 else t_final
+    time = np.arange(span.start, span.stop) * step
+    if span.stop == n_samples and n_samples > 1:
+        time[-1] = t_final
+    return time
+
+
+def chunk_generator(seed: int, index: int) -> np.random.Generator:
+    """
+    Independent generator of one chunk. The chunk index is the spawn key of the seed sequence,
+    so any chunk can be drawn without drawing the ones before it
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index, )))
@@ -0,0 +1,219 @@
+import copy
+import dataclasses
+from typing import Callable
+
+import control
+import numpy as np
+
+BlockFunction = Callable[[float, np.ndarray, np.ndarray], np.ndarray]
+
+_PROBE_POINTS: int = 3
+_PROBE_STEP: float = 1e-3
+
+
+@dataclasses.dataclass
+class _CompiledBlock:
+    name: str
+    update: BlockFunction | None
+    output: BlockFunction
+    states: slice
+    inputs: slice
+    outputs: slice
+    feedthrough: np.ndarray             # per input, whether it reaches the output directly
+    source_index: np.ndarray | None     # pure routing: input k reads signal[source_index[k]]
+    source_matrix: np.ndarray | None    # otherwise inputs = source_matrix @ signal
+
+
+def _leaf_functions(sys: control.NonlinearIOSystem) -> tuple[BlockFunction | None, BlockFunction]:
+    if isinstance(sys, control.InterconnectedSystem):
+        compiled = CompiledInterconnect(sys)
+        return (compiled.dynamics if sys.nstates else None), compiled.output
+
+    if isinstance(sys, control.StateSpace):
+        A, B, C, D = sys.A, sys.B, sys.C, sys.D
+        update = (lambda t, x, u: A @ x + B @ u) if sys.nstates else None
+        return update, (lambda t, x, u: C @ x + D @ u)
+
+    params = sys.params
+    updfcn, outfcn = sys.updfcn, sys.outfcn
+    update = None
+    if sys.nstates:
+        update = lambda t, x, u: np.asarray(updfcn(t, x, u, params)).reshape(-1)
+    if outfcn is None:
+        n_outputs = sys.noutputs
+        return update, (lambda t, x, u: x[:n_outputs])
+    return update, (lambda t, x, u: np.asarray(outfcn(t, x, u, params)).reshape(-1))
+
+
+def _probe_feedthrough(sys: control.NonlinearIOSystem) -> np.ndarray:
+    """
+    Checks numerically which inputs of `sys` reach its outputs directly.
+    The probe runs on a deep copy so output functions with side effects are left untouched
+    """
+    feedthrough = np.zeros(sys.ninputs, dtype=bool)
+    if isinstance(sys, control.StateSpace):
+        return np.any(sys.D != 0, axis=0)
+    if not isinstance(sys, control.InterconnectedSystem) and sys.outfcn is None:
+        return feedthrough
+
+    _, output = _leaf_functions(copy.deepcopy(sys))
+    rng = np.random.default_rng(0)
+    for _ in range(_PROBE_POINTS):
+        x = rng.standard_normal(sys.nstates)
+        u = rng.standard_normal(sys.ninputs)
+        y = output(0., x, u)
+        for k in np.flatnonzero(~feedthrough):
+            u_perturbed = u.copy()
+            u_perturbed[k] += _PROBE_STEP * (1 + abs(u[k]))
+            feedthrough[k] = not np.allclose(output(0., x, u_perturbed), y, rtol=1e-12, atol=1e-12)
+    return feedthrough
+
+
+def _routing(matrix: np.ndarray, zero_index: int | None) -> tuple[np.ndarray | None, np.ndarray | None]:
+    """
+    Turns rows of a connection matrix into an integer index map when every row copies exactly
+    one signal with unit gain (or is unconnected and a zero slot is available), falls back to
+    the matrix otherwise
+    """
+    nonzero = matrix != 0
+    n_sources = nonzero.sum(axis=1)
+    min_sources = 1 if zero_index is None else 0
+    if np.all(n_sources <= 1) and np.all(n_sources >= min_sources) and np.all(matrix[nonzero] == 1):
+        index = np.full(matrix.shape[0], 0 if zero_index is None else zero_index)
+        rows, columns = np.nonzero(nonzero)
+        index[rows] = columns
+        return index, None
+    if zero_index is None:
+        return None, matrix
+    return None, np.hstack([matrix, np.zeros((matrix.shape[0], 1))])
+
+
+def _evaluation_order(blocks: list[_CompiledBlock], connect_map: np.ndarray) -> list[int]:
+    owner = np.empty(connect_map.shape[1], dtype=int)
+    for i, block in enumerate(blocks):
+        owner[block.outputs] = i
+    depends_on: list[set[int]] = []
+    for block in blocks:
+        direct_inputs = connect_map[block.inputs][block.feedthrough]
+        depends_on.append(set(owner[np.nonzero(direct_inputs)[1]].tolist()))
+
+    order, ready = [], [i for i, sources in enumerate(depends_on) if not sources]
+    remaining = [set(sources) for sources in depends_on]
+    while ready:
+        current = ready.pop(0)
+        order.append(current)
+        for i, sources in enumerate(remaining):
+            if current in sources:
+                sources.discard(current)
+                if not sources:
+                    ready.append(i)
+    if len(order) != len(blocks):
+        raise RuntimeError("algebraic loop detected")
+    return order
+
+
+class CompiledInterconnect:
+    """
+    Flattened evaluation of a control.interconnect system. Signal routing by label is resolved
+    once into integer index maps, the subsystems are evaluated in feedthrough order in a single
+    pass (instead of the fixed point iteration of InterconnectedSystem) and all intermediate
+    signals live in preallocated buffers
+    """
+
+    def __init__(self, system: control.InterconnectedSystem, feedthrough: dict[str, bool | list[bool]] | None = None):
+        feedthrough = feedthrough if feedthrough else {}
+        self.system = system
+        self.name = system.name
+        self.dt = system.dt
+        self.nstates, self.ninputs, self.noutputs = system.nstates, system.ninputs, system.noutputs
+
+        n_internal_inputs, n_internal_outputs = system.connect_map.shape
+        self.__n_signals = n_internal_outputs
+        # signal buffer layout: [subsystem outputs | external inputs | constant zero]
+        self.__signals = np.zeros(n_internal_outputs + system.ninputs + 1)
+        self.__inputs = np.zeros(n_internal_inputs)
+        self.__xdot = np.zeros(system.nstates)
+        self.__external = slice(n_internal_outputs, n_internal_outputs + system.ninputs)
+        zero_index = self.__signals.shape[0] - 1
+
+        self.__blocks: list[_CompiledBlock] = []
+        state_index, input_index, output_index = 0, 0, 0
+        routing_matrix = np.hstack([system.connect_map, system.input_map])
+        for sys in system.syslist:
+            update, output = _leaf_functions(sys)
+            inputs = slice(input_index, input_index + sys.ninputs)
+            source_index, source_matrix = _routing(routing_matrix[inputs], zero_index)
+            self.__blocks.append(_CompiledBlock(
+                name=sys.name,
+                update=update,
+                output=output,
+                states=slice(state_index, state_index + sys.nstates),
+                inputs=inputs,
+                outputs=slice(output_index, output_index + sys.noutputs),
+                feedthrough=np.broadcast_to(feedthrough[sys.name], sys.ninputs).astype(bool)
+                if sys.name in feedthrough else _probe_feedthrough(sys),
+                source_index=source_index,
+                source_matrix=source_matrix,
+            ))
+            state_index += sys.nstates
+            input_index += sys.ninputs
+            output_index += sys.noutputs
+
+        self.__order = [self.__blocks[i] for i in _evaluation_order(self.__blocks, system.connect_map)]
+        self.__stateful = [block for block in self.__blocks if block.update is not None]
+        # inputs gathered during the output pass may still read stale signals on non direct channels
+        self.__partially_direct = [block for block in self.__blocks if not block.feedthrough.all()]
+        self.__output_map = system.output_map
+        self.__output_index, _ = _routing(system.output_map, None)
+
+    def __gather_inputs(self, block: _CompiledBlock) -> np.ndarray:
+        if block.source_index is not None:
+            self.__inputs[block.inputs] = self.__signals[block.source_index]
+        else:
+            self.__inputs[block.inputs] = block.source_matrix @ self.__signals
+        return self.__inputs[block.inputs]
+
+    def __compute_static_io(self, t: float, x: np.ndarray, u: np.ndarray) -> None:
+        self.__signals[self.__external] = u
+        for block in self.__order:
+            block_input = self.__gather_inputs(block) if block.feedthrough.any() else self.__inputs[block.inputs]
+            self.__signals[block.outputs] = block.output(t, x[block.states], block_input)
+        for block in self.__partially_direct:
+            self.__gather_inputs(block)
+
+    def dynamics(self, t: float, x: np.ndarray, u: np.ndarray) -> np.ndarray:
+        self.__compute_static_io(t, x, u)
+        for block in self.__stateful:
+            self.__xdot[block.states] = block.update(t, x[block.states], self.__inputs[block.inputs])
+        return self.__xdot.copy()
+
+    def output(self, t: float, x: np.ndarray, u: np.ndarray) -> np.ndarray:
+        self.__compute_static_io(t, x, u)
+        internal = np.concatenate([self.__signals[:self.__n_signals], self.__inputs])
+        if self.__output_index is not None:
+            return internal[self.__output_index]
+        return self.__output_map @ internal
+
+    def as_nonlinear_io_system(self) -> control.NonlinearIOSystem:
+        return control.NonlinearIOSystem(
+            (lambda t, x, u, params: self.dynamics(t, x, u)) if self.nstates else None,
+            lambda t, x, u, params: self.output(t, x, u),
+            name=f"{self.name}_compiled",
+            states=self.system.state_labels,
+            inputs=self.system.input_labels,
+            outputs=self.system.output_labels,
+            dt=self.dt
+        )
+
+
+def compile_interconnect(system: control.InterconnectedSystem,
+                         feedthrough: dict[str, bool | list[bool]] | None = None) -> control.NonlinearIOSystem:
+    """
+    Compiles an interconnected closed loop into a single NonlinearIOSystem with a flat
+    right hand side that can be passed to control.input_output_response unchanged
+    :param system: system returned by control.interconnect
+    :param feedthrough: per subsystem name, whether its output depends directly on its inputs
+        (a single flag or one flag per input). Subsystems not listed are probed numerically
+    :return: compiled system with the labels of the original one
+    """
+    return CompiledInterconnect(system, feedthrough).as_nonlinear_io_system()
@@ -0,0 +1,201 @@
+import copy
+import dataclasses
+import itertools
+from typing import NamedTuple
+
+import control
+import numpy as np
+from scipy import integrate
+
+from utils.ode_solvers import solver_class
+
+_INITIAL_CAPACITY: int = 1024
+
+# the jump of the sources at the start of the history reappears one derivative smoother after
+# every delay, the solver is restarted at the jumps it cannot resolve by itself
+_DISCONTINUITY_ORDER: int = 5
+
+# repetitions of a step longer than a delay, each one reading the delayed sources inside the step
+# from the segment of the previous repetition
+_OVERLAP_ITERATIONS: int = 4
+
+# fractions of a step (Chebyshev-Lobatto points) at which the delayed sources are sampled, and the
+# map from those samples to the coefficients of the polynomial through them in the fraction of the step
+_SEGMENT_NODES: np.ndarray = (1. - np.cos(np.linspace(0., np.pi, 6))) / 2.
+_SEGMENT_FIT: np.ndarray = np.linalg.inv(np.vander(_SEGMENT_NODES, increasing=True))
+
+
+class TransportDelay(NamedTuple):
+    source: str             # output of the undelayed system that is delayed
+    target: str             # input of the undelayed system that receives source(t - tau)
+    tau: float
+    initial: float = 0.     # value of the source before the start of the simulation
+
+
+class _History:
+    """
+    Growing record of the delayed sources as one polynomial segment per accepted solver step,
+    fitted to the sources at the step boundaries and at interior points of the dense state output,
+    so reads are as accurate as the step itself instead of capped at second order. Reads past the
+    last segment extrapolate the last polynomial
+    """
+
+    def __init__(self, initial: np.ndarray):
+        self.__initial = initial
+        self.__start = np.empty(_INITIAL_CAPACITY)
+        self.__end = np.empty(_INITIAL_CAPACITY)
+        self.__coefficients = np.empty((_INITIAL_CAPACITY, _SEGMENT_NODES.shape[0], initial.shape[0]))
+        self.__size = 0
+        self.__channels = np.arange(initial.shape[0])
+
+    def append(self, t_start: float, t_end: float, values: np.ndarray) -> None:
+        """:param values: the sources at t_start + _SEGMENT_NODES * (t_end - t_start), one row per node"""
+        if self.__size == self.__end.shape[0]:
+            self.__start = np.resize(self.__start, 2 * self.__size)
+            self.__end = np.resize(self.__end, 2 * self.__size)
+            self.__coefficients = np.resize(self.__coefficients, (2 * self.__size, ) + self.__coefficients.shape[1:])
+        self.__start[self.__size] = t_start
+        self.__end[self.__size] = t_end
+        self.__coefficients[self.__size] = _SEGMENT_FIT @ values
+        self.__size += 1
+
+    def pop(self) -> None:
+        """Drops the last segment"""
+        self.__size -= 1
+
+    def __call__(self, s: np.ndarray) -> np.ndarray:
+        """:param s: one read time per channel"""
+        if self.__size == 0:
+            return self.__initial.copy()
+        segment = np.minimum(np.searchsorted(self.__end[:self.__size], s), self.__size - 1)
+        start, end = self.__start[segment], self.__end[segment]
+        theta = (s - start) / (end - start)
+        coefficients = self.__coefficients[segment, :, self.__channels]
+        interpolated = coefficients[:, -1]
+        for power in range(coefficients.shape[1] - 2, -1, -1):
+            interpolated = coefficients[:, power] + theta * interpolated
+        return np.where(s < self.__start[0], self.__initial, interpolated)
+
+
+@dataclasses.dataclass
+class DelayedInterconnect:
+    """
+    Continuous simulation of a loop with exact transport delays. `system` is the loop opened at
+    the delayed signals: every delay target is one of its inputs and every delay source one of
+    its outputs. The delayed inputs are read from a piecewise polynomial history of the sources at
+    t - tau, so the state does not grow with an approximation order and the solver step is not
+    limited by the stiff poles of a Pade approximation. Steps longer than a delay are repeated
+    until the part of the history they overlap settles
+    """
+    system: control.InputOutputSystem
+    delays: list[TransportDelay]
+
+    def __post_init__(self):
+        inputs, outputs = list(self.system.input_labels), list(self.system.output_labels)
+        self.__targets = np.array([inputs.index(delay.target) for delay in self.delays], dtype=int)
+        self.__sources = np.array([outputs.index(delay.source) for delay in self.delays], dtype=int)
+        self.__external = np.array([i for i, label in enumerate(inputs) if i not in self.__targets], dtype=int)
+        self.__tau = np.array([delay.tau for delay in self.delays], dtype=float)
+        assert np.all(self.__tau > 0), "Transport delays must be positive"
+        self.__initial = np.array([delay.initial for delay in self.delays], dtype=float)
+
+    @property
+    def input_labels(self) -> list[str]:
+        return [self.system.input_labels[i] for i in self.__external]
+
+    def __breakpoints(self, t_start: float, t_end: float) -> np.ndarray:
+        """Ends of the integration windows: the sums of up to _DISCONTINUITY_ORDER delays after t_start, and t_end"""
+        sums = {
+            sum(combination)
+            for order in range(1, _DISCONTINUITY_ORDER + 1)
+            for combination in itertools.combinations_with_replacement(np.unique(self.__tau), order)
+        }
+        inside = [t_start + delay for delay in sorted(sums) if t_start + delay < t_end]
+        return np.array(inside + [t_end])
+
+    def simulate(self,
+                 T: np.ndarray,
+                 U: np.ndarray | float = 0.,
+                 X0: np.ndarray | float = 0.,
+                 method: str | type[integrate.OdeSolver] = "RK45",
+                 max_step: float = np.inf,
+                 rtol: float = 1e-3,
+                 atol: float = 1e-6,
+                 **solver_kwargs) -> control.TimeResponseData:
+        """
+        :param T: output time points
+        :param U: external (undelayed) inputs, in the order of `input_labels`, linearly
+            interpolated between the points of T
+        :param X0: initial state of the opened loop
+        :param method: a name in utils.ode_solvers.SOLVERS or any scipy OdeSolver
+        :param max_step: largest solver step
+        :param rtol: relative tolerance of the solver, and of the sources of a repeated step
+        :param atol: absolute tolerance of the solver, and of the sources of a repeated step
+        :return: outputs and states of the opened loop at T, with the external inputs
+        """
+        system = self.system
+        T = np.asarray(T, dtype=float)
+        U = np.asarray(U, dtype=float)
+        U = np.broadcast_to(U.reshape(1, -1) if U.ndim < 2 else U, (self.__external.shape[0], T.shape[0]))
+        x0 = np.broadcast_to(np.asarray(X0, dtype=float), (system.nstates, )).copy()
+        shortest_delay = float(np.min(self.__tau))
+        history = _History(self.__initial)
+        u_full = np.zeros(system.ninputs)
+
+        def inputs(t: float) -> np.ndarray:
+            u_full[self.__external] = [np.interp(t, T, row) for row in U]
+            u_full[self.__targets] = history(t - self.__tau)
+            return u_full.copy()
+
+        def rhs(t: float, x: np.ndarray) -> np.ndarray:
+            return system.dynamics(t, x, inputs(t))
+
+        def sources(t: float, x: np.ndarray) -> np.ndarray:
+            return system.output(t, x, inputs(t))[self.__sources]
+
+        def step(solver: integrate.OdeSolver, start_sources: np.ndarray) -> np.ndarray:
+            """Advances the solver by one step, :return: the sources at the nodes of the step"""
+            message = solver.step()
+            if solver.status == "failed":
+                raise RuntimeError(f"Delayed simulation failed at t = {solver.t}: {message}")
+            interpolant = solver.dense_output()
+            nodes = solver.t_old + _SEGMENT_NODES * (solver.t - solver.t_old)
+            return np.vstack(
+                [start_sources] + [sources(node, interpolant(node)) for node in nodes[1:-1]] + [sources(solver.t, solver.y)]
+            )
+
+        states = np.empty((system.nstates, T.shape[0]))
+        outputs = np.empty((system.noutputs, T.shape[0]))
+        states[:, 0] = x0
+        outputs[:, 0] = system.output(T[0], x0, inputs(T[0]))
+        last_sources = outputs[self.__sources, 0]
+        next_index, t, x = 1, T[0], x0
+        for bound in self.__breakpoints(T[0], T[-1]):
+            solver = solver_class(method)(rhs, t, x, bound, max_step=max_step, rtol=rtol, atol=atol, **solver_kwargs)
+            while solver.status == "running":
+                start = copy.deepcopy(solver)
+                values = step(solver, last_sources)
+                history.append(solver.t_old, solver.t, values)
+                # the step read its own span of the history by extrapolation, repeat it with the
+                # segment it produced in place of the extrapolation until the sources settle
+                for _ in range(_OVERLAP_ITERATIONS if solver.t - solver.t_old > shortest_delay else 0):
+                    solver, previous = copy.deepcopy(start), values
+                    values = step(solver, last_sources)
+                    history.pop()
+                    history.append(solver.t_old, solver.t, values)
+                    if np.all(np.abs(values - previous) <= atol + rtol * np.abs(values)):
+                        break
+                last_sources = values[-1]
+                interpolant = solver.dense_output()
+                stop = np.searchsorted(T, solver.t, side="right")
+                for k in range(next_index, stop):
+                    states[:, k] = interpolant(T[k])
+                    outputs[:, k] = system.output(T[k], states[:, k], inputs(T[k]))
+                next_index = stop
+            t, x = solver.t, solver.y
+
+        return control.TimeResponseData(
+            T, outputs, states, U,
+            output_labels=list(system.output_labels), state_labels=list(system.state_labels),
+            input_labels=self.input_labels, title="Delayed simulation", transpose=False, issiso=False
+        )
@@ -0,0 +1,127 @@
+import collections
+import dataclasses
+import enum
+from typing import NamedTuple, Sequence
+
+import control
+import numpy as np
+from scipy import integrate
+
+from utils.ode_solvers import solver_class
+
+_WINDOW_PROBES: int = 5     # dense output points checked per step of the dwell window
+
+
+class TerminationReason(enum.Enum):
+    COMPLETED: int = 0      # integrated up to the end of the horizon
+    CONVERGED: int = 1
+    DIVERGED: int = 2
+
+
+class TerminationReport(NamedTuple):
+    reason: TerminationReason
+    t_stop: float           # time the integration stopped
+    n_integrated: int       # samples of T that were integrated, the rest are filled
+
+
+@dataclasses.dataclass
+class TerminationCriterion:
+    """
+    Stops a simulation once the state stays within `band` for `dwell_time`, or once it leaves
+    `divergence_bound`. Distances are Euclidean over `states` (all states when None) and are
+    taken to `equilibrium`. Without an equilibrium, convergence means that over the last
+    `dwell_time` the state stayed within `band` of its current value, and divergence is
+    measured from the origin. In both cases the band is checked on the dense output between
+    the solver steps, not only at their ends
+    :param fill_converged: when True the samples after convergence hold the last state, and the
+        outputs are evaluated on it with the actual inputs. Otherwise they are NaN like after a
+        divergence
+    """
+    band: float
+    dwell_time: float
+    divergence_bound: float = dataclasses.field(default=np.inf)
+    equilibrium: np.ndarray | Sequence[float] | None = dataclasses.field(default=None)
+    states: Sequence[int] | None = dataclasses.field(default=None)
+    fill_converged: bool = dataclasses.field(default=True)
+
+    def __post_init__(self):
+        if self.equilibrium is not None:
+            self.equilibrium = np.asarray(self.equilibrium, dtype=float)
+
+    def _selected(self, x: np.ndarray) -> np.ndarray:
+        return x if self.states is None else x[list(self.states)]
+
+
+def _held(window: collections.deque, center: np.ndarray, t_start: float, criterion: TerminationCriterion) -> bool:
+    """Whether the dense output of the steps in the window stays within the band around center from t_start on"""
+    for t_old, t, interpolant in window:
+        times = np.linspace(max(t_old, t_start), t, _WINDOW_PROBES)
+        if np.any(np.linalg.norm(criterion._selected(interpolant(times)).T - center, axis=-1) > criterion.band):
+            return False
+    return True
+
+
+def simulate_with_termination(system: control.NonlinearIOSystem,
+                              T: np.ndarray,
+                              U: np.ndarray | float,
+                              X0: np.ndarray | Sequence[float] | float,
+                              criterion: TerminationCriterion,
+                              method: str = "RK45",
+                              **solver_kwargs) -> tuple[control.TimeResponseData, TerminationReport]:
+    """
+    control.input_output_response for continuous systems that stops integrating once the
+    criterion is met. The criterion is checked after every accepted solver step
+    :return: response over the full T and the report of where and why it stopped
+    """
+    T = np.asarray(T, dtype=float)
+    U = np.asarray(U, dtype=float)
+    U = np.broadcast_to(U.reshape(1, -1) if U.ndim < 2 else U, (system.ninputs, T.shape[0]))
+    x0 = np.broadcast_to(np.asarray(X0, dtype=float), (system.nstates, )).copy()
+
+    def inputs(t: float) -> np.ndarray:
+        return np.array([np.interp(t, T, row) for row in U])
+
+    solver = solver_class(method)(lambda t, x: system.dynamics(t, x, inputs(t)), T[0], x0, T[-1], **solver_kwargs)
+    states = np.full((system.nstates, T.shape[0]), np.nan)
+    states[:, 0] = x0
+    next_index = 1
+    reason = TerminationReason.COMPLETED
+    window: collections.deque = collections.deque()     # (t_old, t, interpolant) of the steps inside the dwell
+    while next_index < T.shape[0] and solver.status == "running":
+        message = solver.step()
+        if solver.status == "failed":
+            raise RuntimeError(f"Simulation failed at t = {solver.t}: {message}")
+        interpolant = solver.dense_output()
+        stop = np.searchsorted(T, solver.t, side="right")
+        for k in range(next_index, stop):
+            states[:, k] = interpolant(T[k])
+        next_index = stop
+
+        x = criterion._selected(solver.y)
+        reference = criterion._selected(criterion.equilibrium) if criterion.equilibrium is not None else np.zeros_like(x)
+        if np.linalg.norm(x - reference) > criterion.divergence_bound or not np.all(np.isfinite(x)):
+            reason = TerminationReason.DIVERGED
+            break
+        window.append((solver.t_old, solver.t, interpolant))
+        while window[0][1] < solver.t - criterion.dwell_time:
+            window.popleft()
+        center = x if criterion.equilibrium is None else reference
+        if solver.t - T[0] >= criterion.dwell_time and _held(window, center, solver.t - criterion.dwell_time, criterion):
+            reason = TerminationReason.CONVERGED
+            break
+
+    outputs = np.full((system.noutputs, T.shape[0]), np.nan)
+    for k in range(next_index):
+        outputs[:, k] = system.output(T[k], states[:, k], inputs(T[k]))
+    if reason == TerminationReason.CONVERGED and criterion.fill_converged:
+        for k in range(next_index, T.shape[0]):
+            states[:, k] = solver.y
+            outputs[:, k] = system.output(T[k], solver.y, inputs(T[k]))
+
+    response = control.TimeResponseData(
+        T, outputs, states, U,
+        output_labels=list(system.output_labels), state_labels=list(system.state_labels),
+        input_labels=list(system.input_labels), title=f"Simulation ({reason.name.lower()})",
+        transpose=False, issiso=system.issiso()
+    )
+    return response, TerminationReport(reason=reason, t_stop=float(solver.t), n_integrated=int(next_index))
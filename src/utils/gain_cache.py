@@ -0,0 +1,108 @@
+import collections
+import dataclasses
+import hashlib
+import os
+import pathlib
+import tempfile
+from typing import NamedTuple
+
+import control
+import numpy as np
+
+
+class LQRSolution(NamedTuple):
+    K: np.ndarray       # state feedback gain
+    S: np.ndarray       # solution of the Riccati equation
+    E: np.ndarray       # closed loop eigenvalues
+
+
+class CacheStatistics(NamedTuple):
+    hits: int
+    disk_hits: int
+    misses: int
+    entries: int
+
+
+def array_digest(*arrays: np.ndarray) -> str:
+    """
+    Content hash of a sequence of arrays. Shapes are part of the hash so that e.g. a (2, 2) and
+    a (4, ) array with the same values do not collide
+    """
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype=float)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+@dataclasses.dataclass
+class LQRGainCache:
+    """
+    Gains of control.lqr keyed by the content of (A, B, Q, R). Recently used solutions are kept in
+    memory, and when `directory` is set every solution is also stored on disk so that other
+    processes and later runs can reuse it
+    """
+    max_entries: int = dataclasses.field(default=1024)
+    directory: pathlib.Path | None = dataclasses.field(default=None)
+    hits: int = dataclasses.field(default=0, init=False)
+    disk_hits: int = dataclasses.field(default=0, init=False)
+    misses: int = dataclasses.field(default=0, init=False)
+    __entries: collections.OrderedDict = dataclasses.field(default_factory=collections.OrderedDict, init=False, repr=False)
+
+    def __load(self, key: str) -> LQRSolution | None:
+        if self.directory is None:
+            return None
+        path = pathlib.Path(self.directory) / f"{key}.npz"
+        if not path.exists():
+            return None
+        with np.load(path) as stored:
+            return LQRSolution(K=stored["K"], S=stored["S"], E=stored["E"])
+
+    def __store(self, key: str, solution: LQRSolution) -> None:
+        if self.directory is None:
+            return
+        directory = pathlib.Path(self.directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        # write then rename, so concurrent workers never read a partially written file
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".npz")
+        with os.fdopen(handle, "wb") as file:
+            np.savez(file, **solution._asdict())
+        os.replace(temporary, directory / f"{key}.npz")
+
+    def __remember(self, key: str, solution: LQRSolution) -> None:
+        self.__entries[key] = solution
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+    def lqr(self, A: np.ndarray, B: np.ndarray, Q: np.ndarray, R: np.ndarray) -> LQRSolution:
+        key = array_digest(A, B, Q, R)
+        solution = self.__entries.get(key)
+        if solution is not None:
+            self.hits += 1
+            self.__entries.move_to_end(key)
+        else:
+            solution = self.__load(key)
+            if solution is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                solution = LQRSolution(*control.lqr(A, B, Q, R))
+                self.__store(key, solution)
+            self.__remember(key, solution)
+        return LQRSolution(*(value.copy() for value in solution))
+
+    def statistics(self) -> CacheStatistics:
+        return CacheStatistics(self.hits, self.disk_hits, self.misses, len(self.__entries))
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.hits, self.disk_hits, self.misses = 0, 0, 0
+
+
+lqr_gain_cache = LQRGainCache()
+
+
+def cached_lqr(A: np.ndarray, B: np.ndarray, Q: np.ndarray, R: np.ndarray) -> LQRSolution:
+    return lqr_gain_cache.lqr(A, B, Q, R)
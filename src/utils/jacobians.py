@@ -0,0 +1,101 @@
+import collections
+import dataclasses
+from typing import NamedTuple, Protocol, Sequence
+
+import control
+import numpy as np
+
+from utils.gain_cache import CacheStatistics, array_digest
+
+
+class Jacobians(NamedTuple):
+    A: np.ndarray       # (..., n, n) derivative of the state update w.r.t. the state
+    B: np.ndarray       # (..., n, m) derivative of the state update w.r.t. the input
+
+
+class AnalyticallyLinearizable(Protocol):
+    def jacobians(self, x: np.ndarray, u: np.ndarray) -> Jacobians:
+        """
+        :param x: states of shape (n, ...), trailing dimensions index operating points
+        :param u: inputs of shape (m, ...) broadcasting against x[0]
+        """
+        ...
+
+
+def stack_jacobian(rows: Sequence[Sequence[float | np.ndarray]]) -> np.ndarray:
+    """
+    Assembles a Jacobian from its entries, each a scalar or an array over operating points
+    :return: array of shape (..., len(rows), len(rows[0]))
+    """
+    entries = np.broadcast_arrays(*(np.asarray(entry, dtype=float) for row in rows for entry in row))
+    stacked = np.stack(entries, axis=-1)
+    return stacked.reshape(stacked.shape[:-1] + (len(rows), len(rows[0])))
+
+
+def _model_digest(model: AnalyticallyLinearizable, x: np.ndarray, u: np.ndarray) -> str:
+    parameters = [np.asarray(value, dtype=float) for value in dataclasses.astuple(model)]
+    return type(model).__qualname__ + array_digest(*parameters, x, u)
+
+
+@dataclasses.dataclass
+class JacobianCache:
+    """Jacobians keyed by the model type, its parameters and the operating point(s)"""
+    max_entries: int = dataclasses.field(default=4096)
+    hits: int = dataclasses.field(default=0, init=False)
+    misses: int = dataclasses.field(default=0, init=False)
+    __entries: collections.OrderedDict = dataclasses.field(default_factory=collections.OrderedDict, init=False, repr=False)
+
+    def jacobians(self, model: AnalyticallyLinearizable, x: np.ndarray, u: np.ndarray) -> Jacobians:
+        x, u = np.asarray(x, dtype=float), np.asarray(u, dtype=float)
+        key = _model_digest(model, x, u)
+        jacobians = self.__entries.get(key)
+        if jacobians is not None:
+            self.hits += 1
+            self.__entries.move_to_end(key)
+        else:
+            self.misses += 1
+            jacobians = model.jacobians(x, u)
+            self.__entries[key] = jacobians
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+        return Jacobians(*(value.copy() for value in jacobians))
+
+    def statistics(self) -> CacheStatistics:
+        return CacheStatistics(self.hits, 0, self.misses, len(self.__entries))
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.hits, self.misses = 0, 0
+
+
+jacobian_cache = JacobianCache()
+
+
+def cached_jacobians(model: AnalyticallyLinearizable, x: np.ndarray, u: np.ndarray) -> Jacobians:
+    return jacobian_cache.jacobians(model, x, u)
+
+
+def linearize_analytic(model: AnalyticallyLinearizable,
+                       x_eq: np.ndarray | Sequence[float],
+                       u_eq: np.ndarray | Sequence[float],
+                       C: np.ndarray,
+                       D: np.ndarray | None = None,
+                       system: control.InputOutputSystem | None = None) -> control.StateSpace:
+    """
+    Drop in for control.linearize on models with exact Jacobians. The output map is linear for
+    all models here, so C and D are passed in
+    :param system: the nonlinear system of the model, whose name and state, input and output
+        labels the linearization keeps, so it can be interconnected by name
+    """
+    A, B = cached_jacobians(model, x_eq, u_eq)
+    D = np.zeros((C.shape[0], B.shape[1])) if D is None else D
+    if system is None:
+        return control.ss(A, B, C, D)
+    if (system.nstates, system.ninputs, system.noutputs) != (A.shape[0], B.shape[1], C.shape[0]):
+        raise ValueError(f"{system.name} does not match the dimensions of the linearization")
+    return control.ss(
+        A, B, C, D,
+        states=list(system.state_labels), inputs=list(system.input_labels), outputs=list(system.output_labels),
+        name=control.config.defaults["iosys.linearized_system_name_prefix"] + system.name
+        + control.config.defaults["iosys.linearized_system_name_suffix"]
+    )
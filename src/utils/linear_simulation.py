@@ -0,0 +1,119 @@
+import control
+import scipy.linalg
+from typing import NamedTuple, Protocol, runtime_checkable
+
+import numpy as np
+
+
+class ExactDiscretization(NamedTuple):
+    Phi: np.ndarray         # state transition over one sample
+    Gamma: np.ndarray       # input matrix of the held input
+    Gamma_1: np.ndarray     # input matrix of the input slope (first order hold only)
+    dt: float
+
+
+@runtime_checkable
+class LinearTimeInvariant(Protocol):
+    def as_state_space(self) -> control.StateSpace: ...
+
+
+def zoh_discretize(A: np.ndarray, B: np.ndarray, dt: float, hold: str = "zoh") -> ExactDiscretization:
+    """
+    Exact discretization of x_dot = A x + B u from a single matrix exponential.
+    With hold="zoh" the input is held constant over the sample, with hold="foh" it is
+    interpolated linearly between samples (the convention control.input_output_response uses)
+    :param A: state matrix
+    :param B: input matrix
+    :param dt: sample time
+    :param hold: "zoh" or "foh"
+    :return: Phi, Gamma and Gamma_1 with x[k+1] = Phi x[k] + Gamma u[k] + Gamma_1 (u[k+1] - u[k])
+    """
+    n, m = B.shape
+    match hold:
+        case "zoh":
+            block = np.zeros((n + m, n + m))
+            block[:n, :n] = A
+            block[:n, n:] = B
+            exponential = scipy.linalg.expm(block * dt)
+            return ExactDiscretization(exponential[:n, :n], exponential[:n, n:], np.zeros((n, m)), dt)
+        case "foh":
+            block = np.zeros((n + 2 * m, n + 2 * m))
+            block[:n, :n] = A * dt
+            block[:n, n:n + m] = B * dt
+            block[n:n + m, n + m:] = np.eye(m)
+            exponential = scipy.linalg.expm(block)
+            return ExactDiscretization(exponential[:n, :n], exponential[:n, n:n + m], exponential[:n, n + m:], dt)
+        case _:
+            raise ValueError(f"Unknown hold {hold}, expected 'zoh' or 'foh'")
+
+
+def as_state_space(system: control.StateSpace | LinearTimeInvariant) -> control.StateSpace:
+    if isinstance(system, control.StateSpace):
+        return system
+    if isinstance(system, LinearTimeInvariant):
+        return system.as_state_space()
+    raise TypeError(f"{type(system).__name__} is not a linear time invariant system")
+
+
+def _broadcast_inputs(U: np.ndarray | float, ninputs: int, n_steps: int) -> np.ndarray:
+    """
+    Inputs as (ninputs, n_steps): a scalar holds every input, a 1-D array of length n_steps is
+    the trajectory of a single input and one of length ninputs holds each input constant
+    """
+    U = np.asarray(U, dtype=float)
+    if U.ndim == 0:
+        return np.full((ninputs, n_steps), float(U))
+    if U.ndim == 1:
+        if ninputs == 1 and U.shape[0] == n_steps:
+            return U.reshape(1, n_steps)
+        if U.shape[0] == ninputs:
+            return np.repeat(U[:, None], n_steps, axis=1)
+        raise ValueError(f"Input of shape {U.shape} does not match {ninputs} inputs over {n_steps} time points")
+    return np.broadcast_to(U, (ninputs, n_steps))
+
+
+def zoh_input_output_response(system: control.StateSpace | LinearTimeInvariant,
+                              T: np.ndarray,
+                              U: np.ndarray | float = 0.,
+                              X0: np.ndarray | float = 0.,
+                              hold: str = "foh") -> control.TimeResponseData:
+    """
+    Response of a continuous LTI system on a uniform time grid. Phi and Gamma are computed once
+    and the response is propagated with one matrix product per sample, no ODE solver or python
+    callbacks involved. The default hold="foh" interpolates the inputs linearly between samples
+    like control.input_output_response does, hold="zoh" holds them over each sample instead
+    :param system: StateSpace, or a wrapper that provides as_state_space
+    :param T: uniformly spaced time points
+    :param U: inputs, shape (ninputs, len(T)) or broadcastable to it
+    :param X0: initial state
+    :param hold: input hold between samples, see zoh_discretize
+    :return: response with the same labels as control.input_output_response
+    """
+    sys = as_state_space(system)
+    if control.isdtime(sys, strict=True):
+        raise ValueError("Exact discretization needs a continuous time system")
+    T = np.asarray(T, dtype=float)
+    dt = T[1] - T[0]
+    if not np.allclose(np.diff(T), dt):
+        raise ValueError("parameter `T`: time values must be equally spaced")
+
+    n_steps = T.shape[0]
+    U = _broadcast_inputs(U, sys.ninputs, n_steps)
+    X0 = np.broadcast_to(np.asarray(X0, dtype=float).reshape(-1), (sys.nstates, ))
+    Phi, Gamma, Gamma_1, _ = zoh_discretize(sys.A, sys.B, dt, hold=hold)
+
+    forcing = Gamma @ U[:, :-1]
+    if hold == "foh":
+        forcing += Gamma_1 @ np.diff(U, axis=1)
+    X = np.empty((sys.nstates, n_steps))
+    X[:, 0] = X0
+    for k in range(n_steps - 1):
+        X[:, k + 1] = Phi @ X[:, k] + forcing[:, k]
+    Y = sys.C @ X + sys.D @ U
+
+    return control.TimeResponseData(
+        T, Y, X, np.array(U), issiso=sys.issiso(),
+        output_labels=sys.output_labels, input_labels=sys.input_labels,
+        state_labels=sys.state_labels, sysname=sys.name,
+        title="Input/output response for " + sys.name
+    )
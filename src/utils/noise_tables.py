@@ -0,0 +1,54 @@
+import dataclasses
+
+import numpy as np
+
+from utils.chunked_streams import chunk_generator
+
+_KNOTS_PER_CHUNK: int = 1024
+
+
+@dataclasses.dataclass
+class BandLimitedNoise:
+    """
+    Seeded Gaussian noise that can be read inside a right hand side. Independent samples of
+    standard deviation `scale` are drawn at the knots k / (2 * bandwidth) and read back by
+    interpolation, so the value at a time does not depend on when, or how often, the solver asks
+    for it, and the solver has nothing to resolve above `bandwidth`. The interpolation weights
+    are normalized to unit norm, which keeps the standard deviation at `scale` between the knots
+    where plain linear interpolation dips to scale / sqrt(2) halfway. The knots are
+    drawn in chunks (utils.chunked_streams.chunk_generator) on first use, so the table has no
+    fixed horizon
+    :param bandwidth: in Hz
+    """
+    channels: int
+    scale: float = dataclasses.field(default=1.)
+    bandwidth: float = dataclasses.field(default=10.)
+    seed: int = dataclasses.field(default=0)
+    __chunks: dict[int, np.ndarray] = dataclasses.field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        assert self.bandwidth > 0, "The bandwidth must be positive"
+
+    @property
+    def knot_interval(self) -> float:
+        return 0.5 / self.bandwidth
+
+    def __knot(self, k: int) -> np.ndarray:
+        index, offset = divmod(k, _KNOTS_PER_CHUNK)
+        if index not in self.__chunks:
+            self.__chunks[index] = chunk_generator(self.seed, index).normal(
+                loc=0, scale=self.scale, size=(_KNOTS_PER_CHUNK, self.channels)
+            )
+        return self.__chunks[index][offset]
+
+    def __call__(self, t: float) -> np.ndarray:
+        """:return: the noise at t (clipped to t >= 0) of shape (channels, )"""
+        position = max(float(t), 0.) / self.knot_interval
+        k = int(position)
+        weight = position - k
+        norm = np.hypot(1 - weight, weight)
+        return ((1 - weight) * self.__knot(k) + weight * self.__knot(k + 1)) / norm
+
+    def table(self, T: np.ndarray) -> np.ndarray:
+        """:return: the noise at every point of T, of shape (channels, len(T))"""
+        return np.array([self(t) for t in np.asarray(T, dtype=float)]).T
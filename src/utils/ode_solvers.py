@@ -0,0 +1,70 @@
+import dataclasses
+
+from scipy import integrate
+
+SOLVERS: dict[str, type[integrate.OdeSolver]] = {
+    "RK45": integrate.RK45, "RK23": integrate.RK23, "DOP853": integrate.DOP853,
+    "Radau": integrate.Radau, "BDF": integrate.BDF, "LSODA": integrate.LSODA,
+}
+
+# methods that evaluate the right hand side exactly n_stages times per step attempt, accepted or
+# rejected. The implicit methods evaluate it a varying number of times (Newton iterations,
+# Jacobian refreshes) and LSODA attempts its steps in Fortran
+_EXPLICIT_RUNGE_KUTTA: tuple[type[integrate.OdeSolver], ...] = (integrate.RK23, integrate.RK45, integrate.DOP853)
+
+
+@dataclasses.dataclass
+class StepCounts:
+    accepted: int = dataclasses.field(default=0)
+    rejected: int | None = dataclasses.field(default=0)                 # None when the method does not allow counting them
+    solver: integrate.OdeSolver | None = dataclasses.field(default=None)    # the last solver instance created
+
+
+def solver_class(method: str | type[integrate.OdeSolver]) -> type[integrate.OdeSolver]:
+    """The scipy solver of a name in SOLVERS, solver classes are returned as they are"""
+    if not isinstance(method, str):
+        return method
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown solver {method}, expected one of {list(SOLVERS)}")
+    return SOLVERS[method]
+
+
+def counting_solver(method: str | type[integrate.OdeSolver], counts: StepCounts) -> type[integrate.OdeSolver]:
+    """
+    A subclass of the scipy solver counting its steps into counts. scipy retries rejected attempts
+    inside a single step, for the explicit Runge-Kutta methods they are recovered from the right
+    hand side evaluations of the step. For the other methods the rejections are None
+    """
+    base = solver_class(method)
+    explicit = issubclass(base, _EXPLICIT_RUNGE_KUTTA)
+    if not explicit:
+        counts.rejected = None
+
+    class CountingSolver(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            counts.solver = self
+
+        def _step_impl(self):
+            if not explicit:
+                success, message = super()._step_impl()
+                counts.accepted += int(success)
+                return success, message
+            # shadowed on the instance for this step only, concurrent solvers are not affected
+            fun, evaluations = self.fun, [0]
+
+            def counted(t, y):
+                evaluations[0] += 1
+                return fun(t, y)
+
+            self.fun = counted
+            try:
+                success, message = super()._step_impl()
+            finally:
+                self.fun = fun
+            counts.accepted += int(success)
+            counts.rejected += evaluations[0] // self.n_stages - int(success)
+            return success, message
+
+    CountingSolver.__name__ = f"Counting{base.__name__}"
+    return CountingSolver
@@ -0,0 +1,98 @@
+import dataclasses
+
+import numpy as np
+
+_P2_MARKERS: int = 5
+
+
+@dataclasses.dataclass
+class RunningMoments:
+    """Welford mean and variance of a stream of equally shaped arrays, elementwise"""
+    count: int = dataclasses.field(default=0, init=False)
+    mean: np.ndarray | None = dataclasses.field(default=None, init=False)
+    __m2: np.ndarray | None = dataclasses.field(default=None, init=False, repr=False)
+
+    def update(self, sample: np.ndarray) -> None:
+        sample = np.asarray(sample, dtype=float)
+        if self.mean is None:
+            self.mean, self.__m2 = np.zeros_like(sample), np.zeros_like(sample)
+        self.count += 1
+        delta = sample - self.mean
+        self.mean += delta / self.count
+        self.__m2 += delta * (sample - self.mean)
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Unbiased sample variance, NaN until two samples are seen"""
+        if self.count < 2:
+            return np.full_like(self.mean, np.nan)
+        return self.__m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+
+@dataclasses.dataclass
+class P2Quantile:
+    """
+    Streaming estimate of the p quantile of every element of a stream of equally shaped arrays,
+    by the P-square algorithm (Jain and Chlamtac, 1985). Five markers per element are kept, so
+    the memory does not grow with the stream. The estimate depends on the order of the samples,
+    it is exact up to five samples
+    """
+    p: float
+    count: int = dataclasses.field(default=0, init=False)
+    __heights: np.ndarray | None = dataclasses.field(default=None, init=False, repr=False)     # (5, *shape)
+    __positions: np.ndarray | None = dataclasses.field(default=None, init=False, repr=False)   # (5, *shape)
+    __desired: np.ndarray = dataclasses.field(init=False, repr=False)                         # (5, )
+    __increments: np.ndarray = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        assert 0 < self.p < 1, "The quantile must lie in (0, 1)"
+        p = self.p
+        self.__desired = np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])
+        self.__increments = np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+    def update(self, sample: np.ndarray) -> None:
+        sample = np.asarray(sample, dtype=float)
+        if self.__heights is None:
+            self.__heights = np.empty((_P2_MARKERS, ) + sample.shape)
+        if self.count < _P2_MARKERS:
+            self.__heights[self.count] = sample
+            self.count += 1
+            if self.count == _P2_MARKERS:
+                self.__heights.sort(axis=0)
+                self.__positions = np.broadcast_to(
+                    np.arange(1., _P2_MARKERS + 1).reshape((-1, ) + (1, ) * sample.ndim), self.__heights.shape
+                ).copy()
+            return
+        self.count += 1
+        q, n = self.__heights, self.__positions
+        q[0] = np.minimum(q[0], sample)
+        q[-1] = np.maximum(q[-1], sample)
+        cell = np.sum(sample >= q[1:-1], axis=0)        # markers above the sample move up
+        n[1:] += np.arange(1, _P2_MARKERS)[(slice(None), ) + (None, ) * sample.ndim] > cell
+        self.__desired += self.__increments
+
+        for i in range(1, _P2_MARKERS - 1):
+            offset = self.__desired[i] - n[i]
+            move = ((offset >= 1) & (n[i + 1] - n[i] > 1)) | ((offset <= -1) & (n[i - 1] - n[i] < -1))
+            d = np.where(move, np.sign(offset), 0.)
+            parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+            )
+            neighbour = np.where(d > 0, q[i + 1], q[i - 1])
+            neighbour_position = np.where(d > 0, n[i + 1], n[i - 1])
+            linear = q[i] + d * (neighbour - q[i]) / np.where(move, neighbour_position - n[i], 1.)
+            q[i] = np.where(move, np.where((q[i - 1] < parabolic) & (parabolic < q[i + 1]), parabolic, linear), q[i])
+            n[i] += d
+
+    @property
+    def value(self) -> np.ndarray:
+        if self.count == 0:
+            raise ValueError("No samples seen")
+        if self.count < _P2_MARKERS:
+            return np.quantile(self.__heights[:self.count], self.p, axis=0)
+        return self.__heights[2].copy()
@@ -0,0 +1,40 @@
+import os
+import pathlib
+import types
+from typing import Any
+
+STYLE_DIRECTORY: pathlib.Path = pathlib.Path(__file__).parent / "styles"
+DARK_STYLE: pathlib.Path = STYLE_DIRECTORY / "dark.mplstyle"
+DEFAULT_BACKEND: str = "Agg"
+
+
+class LazyPyplot:
+    """
+    Stand in for matplotlib.pyplot in the plotting modules. matplotlib is imported, the backend
+    selected and the style applied on the first attribute access, so importing a plotting module
+    neither loads matplotlib nor needs a display or network. The backend is Agg unless MPLBACKEND
+    is set, e.g. MPLBACKEND=TkAgg for interactive windows
+    """
+
+    def __init__(self, style: str | pathlib.Path = DARK_STYLE, rc: dict[str, Any] | None = None):
+        self.__style = style
+        self.__rc = {} if rc is None else dict(rc)
+        self.__pyplot: types.ModuleType | None = None
+
+    def __load(self) -> types.ModuleType:
+        import matplotlib
+        if not os.environ.get("MPLBACKEND"):
+            matplotlib.use(DEFAULT_BACKEND)
+        import matplotlib.pyplot as pyplot
+        pyplot.style.use(self.__style)
+        pyplot.rcParams.update(self.__rc)
+        return pyplot
+
+    def __getattr__(self, name: str) -> Any:
+        if self.__pyplot is None:
+            self.__pyplot = self.__load()
+        return getattr(self.__pyplot, name)
+
+
+def lazy_pyplot(style: str | pathlib.Path = DARK_STYLE, rc: dict[str, Any] | None = None) -> LazyPyplot:
+    return LazyPyplot(style=style, rc=rc)
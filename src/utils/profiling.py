@@ -0,0 +1,167 @@
+import dataclasses
+import json
+import pathlib
+import time
+from typing import Any, Callable, Iterator
+
+import control
+import numpy as np
+from scipy import integrate
+
+from utils.ode_solvers import StepCounts, counting_solver
+
+_MICROSECONDS: float = 1e6
+
+
+@dataclasses.dataclass
+class CallStatistics:
+    calls: int = dataclasses.field(default=0)
+    seconds: float = dataclasses.field(default=0.)
+    self_seconds: float = dataclasses.field(default=0.)     # excluding the profiled blocks it calls
+
+
+@dataclasses.dataclass
+class SubsystemProfile:
+    path: tuple[str, ...]                   # names from the profiled system down to this block
+    update: CallStatistics = dataclasses.field(default_factory=CallStatistics)
+    output: CallStatistics = dataclasses.field(default_factory=CallStatistics)
+
+
+def _subsystems(system: control.NonlinearIOSystem, path: tuple[str, ...]) -> Iterator[tuple[tuple[str, ...], control.NonlinearIOSystem]]:
+    yield path, system
+    if isinstance(system, control.InterconnectedSystem):
+        for subsystem in system.syslist:
+            yield from _subsystems(subsystem, path + (subsystem.name, ))
+
+
+@dataclasses.dataclass
+class SubsystemProfiler:
+    """
+    Opt-in instrumentation of a python-control system. Inside the `with` block the `_rhs` and
+    `_out` of the system and of every block of its interconnection (recursively) are shadowed by
+    timing wrappers; leaving the block deletes them again, so systems that are not profiled run
+    the untouched python-control code. Systems compiled by utils.compiled_interconnect call the
+    block functions directly and are not seen by the profiler.
+
+    Pass `profiler.solver()` as the integration method to also count the solver steps.
+    """
+    system: control.NonlinearIOSystem
+    steps: StepCounts = dataclasses.field(default_factory=StepCounts, init=False)
+    wall_time: float = dataclasses.field(default=0., init=False)
+    __profiles: dict[tuple[str, ...], SubsystemProfile] = dataclasses.field(default_factory=dict, init=False, repr=False)
+    __stacks: dict[tuple[str, ...], float] = dataclasses.field(default_factory=dict, init=False, repr=False)
+    __frames: list[str] = dataclasses.field(default_factory=list, init=False, repr=False)
+    __nested: list[float] = dataclasses.field(default_factory=list, init=False, repr=False)
+    __started: float = dataclasses.field(default=0., init=False, repr=False)
+
+    def __enter__(self) -> "SubsystemProfiler":
+        self.__profiles.clear()
+        self.__stacks.clear()
+        for path, subsystem in _subsystems(self.system, (self.system.name, )):
+            if path in self.__profiles:
+                raise ValueError(f"Subsystem names must be unique to be profiled, {'/'.join(path)} is repeated")
+            self.__profiles[path] = SubsystemProfile(path)
+            subsystem._rhs = self.__timed(subsystem._rhs, self.__profiles[path].update, f"{path[-1]}.update")
+            subsystem._out = self.__timed(subsystem._out, self.__profiles[path].output, f"{path[-1]}.output")
+        self.__started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.wall_time += time.perf_counter() - self.__started
+        for _, subsystem in _subsystems(self.system, (self.system.name, )):
+            for attribute in ("_rhs", "_out"):
+                if attribute in vars(subsystem):
+                    delattr(subsystem, attribute)
+
+    def __timed(self, function: Callable, statistics: CallStatistics, frame: str) -> Callable:
+        frames, nested, stacks = self.__frames, self.__nested, self.__stacks
+
+        def timed(t, x, u):
+            frames.append(frame)
+            nested.append(0.)
+            start = time.perf_counter()
+            try:
+                return function(t, x, u)
+            finally:
+                elapsed = time.perf_counter() - start
+                self_seconds = elapsed - nested.pop()
+                statistics.calls += 1
+                statistics.seconds += elapsed
+                statistics.self_seconds += self_seconds
+                stack = tuple(frames)
+                stacks[stack] = stacks.get(stack, 0.) + self_seconds
+                frames.pop()
+                if nested:
+                    nested[-1] += elapsed
+        return timed
+
+    def solver(self, method: str | type[integrate.OdeSolver] = "RK45") -> type[integrate.OdeSolver]:
+        """A subclass of the scipy solver counting its steps into the profiler, see utils.ode_solvers.counting_solver"""
+        return counting_solver(method, self.steps)
+
+    @property
+    def accepted_steps(self) -> int:
+        return self.steps.accepted
+
+    @property
+    def rejected_steps(self) -> int | None:
+        """None for the methods other than the explicit Runge-Kutta ones"""
+        return self.steps.rejected
+
+    @property
+    def profiles(self) -> list[SubsystemProfile]:
+        return list(self.__profiles.values())
+
+    def report(self) -> dict[str, Any]:
+        root = self.__profiles[(self.system.name, )]
+        return {
+            "system": self.system.name,
+            "wall_time": self.wall_time,
+            "accepted_steps": self.accepted_steps,
+            "rejected_steps": self.rejected_steps,
+            "rhs_evaluations": root.update.calls,
+            "rhs_evaluations_per_step": root.update.calls / self.accepted_steps if self.accepted_steps else np.nan,
+            "subsystems": [
+                {
+                    "path": "/".join(profile.path),
+                    "update_calls": profile.update.calls,
+                    "update_seconds": profile.update.seconds,
+                    "output_calls": profile.output.calls,
+                    "output_seconds": profile.output.seconds,
+                    "self_seconds": profile.update.self_seconds + profile.output.self_seconds,
+                }
+                for profile in self.__profiles.values()
+            ]
+        }
+
+    def to_json(self, path: pathlib.Path) -> None:
+        pathlib.Path(path).write_text(json.dumps(self.report(), indent=2))
+
+    def folded_stacks(self) -> list[str]:
+        """
+        Self time of every observed call chain (e.g. closed_loop.update;plant.output) in
+        microseconds, the folded stack input of flamegraph.pl and speedscope
+        """
+        return [f"{';'.join(stack)} {int(round(seconds * _MICROSECONDS))}" for stack, seconds in self.__stacks.items()]
+
+    def to_flame_graph(self, path: pathlib.Path) -> None:
+        pathlib.Path(path).write_text("\n".join(self.folded_stacks()) + "\n")
+
+    def export(self, stem: pathlib.Path) -> None:
+        """Writes <stem>.json and <stem>.folded"""
+        stem = pathlib.Path(stem)
+        stem.parent.mkdir(parents=True, exist_ok=True)
+        self.to_json(stem.with_suffix(".json"))
+        self.to_flame_graph(stem.with_suffix(".folded"))
+
+
+def profiled_input_output_response(system: control.NonlinearIOSystem,
+                                   T: np.ndarray,
+                                   U: np.ndarray | float = 0.,
+                                   X0: np.ndarray | float = 0.,
+                                   method: str = "RK45",
+                                   **kwargs) -> tuple[control.TimeResponseData, SubsystemProfiler]:
+    """control.input_output_response with every block of `system` profiled"""
+    with SubsystemProfiler(system) as profiler:
+        response = control.input_output_response(system, T, U, X0, solve_ivp_method=profiler.solver(method), **kwargs)
+    return response, profiler
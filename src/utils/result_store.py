@@ -0,0 +1,122 @@
+import json
+import pathlib
+from typing import BinaryIO, Mapping, Sequence
+
+import control
+import numpy as np
+
+MANIFEST_NAME: str = "manifest.json"
+_FORMAT_VERSION: int = 1
+_DEFAULT_CHUNK: int = 65536
+
+
+def response_columns(response: control.TimeResponseData) -> list[str]:
+    """Column names in the order used by TimeResponseData.to_pandas"""
+    return ["time", *response.input_labels, *response.output_labels, *response.state_labels]
+
+
+class ColumnarResultWriter:
+    """
+    Streams equally long columns to a directory holding one raw binary file per column and a
+    json manifest. Chunks are appended as they arrive, so nothing but the current chunk is
+    ever held in memory. The manifest is written on close
+    """
+
+    def __init__(self, directory: pathlib.Path, dtype: np.dtype | str = np.float64):
+        self.directory = pathlib.Path(directory)
+        self.dtype = np.dtype(dtype)
+        self.columns: list[str] = []
+        self.length: int = 0
+        self.__files: list[BinaryIO] = []
+
+    def __enter__(self) -> "ColumnarResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __open(self, columns: Sequence[str]) -> None:
+        if len(set(columns)) != len(columns):
+            raise ValueError(f"Column names must be unique, got {list(columns)}")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.columns = list(columns)
+        self.__files = [open(self.directory / f"column_{i:04d}.bin", "wb") for i in range(len(columns))]
+
+    def write_chunk(self, chunk: Mapping[str, np.ndarray]) -> None:
+        if not self.__files:
+            self.__open(list(chunk.keys()))
+        if list(chunk.keys()) != self.columns:
+            raise ValueError(f"Chunk columns {list(chunk.keys())} do not match {self.columns}")
+        lengths = {np.shape(values)[0] for values in chunk.values()}
+        if len(lengths) != 1:
+            raise ValueError("All columns of a chunk must have the same length")
+        for file, values in zip(self.__files, chunk.values()):
+            file.write(np.ascontiguousarray(values, dtype=self.dtype).tobytes())
+        self.length += lengths.pop()
+
+    def write_response(self, response: control.TimeResponseData, chunk_size: int = _DEFAULT_CHUNK,
+                       length: int | None = None) -> None:
+        """:param length: number of leading samples of the response that are written, all when None"""
+        signals = [
+            np.atleast_2d(response.time),
+            np.reshape(response.inputs, (len(response.input_labels), -1)),
+            np.reshape(response.outputs, (len(response.output_labels), -1)),
+            np.reshape(response.states, (len(response.state_labels), -1)),
+        ]
+        rows = [row for signal in signals for row in signal]     # views into the response, not copies
+        names = response_columns(response)
+        length = np.shape(response.time)[0] if length is None else length
+        for start in range(0, length, chunk_size):
+            self.write_chunk({name: row[start:min(start + chunk_size, length)] for name, row in zip(names, rows)})
+
+    def close(self) -> None:
+        for file in self.__files:
+            file.close()
+        self.__files = []
+        if not self.columns:
+            return
+        manifest = {
+            "format_version": _FORMAT_VERSION,
+            "dtype": self.dtype.str,
+            "length": self.length,
+            "columns": {name: f"column_{i:04d}.bin" for i, name in enumerate(self.columns)},
+        }
+        (self.directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+
+class ColumnarResult:
+    """Read only, memory mapped access to a result written by ColumnarResultWriter"""
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = pathlib.Path(directory)
+        manifest = json.loads((self.directory / MANIFEST_NAME).read_text())
+        self.dtype = np.dtype(manifest["dtype"])
+        self.length: int = manifest["length"]
+        self.__files: dict[str, str] = manifest["columns"]
+        self.__maps: dict[str, np.memmap] = {}
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.__files.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__files
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self.__maps:
+            if self.length == 0:
+                return np.empty(0, dtype=self.dtype)
+            self.__maps[name] = np.memmap(self.directory / self.__files[name], dtype=self.dtype, mode="r", shape=(self.length, ))
+        return self.__maps[name]
+
+    def stack(self, names: Sequence[str]) -> np.ndarray:
+        """Copies the named columns into a (len(names), length) array"""
+        return np.vstack([self[name] for name in names])
+
+
+def is_columnar_result(directory: pathlib.Path) -> bool:
+    return (pathlib.Path(directory) / MANIFEST_NAME).exists()
+
+
+def load_columnar_result(directory: pathlib.Path) -> ColumnarResult:
+    return ColumnarResult(directory)
@@ -0,0 +1,105 @@
+import dataclasses
+from typing import NamedTuple, Sequence
+
+import control
+import numpy as np
+
+from utils.ode_solvers import SOLVERS, StepCounts, counting_solver
+
+AUTO_METHOD: str = "auto"
+
+
+@dataclasses.dataclass
+class SolverSettings:
+    """
+    Integration settings of one simulation. With method "auto" the stiffness of the closed loop
+    is estimated from its Jacobian at the initial point (estimate_stiffness), and the implicit
+    method is used when the stiffness ratio exceeds the threshold
+    """
+    method: str = dataclasses.field(default=AUTO_METHOD)
+    rtol: float = dataclasses.field(default=1e-3)
+    atol: float = dataclasses.field(default=1e-6)
+    max_step: float = dataclasses.field(default=np.inf)
+    explicit_method: str = dataclasses.field(default="RK45")
+    implicit_method: str = dataclasses.field(default="Radau")
+    stiffness_threshold: float = dataclasses.field(default=1e3)
+
+    def __post_init__(self):
+        for method in (self.explicit_method, self.implicit_method):
+            if method not in SOLVERS:
+                raise ValueError(f"Unknown solver {method}, expected one of {list(SOLVERS)}")
+        if self.method != AUTO_METHOD and self.method not in SOLVERS:
+            raise ValueError(f"Unknown solver {self.method}, expected {AUTO_METHOD} or one of {list(SOLVERS)}")
+
+
+class StiffnessEstimate(NamedTuple):
+    eigenvalues: np.ndarray
+    ratio: float            # fastest over slowest eigenvalue magnitude, modes slower than the horizon count as 1 / horizon
+    stiff: bool
+
+
+class SolverTelemetry(NamedTuple):
+    method: str
+    nfev: int
+    njev: int
+    nlu: int
+    accepted_steps: int
+    rejected_steps: int | None      # None for the implicit methods and LSODA, see utils.ode_solvers.counting_solver
+    stiffness_ratio: float | None   # only estimated with method "auto"
+
+
+def _initial_inputs(system: control.InputOutputSystem, T: np.ndarray, U: np.ndarray | float) -> np.ndarray:
+    U = np.asarray(U, dtype=float)
+    if U.ndim == 2:
+        return U[:, 0]
+    if U.ndim == 1 and system.ninputs == 1 and U.shape[0] == T.shape[0]:
+        return U[:1]
+    return np.broadcast_to(U, (system.ninputs, ))
+
+
+def estimate_stiffness(system: control.InputOutputSystem,
+                       T: np.ndarray,
+                       U: np.ndarray | float = 0.,
+                       X0: np.ndarray | Sequence[float] | float = 0.,
+                       threshold: float = SolverSettings.stiffness_threshold) -> StiffnessEstimate:
+    """Eigenvalues of the closed loop linearized at the initial state and inputs"""
+    T = np.asarray(T, dtype=float)
+    if system.nstates == 0:
+        return StiffnessEstimate(eigenvalues=np.empty(0), ratio=1., stiff=False)
+    x0 = np.broadcast_to(np.asarray(X0, dtype=float), (system.nstates, ))
+    eigenvalues = np.linalg.eigvals(system.linearize(x0, _initial_inputs(system, T, U)).A)
+    magnitudes = np.abs(eigenvalues)
+    fastest = float(np.max(magnitudes))
+    slowest = max(float(np.min(magnitudes)), 1 / (T[-1] - T[0]))
+    ratio = fastest / slowest if fastest > 0 else 1.
+    return StiffnessEstimate(eigenvalues=eigenvalues, ratio=ratio, stiff=ratio > threshold)
+
+
+def simulate(system: control.InputOutputSystem,
+             T: np.ndarray,
+             U: np.ndarray | float = 0.,
+             X0: np.ndarray | Sequence[float] | float = 0.,
+             settings: SolverSettings | None = None,
+             **kwargs) -> tuple[control.TimeResponseData, SolverTelemetry]:
+    """
+    control.input_output_response with the method, tolerances and largest step of `settings`,
+    choosing between the explicit and the implicit method when the method is "auto"
+    :return: the response and the function evaluations, Jacobian evaluations, LU decompositions,
+        accepted and rejected steps of the solver
+    """
+    settings = SolverSettings() if settings is None else settings
+    method, ratio = settings.method, None
+    if method == AUTO_METHOD:
+        stiffness = estimate_stiffness(system, T, U, X0, settings.stiffness_threshold)
+        method, ratio = (settings.implicit_method if stiffness.stiff else settings.explicit_method), stiffness.ratio
+    counts = StepCounts()
+    response = control.input_output_response(
+        system, T, U, X0, solve_ivp_method=counting_solver(method, counts),
+        solve_ivp_kwargs={"rtol": settings.rtol, "atol": settings.atol, "max_step": settings.max_step},
+        **kwargs
+    )
+    solver = counts.solver
+    return response, SolverTelemetry(
+        method=method, nfev=int(solver.nfev), njev=int(solver.njev), nlu=int(solver.nlu),
+        accepted_steps=counts.accepted, rejected_steps=counts.rejected, stiffness_ratio=ratio
+    )
@@ -1,9 +1,17 @@
 import control
-from typing import NamedTuple
+import enum
+from typing import NamedTuple, Sequence
 
-import cvxpy
 import numpy as np
-import cvxpy as cp
+
+from utils.lazy_imports import lazy_import
+
+cvxpy = lazy_import("cvxpy")    # only the LMI method needs it
+cp = cvxpy
+
+_GRID_POINTS: int = 200
+_MAX_ITERATIONS: int = 50
+
 
 class GenericSystem(NamedTuple):
     A: np.ndarray
@@ -11,25 +19,140 @@ class GenericSystem(NamedTuple):
     C: np.ndarray
     D: np.ndarray
 
-def estimate_h_infinity(system: GenericSystem):
-    gamma: cp.Variable = cp.Variable(shape=(1, 1))
-    X: cp.Variable = cp.Variable(shape=system.A.shape)
-    identity: np.ndarray = np.eye(system.A.shape[0])
-    objective = cvxpy.Minimize(0)
-    block_a = cp.bmat([
-        [system.A.T @ X + system.A @ X, X @ system.B],
-        [system.B.T @ X, -gamma * identity],
+
+class HInfinityMethod(enum.Enum):
+    HAMILTONIAN: int = 0
+    LMI: int = 1
+
+
+class HInfinityEstimate(NamedTuple):
+    gamma: float
+    X: np.ndarray | None            # bounded real lemma certificate, LMI method only
+    peak_frequency: float | None    # frequency of the peak gain, Hamiltonian method only
+
+
+def _frequency_grid(A: np.ndarray, n_points: int) -> np.ndarray:
+    magnitudes = np.abs(np.linalg.eigvals(A))
+    magnitudes = magnitudes[magnitudes > 0]
+    low, high = (magnitudes.min(), magnitudes.max()) if magnitudes.size else (1., 1.)
+    resonances = np.abs(np.linalg.eigvals(A).imag)
+    grid = np.r_[0, np.logspace(np.log10(low) - 2, np.log10(high) + 2, n_points - A.shape[0] - 1), resonances]
+    return np.sort(grid)
+
+
+def frequency_response_gains(A: np.ndarray, B: np.ndarray, C: np.ndarray, D: np.ndarray, omega: np.ndarray) -> np.ndarray:
+    """
+    Largest singular value of G(jw) = C (jwI - A)^-1 B + D on a frequency grid. All arguments
+    may carry leading batch dimensions, e.g. A of shape (S, n, n) with omega of shape (S, W)
+    :return: gains with the shape of omega
+    """
+    identity = np.eye(A.shape[-1])
+    resolvent = 1j * omega[..., None, None] * identity - A[..., None, :, :]
+    response = C[..., None, :, :] @ np.linalg.solve(resolvent, np.broadcast_to(B[..., None, :, :], resolvent.shape[:-1] + B.shape[-1:])) \
+        + D[..., None, :, :]
+    return np.linalg.svd(response, compute_uv=False)[..., 0]
+
+
+def _imaginary_axis_frequencies(system: GenericSystem, gamma: float, tolerance: float) -> np.ndarray:
+    """
+    Frequencies at which gamma is a singular value of G(jw), read from the purely imaginary
+    eigenvalues of the Hamiltonian matrix H(gamma)
+    """
+    A, B, C, D = system
+    R = gamma**2 * np.eye(D.shape[1]) - D.T @ D
+    S = gamma**2 * np.eye(D.shape[0]) - D @ D.T
+    R_inv_b = np.linalg.solve(R, B.T)
+    A_gamma = A + B @ np.linalg.solve(R, D.T @ C)
+    hamiltonian = np.block([
+        [A_gamma, gamma * B @ R_inv_b],
+        [-gamma * C.T @ np.linalg.solve(S, C), -A_gamma.T]
     ])
-    block_b = cp.bmat([
-        [system.C.T],
-        [system.D.T]
+    eigen_values = np.linalg.eigvals(hamiltonian)
+    on_axis = np.abs(eigen_values.real) < tolerance * np.maximum(1, np.abs(eigen_values))
+    return np.unique(np.abs(eigen_values[on_axis].imag))
+
+
+def _refine_h_infinity(system: GenericSystem, lower_bound: float, peak_frequency: float, tolerance: float) -> tuple[float, float]:
+    """
+    Two step (Boyd-Balakrishnan / Bruinsma-Steinbuch) iteration: the imaginary axis eigenvalues of
+    the Hamiltonian at (1 + 2 tol) * lower_bound delimit the frequency intervals where the gain is
+    above that level, and the gain at their midpoints raises the lower bound. Converges
+    quadratically once no interval is left
+    """
+    A, B, C, D = system
+    for _ in range(_MAX_ITERATIONS):
+        gamma = (1 + 2 * tolerance) * lower_bound
+        crossings = _imaginary_axis_frequencies(system, gamma, np.sqrt(tolerance))
+        if crossings.size == 0:
+            return 0.5 * (lower_bound + gamma), peak_frequency
+        midpoints = 0.5 * (crossings[:-1] + crossings[1:]) if crossings.size > 1 else crossings
+        gains = frequency_response_gains(A, B, C, D, midpoints)
+        if gains.max() <= lower_bound:
+            return 0.5 * (lower_bound + gamma), peak_frequency
+        lower_bound, peak_frequency = gains.max(), midpoints[np.argmax(gains)]
+    return lower_bound, peak_frequency
+
+
+def _lmi_h_infinity(system: GenericSystem, verbose: bool = False) -> HInfinityEstimate:
+    """
+    Bounded real lemma: ||G||_inf < gamma iff there is X > 0 with
+    [[A^T X + X A, X B, C^T], [B^T X, -gamma I, D^T], [C, D, -gamma I]] < 0
+    """
+    n, m, p = system.A.shape[0], system.B.shape[1], system.C.shape[0]
+    gamma: cp.Variable = cp.Variable()
+    X: cp.Variable = cp.Variable(shape=system.A.shape, symmetric=True)
+    brl = cp.bmat([
+        [system.A.T @ X + X @ system.A, X @ system.B, system.C.T],
+        [system.B.T @ X, -gamma * np.eye(m), system.D.T],
+        [system.C, system.D, -gamma * np.eye(p)],
     ])
-    block_c = cp.bmat([[system.C, system.D]])
     constraints = [
         X >> 0,
-        block_a + (1/gamma) * block_b.T @ block_c << 0,
+        brl << 0,
     ]
+    problem = cvxpy.Problem(cvxpy.Minimize(gamma), constraints)
+    problem.solve(verbose=verbose)
+    return HInfinityEstimate(gamma=float(gamma.value), X=X.value, peak_frequency=None)
+
+
+def estimate_h_infinity_batch(systems: Sequence[GenericSystem],
+                              tolerance: float = 1e-6,
+                              n_grid: int = _GRID_POINTS) -> list[HInfinityEstimate]:
+    """
+    H infinity norms of many systems. Systems of equal dimensions are scanned together on a
+    vectorized frequency grid for a lower bound, which is then refined per system with the
+    Hamiltonian iteration. Unstable systems get an infinite norm
+    :param systems: continuous time systems
+    :param tolerance: relative accuracy of the norm
+    :param n_grid: number of frequencies of the initial scan
+    :return: one estimate per system, in order
+    """
+    estimates: list[HInfinityEstimate | None] = [None] * len(systems)
+    groups: dict[tuple, list[int]] = {}
+    for index, system in enumerate(systems):
+        if np.any(np.linalg.eigvals(system.A).real >= 0):
+            estimates[index] = HInfinityEstimate(gamma=np.inf, X=None, peak_frequency=None)
+        else:
+            groups.setdefault((system.A.shape, system.B.shape, system.C.shape), []).append(index)
+
+    for indices in groups.values():
+        A, B, C, D = (np.stack([np.asarray(systems[i][k], dtype=float) for i in indices]) for k in range(4))
+        n_points = max(n_grid, A.shape[-1] + 2)
+        omega = np.stack([_frequency_grid(a, n_points) for a in A])
+        gains = frequency_response_gains(A, B, C, D, omega)
+        for row, index in enumerate(indices):
+            peak = int(np.argmax(gains[row]))
+            lower_bound = max(gains[row, peak], np.linalg.norm(D[row], ord=2))
+            gamma, peak_frequency = _refine_h_infinity(systems[index], lower_bound, omega[row, peak], tolerance)
+            estimates[index] = HInfinityEstimate(gamma=float(gamma), X=None, peak_frequency=float(peak_frequency))
+    return estimates
+
 
-    problem = cvxpy.Problem(objective, constraints)
-    problem.solve(verbose=True)
-    return gamma.value, X.value
\ No newline at end of file
+def estimate_h_infinity(system: GenericSystem,
+                        method: HInfinityMethod = HInfinityMethod.HAMILTONIAN,
+                        verbose: bool = False) -> HInfinityEstimate:
+    match method:
+        case HInfinityMethod.HAMILTONIAN:
+            return estimate_h_infinity_batch([system])[0]
+        case HInfinityMethod.LMI:
+            return _lmi_h_infinity(system, verbose=verbose)
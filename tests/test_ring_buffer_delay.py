@@ -0,0 +1,30 @@
+import pathlib
+import sys
+
+import control
+import numpy as np
+
+SOURCE_DIRECTORY = pathlib.Path(__file__).parent.parent / "src"
+sys.path[:0] = [str(SOURCE_DIRECTORY / "interconnected_systems"), str(SOURCE_DIRECTORY)]
+
+from systems import RingBufferDelay
+
+DT = 0.02
+T = np.arange(20) * DT
+U = np.arange(1, 21, dtype=float)
+EXPECTED = np.concatenate([np.zeros(5), U[:-5]])
+
+
+def test_same_system_simulated_twice():
+    system = RingBufferDelay(delay=5 * DT, dt=DT, inputs=["u"], outputs=["y"]).generate_system()
+    first = control.input_output_response(system, T, U).outputs
+    second = control.input_output_response(system, T, U).outputs
+    np.testing.assert_array_equal(first, EXPECTED)
+    np.testing.assert_array_equal(second, EXPECTED)
+
+
+def test_systems_of_one_block_have_separate_buffers():
+    block = RingBufferDelay(delay=5 * DT, dt=DT, inputs=["u"], outputs=["y"])
+    first, second = block.generate_system(), block.generate_system()
+    control.input_output_response(first, T[:10], U[:10])
+    np.testing.assert_array_equal(control.input_output_response(second, T, U).outputs, EXPECTED)